@@ -0,0 +1,407 @@
+import io
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+from uuid import UUID
+
+from cache import HistoryCache
+from constants import (
+    UtilityConstants as Uc,
+    BenchmarkLiterals as Bl,
+    DEPOSIT_TYPE_MAPPING,
+)
+from main import Wallet
+from storage import get_storage
+
+Operation = Callable[[Wallet, "Ledger", random.Random], object]
+
+
+class Ledger:
+    """
+    Синтетическое хранилище для замеров: пути к файлам, логины
+    пользователей (пароль каждого совпадает с логином) и по одному ID
+    транзакции каждого пользователя для редактирования.
+    """
+
+    def __init__(self, wallets_path: Path, users_path: Path):
+        self.wallets_path = wallets_path
+        self.users_path = users_path
+        self.users: list[str] = []
+        self.transaction_ids: dict[str, str] = {}
+
+
+def iter_transactions(
+        users: list[str],
+        count: int,
+        rng: random.Random,
+) -> Iterator[dict]:
+    """
+    Сгенерировать транзакции со случайными пользователями, датами,
+    категориями, суммами и описаниями.
+
+    :param users: Логины пользователей.
+    :param count: Количество транзакций.
+    :param rng: Генератор случайных чисел с заданным зерном.
+    :returns: Iterator[dict] — транзакции.
+    """
+    start = date.fromisoformat(Uc.BENCHMARK_START_DATE)
+    categories = tuple(DEPOSIT_TYPE_MAPPING)
+    for _ in range(count):
+        yield dict(
+            id=str(UUID(int=rng.getrandbits(128), version=4)),
+            user=rng.choice(users),
+            date=(
+                start + timedelta(days=rng.randrange(Uc.BENCHMARK_DAYS))
+            ).isoformat(),
+            category=rng.choice(categories),
+            amount=rng.randrange(1, Uc.BENCHMARK_MAX_AMOUNT),
+            description=" ".join(
+                rng.sample(Bl.WORDS, Uc.BENCHMARK_DESCRIPTION_WORDS)
+            ),
+        )
+
+
+def generate_ledger(
+        directory: Union[str, Path],
+        transactions: int,
+        users: int,
+        suffix: str = ".json",
+        seed: int = Uc.BENCHMARK_SEED,
+) -> Ledger:
+    """
+    Создать синтетическое хранилище. При одинаковом зерне содержимое
+    получается одинаковым, поэтому замеры разных версий сравнимы.
+
+    :param directory: Папка для файлов хранилища.
+    :param transactions: Количество транзакций.
+    :param users: Количество пользователей.
+    :param suffix: Расширение файла транзакций, определяющее
+     хранилище; пустая строка — шардированное хранилище.
+    :param seed: Зерно генератора случайных чисел.
+    :returns: Ledger — описание созданного хранилища.
+    """
+    directory = Path(directory)
+    ledger = Ledger(directory / f"wallets{suffix}", directory / "users.json")
+    ledger.users = [f"user{number:06d}" for number in range(users)]
+    users_storage = get_storage(ledger.users_path)
+    for user in ledger.users:
+        users_storage.add_user(
+            dict(user=user, password=sha256(user.encode()).hexdigest())
+        )
+    storage = get_storage(ledger.wallets_path)
+    rng = random.Random(seed)
+    generated = iter_transactions(ledger.users, transactions, rng)
+    while batch := [
+        item for _, item in zip(range(Uc.BENCHMARK_BATCH_SIZE), generated)
+    ]:
+        storage.add_transactions(batch)
+        for item in batch:
+            ledger.transaction_ids.setdefault(item["user"], item["id"])
+    return ledger
+
+
+def _search(
+        mode: str,
+        value: Callable[[random.Random], str],
+) -> Operation:
+    """
+    Создать операцию поиска в одном режиме: режимы стоят по-разному,
+    поэтому замеряются отдельно.
+
+    :param mode: Режим поиска.
+    :param value: Функция, выбирающая значение для поиска.
+    :returns: Operation — операция поиска.
+    """
+    return lambda wallet, ledger, rng: wallet.search(
+        mode, value(rng), path=ledger.wallets_path
+    )
+
+
+def _cold(operation: Operation) -> Operation:
+    """
+    Выполнять операцию с пустым кэшем историй кошелька, как первый
+    запрос пользователя.
+
+    :param operation: Операция.
+    :returns: Operation — операция, сбрасывающая кэш перед вызовом.
+    """
+    def cold(wallet: Wallet, ledger: Ledger, rng: random.Random) -> object:
+        wallet._history_cache = HistoryCache()
+        return operation(wallet, ledger, rng)
+
+    return cold
+
+
+def _edit(wallet: Wallet, ledger: Ledger, rng: random.Random) -> object:
+    transaction_id = ledger.transaction_ids.get(wallet.user)
+    if transaction_id is None:
+        return None
+    return wallet.update_transaction(
+        transaction_id,
+        dict(description=" ".join(rng.sample(Bl.WORDS, 2))),
+        ledger.wallets_path,
+    )
+
+
+# чтения через кэш историй кошелька: каждое замеряется с пустым кэшем
+# (`<имя>_cold`) и с прогретым (`<имя>_warm`).
+CACHED_READS: dict[str, Operation] = {
+    "get_history": lambda wallet, ledger, rng: wallet._get_history(
+        wallet.user, ledger.wallets_path
+    ),
+    "print_history": lambda wallet, ledger, rng: wallet.print_history(
+        wallet._iter_history(wallet.user, ledger.wallets_path),
+        stream=io.StringIO(),
+    ),
+    "search_amount": _search("amount", lambda rng: "1000..5000"),
+    "search_date": _search("date", lambda rng: "2021-01-01..2021-03-01"),
+    "search_description": _search(
+        "description", lambda rng: rng.choice(Bl.WORDS)
+    ),
+}
+# перед замером прогретого чтения операция один раз выполняется
+# для того же пользователя вне замера.
+WARM_OPERATIONS = frozenset(f"{name}_warm" for name in CACHED_READS)
+
+# сначала операции, которые не меняют данные.
+OPERATIONS: dict[str, Operation] = {
+    "auth": lambda wallet, ledger, rng: wallet.auth(
+        wallet.user, wallet.user, ledger.users_path
+    ),
+    "get_balance": lambda wallet, ledger, rng: wallet.get_balance(
+        path=ledger.wallets_path
+    ),
+    **{
+        f"{name}_{state}": operation if state == "warm" else _cold(operation)
+        for name, operation in CACHED_READS.items()
+        for state in ("cold", "warm")
+    },
+    "edit_transaction": _edit,
+    "write_to_file": lambda wallet, ledger, rng: wallet._write_to_file(
+        wallet.user,
+        rng.randrange(1, Uc.BENCHMARK_MAX_AMOUNT),
+        rng.choice(tuple(DEPOSIT_TYPE_MAPPING)),
+        rng.choice(Bl.WORDS),
+        path=ledger.wallets_path,
+    ),
+}
+
+
+def percentile(values: list[float], share: float) -> float:
+    """
+    Получить перцентиль по методу ближайшего ранга.
+
+    :param values: Отсортированные значения.
+    :param share: Доля, например 0.99.
+    :returns: Float — значение перцентиля.
+    """
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def measure(
+        operation: Operation,
+        ledger: Ledger,
+        repeat: int,
+        seed: int = Uc.BENCHMARK_SEED,
+        warm: bool = False,
+) -> dict[str, float]:
+    """
+    Замерить операцию: каждый вызов выполняется от имени случайного
+    пользователя.
+
+    :param operation: Операция.
+    :param ledger: Хранилище для замеров.
+    :param repeat: Количество вызовов.
+    :param seed: Зерно генератора случайных чисел.
+    :param warm: Перед каждым замером выполнить операцию вне замера,
+     чтобы замерялось чтение из прогретого кэша.
+    :returns: Dict — количество вызовов, общее время в секундах,
+     пропускная способность в вызовах в секунду и задержки p50 и p99
+     в миллисекундах.
+    """
+    rng = random.Random(seed)
+    wallet = Wallet()
+    wallet.authenticated = True
+    latencies = []
+    for _ in range(repeat):
+        wallet.user = rng.choice(ledger.users)
+        if warm:
+            operation(wallet, ledger, rng)
+        started = time.perf_counter()
+        operation(wallet, ledger, rng)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    total = sum(latencies)
+    return dict(
+        calls=repeat,
+        seconds=total,
+        ops_per_second=repeat / total if total else 0.0,
+        p50_ms=percentile(latencies, 0.5) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+    )
+
+
+def run_benchmarks(
+        transactions: int,
+        users: int,
+        repeat: int,
+        suffix: str = ".json",
+        operations: Optional[list[str]] = None,
+        seed: int = Uc.BENCHMARK_SEED,
+) -> dict:
+    """
+    Создать синтетическое хранилище во временной папке и замерить на нём
+    операции кошелька.
+
+    :param transactions: Количество транзакций.
+    :param users: Количество пользователей.
+    :param repeat: Количество вызовов каждой операции.
+    :param suffix: Расширение файла транзакций.
+    :param operations: Названия операций, по умолчанию все.
+    :param seed: Зерно генератора случайных чисел.
+    :returns: Dict — параметры запуска (`params`) и результаты замеров
+     по операциям (`results`).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = generate_ledger(
+            directory, transactions, users, suffix, seed
+        )
+        results = {
+            name: measure(
+                operation, ledger, repeat, seed, name in WARM_OPERATIONS
+            )
+            for name, operation in OPERATIONS.items()
+            if operations is None or name in operations
+        }
+    return dict(
+        params=dict(
+            transactions=transactions,
+            users=users,
+            repeat=repeat,
+            storage=suffix,
+            seed=seed,
+        ),
+        results=results,
+    )
+
+
+def compare(
+        report: dict,
+        baseline: dict,
+        tolerance: float = Uc.BENCHMARK_TOLERANCE,
+) -> list[tuple[str, str, float, float]]:
+    """
+    Сравнить замеры с сохранённым базовым отчётом.
+
+    :param report: Текущий отчёт run_benchmarks().
+    :param baseline: Базовый отчёт.
+    :param tolerance: Допустимое относительное замедление.
+    :returns: List[tuple] — операция, показатель, базовое и текущее
+     значения для задержек, выросших больше чем на `tolerance`.
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        expected = baseline.get("results", {}).get(name)
+        if expected is None:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(
+                    (name, metric, expected[metric], result[metric])
+                )
+    return regressions
+
+
+def create_parser() -> ArgumentParser:
+    """
+    Создать парсер аргументов замеров.
+
+    :returns: ArgumentParser — парсер аргументов.
+    """
+    parser = ArgumentParser(description=Bl.DESCRIPTION)
+    parser.add_argument(
+        "--transactions",
+        type=int,
+        default=Uc.BENCHMARK_TRANSACTIONS,
+        help=Bl.TRANSACTIONS_HELP,
+    )
+    parser.add_argument(
+        "--users", type=int, default=Uc.BENCHMARK_USERS, help=Bl.USERS_HELP
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=Uc.BENCHMARK_REPEAT,
+        help=Bl.REPEAT_HELP,
+    )
+    parser.add_argument(
+        "--storage", default=".json", help=Bl.STORAGE_HELP
+    )
+    parser.add_argument(
+        "--operation",
+        dest="operations",
+        action="append",
+        choices=list(OPERATIONS),
+        help=Bl.OPERATION_HELP,
+    )
+    parser.add_argument("--seed", type=int, default=Uc.BENCHMARK_SEED)
+    parser.add_argument("--output", type=Path, help=Bl.OUTPUT_HELP)
+    parser.add_argument("--baseline", type=Path, help=Bl.BASELINE_HELP)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=Uc.BENCHMARK_TOLERANCE,
+        help=Bl.TOLERANCE_HELP,
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Точка входа замеров.
+
+    :param argv: Аргументы командной строки.
+    :returns: Int — 1, если по сравнению с базовым отчётом найдены
+     замедления, 0 в ином случае.
+    """
+    args = create_parser().parse_args(argv)
+    report = run_benchmarks(
+        args.transactions,
+        args.users,
+        args.repeat,
+        args.storage,
+        args.operations,
+        args.seed,
+    )
+    text = json.dumps(report, indent=4)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    if args.baseline is None:
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("params") != report["params"]:
+        print(Bl.PARAMS_MISMATCH, file=sys.stderr)
+    regressions = compare(report, baseline, args.tolerance)
+    for name, metric, expected, actual in regressions:
+        print(
+            Bl.REGRESSION.format(name, metric, expected, actual),
+            file=sys.stderr,
+        )
+    if regressions:
+        return 1
+    print(Bl.NO_REGRESSIONS, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Union
+
+from constants import UtilityConstants as Uc
+from models import TransactionColumns
+
+Signature = Optional[tuple[str, int, int, int]]
+
+
+class CacheEntry:
+    """
+    Закэшированная история пользователя вместе с построенными по ней
+    индексами. История хранится по столбцам (TransactionColumns).
+    Индексы должны поддерживать методы `add(transaction)` и
+    `remove(transaction)`, чтобы обновляться вместе с историей.
+    """
+
+    __slots__ = ("signature", "history", "indexes")
+
+    def __init__(self, signature: Signature, history: TransactionColumns):
+        self.signature = signature
+        self.history = history
+        self.indexes: dict[str, Any] = {}
+
+
+class HistoryCache:
+    """
+    Кэш историй транзакций по пользователям. Каждая запись помнит
+    сигнатуру файла (путь, mtime_ns, размер, inode), из которого она была
+    прочитана, и считается устаревшей, если файл изменился. При
+    переполнении вытесняются истории, к которым дольше всего не
+    обращались.
+    """
+
+    def __init__(self, maxsize: int = Uc.HISTORY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, str], CacheEntry] = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def _key(path: Union[str, Path], user: str) -> tuple[str, str]:
+        return str(path), user
+
+    def _get_entry(
+            self,
+            path: Union[str, Path],
+            user: str,
+            signature: Signature,
+    ) -> Optional[CacheEntry]:
+        key = self._key(path, user)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if signature is None or entry.signature != signature:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(
+            self,
+            path: Union[str, Path],
+            user: str,
+            signature: Signature,
+    ) -> Optional[TransactionColumns]:
+        """
+        Получить историю пользователя из кэша.
+
+        :param path: Путь к хранилищу.
+        :param user: Пользователь, для которого нужно получить историю.
+        :param signature: Текущая сигнатура файла пользователя.
+        :returns: TransactionColumns — копия истории, либо None, если её
+         нет в кэше или файл изменился с момента чтения.
+        """
+        entry = self._get_entry(path, user, signature)
+        return None if entry is None else entry.history.copy()
+
+    def get_index(
+            self,
+            path: Union[str, Path],
+            user: str,
+            signature: Signature,
+            name: str,
+            factory: Callable[[TransactionColumns], Any],
+    ) -> Optional[Any]:
+        """
+        Получить индекс по закэшированной истории пользователя. Индекс
+        строится при первом обращении и дальше обновляется вместе
+        с историей.
+
+        :param path: Путь к хранилищу.
+        :param user: Пользователь, которому принадлежит история.
+        :param signature: Текущая сигнатура файла пользователя.
+        :param name: Название индекса.
+        :param factory: Функция, строящая индекс по истории.
+        :returns: Индекс, либо None, если истории нет в кэше или она
+         устарела.
+        """
+        entry = self._get_entry(path, user, signature)
+        if entry is None:
+            return None
+        if name not in entry.indexes:
+            entry.indexes[name] = factory(entry.history)
+        return entry.indexes[name]
+
+    def put_index(
+            self,
+            path: Union[str, Path],
+            user: str,
+            signature: Signature,
+            name: str,
+            index: Any,
+    ) -> None:
+        """
+        Сохранить индекс, построенный по истории пользователя вне кэша.
+        Индекс сохраняется, только если та же история лежит в кэше:
+        иначе его не с чем обновлять.
+
+        :param path: Путь к хранилищу.
+        :param user: Пользователь, которому принадлежит история.
+        :param signature: Сигнатура файла, из которого прочитана история.
+        :param name: Название индекса.
+        :param index: Индекс.
+        """
+        entry = self._get_entry(path, user, signature)
+        if entry is not None:
+            entry.indexes[name] = index
+
+    def put(
+            self,
+            path: Union[str, Path],
+            user: str,
+            signature: Signature,
+            history: Iterable[dict],
+    ) -> None:
+        """
+        Сохранить историю пользователя в кэш.
+
+        :param path: Путь к хранилищу.
+        :param user: Пользователь, которому принадлежит история.
+        :param signature: Сигнатура файла, из которого прочитана история.
+        :param history: История транзакций.
+        """
+        if signature is None:
+            return
+        key = self._key(path, user)
+        self._entries[key] = CacheEntry(
+            signature, TransactionColumns(user, history)
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def extend(
+            self,
+            path: Union[str, Path],
+            user: str,
+            old_signature: Signature,
+            new_signature: Signature,
+            transactions: Iterable[dict],
+    ) -> None:
+        """
+        Учесть в кэше транзакции, записанные самим кошельком. Истории
+        других пользователей из того же файла, прочитанные до записи,
+        остаются актуальными и получают новую сигнатуру.
+
+        :param path: Путь к хранилищу.
+        :param user: Пользователь, совершивший транзакции.
+        :param old_signature: Сигнатура файла до записи.
+        :param new_signature: Сигнатура файла после записи.
+        :param transactions: Записанные транзакции.
+        """
+        self._refresh(old_signature, new_signature)
+        entry = self._entries.get(self._key(path, user))
+        if entry is None:
+            return
+        for transaction in transactions:
+            entry.history.append(transaction)
+            for index in entry.indexes.values():
+                index.add(transaction)
+
+    def update(
+            self,
+            path: Union[str, Path],
+            user: str,
+            old_signature: Signature,
+            new_signature: Signature,
+            transaction: dict,
+    ) -> None:
+        """
+        Учесть в кэше транзакцию, отредактированную самим кошельком.
+
+        :param path: Путь к хранилищу.
+        :param user: Пользователь, совершивший транзакцию.
+        :param old_signature: Сигнатура файла до записи.
+        :param new_signature: Сигнатура файла после записи.
+        :param transaction: Транзакция после редактирования.
+        """
+        self._refresh(old_signature, new_signature)
+        entry = self._entries.get(self._key(path, user))
+        if entry is None:
+            return
+        position = entry.history.index(transaction["id"])
+        if position is None:
+            return
+        item = entry.history[position]
+        entry.history[position] = transaction
+        for index in entry.indexes.values():
+            index.remove(item)
+            index.add(transaction)
+
+    def _refresh(
+            self,
+            old_signature: Signature,
+            new_signature: Signature,
+    ) -> None:
+        if new_signature is None:
+            return
+        for key, entry in list(self._entries.items()):
+            if entry.signature[0] != new_signature[0]:
+                continue
+            # сигнатура уже может быть новой, если в одну запись попали
+            # транзакции нескольких пользователей.
+            if entry.signature in (old_signature, new_signature):
+                entry.signature = new_signature
+            else:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """
+        Очистить кэш.
+        """
+        self._entries.clear()
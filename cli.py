@@ -0,0 +1,389 @@
+import os
+import shlex
+import sys
+from argparse import (
+    SUPPRESS,
+    ArgumentParser,
+    ArgumentTypeError,
+    Namespace,
+)
+from pathlib import Path
+from typing import Iterable, Optional
+
+from constants import (
+    UtilityConstants as Uc,
+    ErrorLiterals as Err,
+    CliLiterals as Cl,
+    Literals as Lit,
+    DEPOSIT_TYPE_MAPPING,
+)
+from main import Wallet
+from models import from_cents
+from metrics import metrics
+
+
+def positive_int(value: str) -> int:
+    """
+    Разобрать целое число больше нуля для аргументов командной строки.
+
+    :param value: Значение аргумента.
+    :returns: Int — число.
+    :raises ArgumentTypeError: Если значение не целое или не больше нуля.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError(Cl.NOT_POSITIVE.format(value))
+    return number
+
+
+def get_password(args: Namespace) -> Optional[str]:
+    """
+    Получить пароль из аргументов, переменной окружения либо, если
+    скрипт запущен в терминале, спросить его у пользователя.
+
+    :param args: Аргументы команды.
+    :returns: Str — пароль, либо None, если его негде взять.
+    """
+    if args.password is not None:
+        return args.password
+    if sys.stdin.isatty():
+        from mask_input import mask_input  # только для терминала
+        return mask_input(Lit.ENTER_PASSWORD)
+    return None
+
+
+def login(wallet: Wallet, args: Namespace) -> bool:
+    """
+    Авторизовать кошелёк пользователем из аргументов, если это ещё не
+    сделано.
+
+    :param wallet: Кошелёк.
+    :param args: Аргументы команды.
+    :returns: Bool — True, если кошелёк авторизован.
+    """
+    if wallet.authenticated and args.user in (None, wallet.user):
+        return True
+    if not args.user:
+        print(Err.NOT_LOGGED_IN)
+        return False
+    password = get_password(args)
+    return password is not None and wallet.auth(
+        args.user, password, path=args.users
+    ) == args.user
+
+
+def register(wallet: Wallet, args: Namespace) -> bool:
+    password = get_password(args)
+    if not args.user or password is None:
+        print(Cl.CREDENTIALS_REQUIRED)
+        return False
+    return Wallet.register(args.user, password, path=args.users) == args.user
+
+
+def auth(wallet: Wallet, args: Namespace) -> bool:
+    wallet.authenticated = False
+    return login(wallet, args)
+
+
+def balance(wallet: Wallet, args: Namespace) -> bool:
+    if args.date is None:
+        print(wallet.get_balance(path=args.wallets))
+        return True
+    result = wallet.balance_at(args.date, path=args.wallets)
+    if isinstance(result, str):
+        print(result)
+        return False
+    print(Lit.BALANCE_AT.format(args.date, from_cents(result)))
+    return True
+
+
+def transaction(wallet: Wallet, args: Namespace) -> bool:
+    return wallet.run_transaction(
+        amount=args.amount,
+        description=args.desc,
+        _type=args.command,
+        path=args.wallets,
+    )
+
+
+def history(wallet: Wallet, args: Namespace) -> bool:
+    result = wallet.print_history(
+        wallet._iter_history(wallet.user, args.wallets),
+        mode=args.mode,
+        page=args.page,
+        page_size=args.page_size,
+        stream=sys.stdout,
+    )
+    if result:
+        print(result)
+    return result not in (Err.UNKNOWN_MODE, Err.INVALID_PAGE)
+
+
+def search(wallet: Wallet, args: Namespace) -> bool:
+    results = wallet._find_transactions(
+        args.mode, args.value, path=args.wallets
+    )
+    if isinstance(results, str):
+        print(results)
+        return False
+    print(
+        wallet.print_history(history=results) if results
+        else Err.NOTHING_FOUND
+    )
+    return True
+
+
+def edit(wallet: Wallet, args: Namespace) -> bool:
+    edited = wallet.update_transaction(
+        args.id,
+        dict(
+            date=args.date,
+            category=args.category,
+            amount=args.amount,
+            description=args.desc,
+        ),
+        path=args.wallets,
+    )
+    if isinstance(edited, str):
+        print(edited)
+        return False
+    print(Lit.TRANSACTION_SUCCESSFULLY_EDITED)
+    print(wallet._format_transaction(edited))
+    return True
+
+
+def report(wallet: Wallet, args: Namespace) -> bool:
+    result = wallet.report(
+        args.period, args.start, args.end, path=args.wallets
+    )
+    print(result)
+    return result not in (Err.UNKNOWN_MODE, Err.INVALID_DATE)
+
+
+def top(wallet: Wallet, args: Namespace) -> bool:
+    result = wallet.top(
+        args.category, args.count, args.start, args.end, path=args.wallets
+    )
+    print(result)
+    return result != Err.INVALID_DATE
+
+
+def import_transactions(wallet: Wallet, args: Namespace) -> bool:
+    try:
+        result = wallet.import_transactions(args.source, path=args.wallets)
+    except OSError as error:
+        print(
+            Err.IMPORT_SOURCE_UNREADABLE.format(
+                args.source, error.strerror or error
+            )
+        )
+        return False
+    return wallet._print_import_result(result)
+
+
+def script(wallet: Wallet, args: Namespace) -> bool:
+    """
+    Выполнить команды из файла или stdin в одном процессе, по одной
+    команде на строку. Пустые строки и строки, начинающиеся с `#`,
+    пропускаются. Ошибка в одной команде не останавливает остальные.
+
+    :param wallet: Кошелёк.
+    :param args: Аргументы команды.
+    :returns: Bool — True, если все команды выполнились успешно.
+    """
+    if args.file == "-":
+        return run_lines(wallet, args, sys.stdin)
+    with open(args.file, "r", encoding="utf-8") as file:
+        return run_lines(wallet, args, file)
+
+
+def run_lines(
+        wallet: Wallet,
+        args: Namespace,
+        lines: Iterable[str],
+) -> bool:
+    """
+    Выполнить команды скрипта.
+
+    :param wallet: Кошелёк.
+    :param args: Общие аргументы запуска (пути к хранилищам, логин).
+    :param lines: Строки скрипта.
+    :returns: Bool — True, если все команды выполнились успешно.
+    """
+    parser = create_parser(commands_only=True)
+    succeeded = True
+    for number, line in enumerate(lines, start=1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            command_args = parser.parse_args(shlex.split(line))
+        except SystemExit:
+            print(Cl.SCRIPT_LINE_FAILED.format(number, line.strip()))
+            succeeded = False
+            continue
+        if command_args.command == "script":
+            print(Cl.NESTED_SCRIPT.format(number))
+            succeeded = False
+            continue
+        if not run_command(wallet, Namespace(**{**vars(args), **vars(
+                command_args
+        )})):
+            print(Cl.SCRIPT_LINE_FAILED.format(number, line.strip()))
+            succeeded = False
+    return succeeded
+
+
+COMMANDS = {
+    "register": register,
+    "auth": auth,
+    "balance": balance,
+    "deposit": transaction,
+    "withdraw": transaction,
+    "history": history,
+    "search": search,
+    "edit": edit,
+    "report": report,
+    "top": top,
+    "import": import_transactions,
+    "script": script,
+}
+PUBLIC_COMMANDS = ("register", "auth", "script")
+
+
+def run_command(wallet: Wallet, args: Namespace) -> bool:
+    """
+    Выполнить одну команду, при необходимости авторизовавшись.
+
+    :param wallet: Кошелёк.
+    :param args: Аргументы команды.
+    :returns: Bool — True, если команда выполнилась успешно.
+    """
+    if args.command not in PUBLIC_COMMANDS and not login(wallet, args):
+        return False
+    return bool(COMMANDS[args.command](wallet, args))
+
+
+def create_parser(commands_only: bool = False) -> ArgumentParser:
+    """
+    Создать парсер команд.
+
+    :param commands_only: Создать парсер только для команд, без общих
+     аргументов — для строк скрипта.
+    :returns: ArgumentParser — парсер команд.
+    """
+    parser = ArgumentParser(prog="wallet", description=Cl.DESCRIPTION)
+    if not commands_only:
+        parser.add_argument(
+            "--user", default=os.getenv(Uc.USER_ENV), help=Cl.USER_HELP
+        )
+        parser.add_argument(
+            "--password",
+            default=os.getenv(Uc.PASSWORD_ENV),
+            help=Cl.PASSWORD_HELP,
+        )
+        parser.add_argument(
+            "--wallets", type=Path, default=Uc.WALLETS_LOCATION
+        )
+        parser.add_argument("--users", type=Path, default=Uc.USERS_LOCATION)
+        parser.add_argument("--metrics", type=Path, help=Cl.METRICS_HELP)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("register", "auth"):
+        command = commands.add_parser(name)
+        # SUPPRESS — чтобы не затирать общие --user и --password.
+        command.add_argument("--user", default=SUPPRESS)
+        command.add_argument("--password", default=SUPPRESS)
+
+    command = commands.add_parser("balance")
+    command.add_argument("--date", help=Cl.BALANCE_DATE_HELP)
+
+    for name in ("deposit", "withdraw"):
+        command = commands.add_parser(name)
+        command.add_argument("--amount", required=True)
+        command.add_argument("--desc", default="")
+
+    command = commands.add_parser("history")
+    command.add_argument(
+        "--mode", choices=("all", "deposit", "withdraw"), default="all"
+    )
+    command.add_argument("--page", type=positive_int)
+    command.add_argument(
+        "--page-size", type=positive_int, default=Uc.HISTORY_PAGE_SIZE
+    )
+
+    command = commands.add_parser("search")
+    command.add_argument(
+        "--mode",
+        choices=("date", "category", "amount", "description"),
+        required=True,
+    )
+    command.add_argument("--value", required=True)
+
+    command = commands.add_parser("report")
+    command.add_argument(
+        "--period", choices=tuple(Uc.REPORT_PERIODS), default="month"
+    )
+    command.add_argument("--from", dest="start", default="")
+    command.add_argument("--to", dest="end", default="")
+
+    command = commands.add_parser("top")
+    command.add_argument(
+        "--category", choices=tuple(DEPOSIT_TYPE_MAPPING), default="withdraw"
+    )
+    command.add_argument("--count", type=int, default=Uc.TOP_COUNT)
+    command.add_argument("--from", dest="start", default="")
+    command.add_argument("--to", dest="end", default="")
+
+    command = commands.add_parser("edit")
+    command.add_argument("--id", required=True)
+    command.add_argument("--date", default="")
+    command.add_argument("--category", default="")
+    command.add_argument("--amount", default="")
+    command.add_argument("--desc", default="")
+
+    command = commands.add_parser("import")
+    command.add_argument("source", type=Path)
+
+    command = commands.add_parser("script")
+    command.add_argument("file", nargs="?", default="-", help=Cl.SCRIPT_HELP)
+    return parser
+
+
+def write_metrics(path: Path) -> None:
+    """
+    Записать собранные метрики вызовов в файл.
+
+    :param path: Файл: с расширением .prom — в формате Prometheus,
+     с любым другим — в JSON.
+    """
+    text = (
+        metrics.to_prometheus()
+        if path.suffix == Uc.PROMETHEUS_SUFFIX
+        else metrics.to_json() + "\n"
+    )
+    path.write_text(text, encoding="utf-8")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Точка входа для неинтерактивного запуска.
+
+    :param argv: Аргументы командной строки.
+    :returns: Int — 0, если команды выполнились успешно, 1 в ином случае.
+    """
+    args = create_parser().parse_args(argv)
+    if args.metrics is not None:
+        metrics.enable()
+    try:
+        return 0 if run_command(Wallet(), args) else 1
+    finally:
+        if args.metrics is not None:
+            metrics.disable()
+            write_metrics(args.metrics)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
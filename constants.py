@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 TRANSACTION_FIELDS_MAPPING = {
@@ -10,13 +11,82 @@ DEPOSIT_TYPE_MAPPING = {
     "deposit": "внесения",
     "withdraw": "снятия",
 }
+CATEGORY_LABELS = {
+    "deposit": "Доход",
+    "withdraw": "Расход",
+}
 
 
 class UtilityConstants:
     BASE_DIR = Path(__file__).parent
-    WALLETS_LOCATION = BASE_DIR / "wallets.json"
-    USERS_LOCATION = BASE_DIR / "users.json"
+    WALLETS_LOCATION = Path(
+        os.getenv("WALLET_WALLETS_LOCATION", BASE_DIR / "wallets.json")
+    )
+    JOURNAL_SUFFIX = ".jsonl"
+    LEDGER_SUFFIX = ".ledger"
+    LEDGER_HEAP_SUFFIX = ".heap"
+    LEDGER_USERS_SUFFIX = ".users.jsonl"
+    SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+    WALLETS_SHARDS_LOCATION = BASE_DIR / "wallets"
+    SHARD_BUCKET_LENGTH = 2
+    SHARD_USER_SUFFIX = ".user.json"
+    TOTALS_SUFFIX = ".totals"
+    LEGACY_TOTALS_SUFFIX = ".totals.json"
+    ID_INDEX_SUFFIX = ".idx"
+    EDITS_SUFFIX = ".edits.jsonl"
+    EDITS_COMPACT_RATIO = 0.25
+    ROLLUPS_SUFFIX = ".rollups"
+    # длина ключа периода: ГГГГ, ГГГГ-ММ, ГГГГ-ММ-ДД.
+    REPORT_PERIODS = {"year": 4, "month": 7, "day": 10}
+    # части на процесс: мелкие части выравнивают нагрузку, если
+    # у пользователей разное количество транзакций.
+    BATCH_PARTS_PER_WORKER = 4
+    TOP_COUNT = 10
+    REPORT_BOUND_PATTERN = (
+        r"[12]\d{3}(-(0[1-9]|1[0-2])(-(0[1-9]|[12]\d|3[01]))?)?"
+    )
+    LOCK_SUFFIX = ".lock"
+    STORAGE_CACHE_SIZE = 256
+    CENTS_PER_UNIT = 100
+    USERS_LOCATION = Path(
+        os.getenv("WALLET_USERS_LOCATION", BASE_DIR / "users.json")
+    )
+    USERS_SHARDS_LOCATION = BASE_DIR / "users"
     DESCRIPTION_MAX_LENGTH = 100
+    DATE_PATTERN = r"([12]\d{3}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01]))"
+    RANGE_SEARCH_FIELDS = ("date", "amount")
+    HISTORY_CACHE_SIZE = 128
+    HISTORY_PAGE_SIZE = 20
+    MIN_STEM_LENGTH = 3
+    STEM_CACHE_SIZE = 65536
+    DATE_CACHE_SIZE = 65536
+    HISTORY_CACHE_MAX_ITEMS = 100_000
+    READ_CHUNK_SIZE = 64 * 1024
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8765
+    SERVER_WORKERS = 32
+    SERVER_MAX_REQUEST_SIZE = 1024 * 1024
+    SERVER_MAX_PAGE_SIZE = 1000
+    SESSION_TOKEN_BYTES = 32
+    SESSION_TTL = 60 * 60
+    USER_ENV = "WALLET_USER"
+    PASSWORD_ENV = "WALLET_PASSWORD"
+    METRICS_BUCKETS = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+        1.0, 2.5, 5.0, 10.0,
+    )
+    METRICS_PREFIX = "wallet"
+    PROMETHEUS_SUFFIX = ".prom"
+    BENCHMARK_TRANSACTIONS = 10_000
+    BENCHMARK_USERS = 100
+    BENCHMARK_REPEAT = 100
+    BENCHMARK_SEED = 2024
+    BENCHMARK_BATCH_SIZE = 10_000
+    BENCHMARK_START_DATE = "2020-01-01"
+    BENCHMARK_DAYS = 1500
+    BENCHMARK_MAX_AMOUNT = 10_000_000
+    BENCHMARK_DESCRIPTION_WORDS = 3
+    BENCHMARK_TOLERANCE = 0.2
 
 
 class Literals:
@@ -29,6 +99,7 @@ class Literals:
     DEPOSIT_HISTORY = "\nИстория ваших пополнений:\n\n"
     WITHDRAWAL_HISTORY = "\nИстория ваших снятий:\n\n"
     CURRENT_BALANCE = "Ваш текущий баланс: {}\n\nДоходы: {}, Расходы: {}"
+    BALANCE_AT = "Ваш баланс на конец {}: {}"
     TRANSACTION_CURRENT_DATA = "Текущие данные по транзакции: \n"
     FIELDS_TO_CHANGE_PROMPT = (
         "Какие поля вы хотите изменить? Пожалуйста, введите значение для поля,"
@@ -50,6 +121,9 @@ class Literals:
         "\n- search — поиск по вашим транзакциям"
         "\n- edit — изменить данные транзакции по её ID. Его можно найти в "
         "истории ваших транзакций."
+        "\n- import — импортировать транзакции из файла .csv или .jsonl"
+        "\n- report — доходы, расходы и баланс по дням, месяцам или годам"
+        "\n- top — самые крупные доходы или расходы"
         "\n- help - вывести список доступных команд"
         "\n- exit — выход из приложения"
     )
@@ -75,15 +149,55 @@ class Literals:
         "Для выхода из приложения введите команду exit либо "
         "нажмите комбинацию клавиш Ctrl+C. \n"
     )
+    HISTORY_NEXT_PAGE = (
+        "Нажмите Enter, чтобы показать следующую страницу, "
+        "или введите любой символ для выхода: "
+    )
     WELCOME_MESSAGE = "Добро пожаловать, {}!\n"
     ENTER_COMMAND = "Введите команду: "
     ENTER_FIELD_VALUE = "Введите значение для поля {field}. {description}\n"
     DATE_EXAMPLE = "Пример даты: 2020-12-31"
     AMOUNT_EXAMPLE = "Пример суммы: 100"
+    DATE_RANGE_EXAMPLE = (
+        "Диапазон дат: 2024-09-01..2024-09-30, >=2024-09-01 или <=2024-09-30"
+    )
+    AMOUNT_RANGE_EXAMPLE = "Диапазон сумм: 100..500, >=10000 или <=100.5"
     CATEGORY_EXAMPLE = (
         "Доступные категории — deposit или withdraw (Доход или Расход)"
     )
-    DESCRIPTION_EXAMPLE = "Пример описания: Куплен новый ноутбук"
+    DESCRIPTION_EXAMPLE = (
+        "Пример описания: ноутбук (найдёт «Куплен новый ноутбук»)"
+    )
+    IMPORT_SOURCE_INPUT = (
+        "Введите путь к файлу .csv или .jsonl с полями date, category, "
+        "amount, description: "
+    )
+    IMPORT_ROW_REJECTED = "Строка {}: {}"
+    REPORT_PERIOD_CHOICES = (
+        "Выберите период отчёта:"
+        "\n- day — по дням"
+        "\n- month — по месяцам"
+        "\n- year — по годам\n"
+    )
+    REPORT_START_INPUT = (
+        "Введите начало отчёта (2024, 2024-09 или 2024-09-01) "
+        "либо нажмите Enter: "
+    )
+    REPORT_END_INPUT = (
+        "Введите конец отчёта (2024, 2024-09 или 2024-09-30) "
+        "либо нажмите Enter: "
+    )
+    TOP_CATEGORY_INPUT = (
+        "Какие транзакции показать: deposit — доходы, withdraw — расходы: "
+    )
+    TOP_START_INPUT = "Введите первую дату (2024-09-01) либо нажмите Enter: "
+    TOP_END_INPUT = (
+        "Введите последнюю дату (2024-09-30) либо нажмите Enter: "
+    )
+    TOP_HEADER = "\nСамые крупные транзакции:\n\n"
+    REPORT_HEADER = "\nДоходы и расходы по периодам:\n\n"
+    REPORT_LINE = "{}: доходы {}, расходы {}, баланс {}"
+    IMPORT_RESULT = "Импортировано транзакций: {}, отклонено: {}"
 
 
 class ErrorLiterals:
@@ -98,7 +212,105 @@ class ErrorLiterals:
     INVALID_DATE = "Ошибка: Недопустимый формат даты.\n"
     DESCRIPTION_TOO_LONG = "Ошибка: Описание слишком длинное.\n"
     UNKNOWN_MODE = "Неизвестный режим"
+    INVALID_PAGE = (
+        "Ошибка: номер и размер страницы должны быть положительными.\n"
+    )
     NOTHING_FOUND = "Ничего не найдено"
     ID_CANNOT_BE_CHANGED = "Ошибка: id транзакции не может быть изменён"
     TRANSACTION_NOT_FOUND = "Транзакция с указанным id не найдена"
     NOT_LOGGED_IN = "Вы не вошли в систему"
+    MISSING_REQUIRED_FIELDS = "Ошибка: не указаны сумма или категория.\n"
+    INVALID_IMPORT_ROW = "Ошибка: строка не является записью транзакции.\n"
+    IMPORT_SOURCE_UNREADABLE = "Не удалось прочитать файл {}: {}"
+    INVALID_REQUEST = "Некорректный запрос"
+    LEGACY_AMOUNTS = (
+        "Суммы в {} записаны в старом формате, выполните "
+        "`python manage.py convert-amounts`"
+    )
+    LEDGER_INVALID_DATE = (
+        "Дата {!r} не существует и не может быть записана в {}"
+    )
+
+
+class ManageLiterals:
+    DESCRIPTION = "Административные команды кошелька"
+    SPLIT_WALLETS_HELP = (
+        "разложить общий файл транзакций по файлам пользователей"
+    )
+    WALLETS_SPLIT = (
+        "Перенесено транзакций: {}, пользователей: {}. Новое хранилище: {}"
+    )
+    SPLIT_USERS_HELP = (
+        "разложить общий файл пользователей по папкам с хэшем логина"
+    )
+    USERS_SPLIT = "Перенесено пользователей: {}. Новое хранилище: {}"
+    VERIFY_BALANCES_HELP = (
+        "пересчитать балансы пользователей и сообщить о расхождениях"
+    )
+    FIX_HELP = "исправить найденные расхождения"
+    BALANCE_DRIFT = "{user}: сохранённый баланс {stored}, фактический {actual}"
+    BALANCES_OK = "Расхождений в балансах не найдено."
+    BALANCES_FIXED = "Исправлено балансов: {}"
+    COMPACT_HELP = "свернуть накопленные правки в новый снимок хранилища"
+    COMPACTED = "Хранилище {} пересобрано."
+    CONVERT_AMOUNTS_HELP = (
+        "перевести суммы, сохранённые в рублях, в целое число копеек"
+    )
+    AMOUNTS_CONVERTED = "Переведено сумм: {}. Хранилище: {}"
+    BATCH_REPORT_HELP = (
+        "посчитать итоги и сводки по периодам для всех пользователей "
+        "в пуле процессов"
+    )
+    PERIOD_HELP = "период сводок, по умолчанию month"
+    WORKERS_HELP = "количество процессов, по умолчанию по числу ядер"
+    OUTPUT_HELP = "записать отчёт в файл JSON вместо вывода в терминал"
+    BATCH_REPORT_WRITTEN = "Итоги пользователей: {}. Отчёт: {}"
+
+
+class ServerLiterals:
+    DESCRIPTION = "Сетевой сервис кошелька (JSON по TCP)"
+    HOST_HELP = "адрес, на котором слушает сервер"
+    PORT_HELP = "порт сервера"
+    SERVER_STARTED = "Сервер кошелька запущен на {}:{}"
+
+
+class CliLiterals:
+    DESCRIPTION = "Неинтерактивный запуск команд кошелька"
+    USER_HELP = "логин пользователя, по умолчанию из WALLET_USER"
+    PASSWORD_HELP = "пароль пользователя, по умолчанию из WALLET_PASSWORD"
+    SCRIPT_HELP = "файл со списком команд, `-` — читать из stdin"
+    CREDENTIALS_REQUIRED = "Укажите логин и пароль"
+    SCRIPT_LINE_FAILED = "Строка {}: команда не выполнена: {}"
+    NESTED_SCRIPT = "Строка {}: вложенные скрипты не поддерживаются"
+    BALANCE_DATE_HELP = "показать баланс на конец дня ГГГГ-ММ-ДД"
+    NOT_POSITIVE = "ожидается целое число больше нуля: {!r}"
+    METRICS_HELP = (
+        "записать метрики вызовов в файл: .prom — в формате Prometheus, "
+        "иначе в JSON"
+    )
+
+
+class BenchmarkLiterals:
+    DESCRIPTION = "Замеры операций кошелька на синтетическом хранилище"
+    TRANSACTIONS_HELP = "количество транзакций (от 1 000 до 1 000 000)"
+    USERS_HELP = "количество пользователей (от 10 до 100 000)"
+    REPEAT_HELP = "количество вызовов каждой операции"
+    STORAGE_HELP = (
+        "расширение файла транзакций: .json, .jsonl, .ledger, .sqlite3, "
+        "пустая строка — шардированное хранилище"
+    )
+    OPERATION_HELP = "замерить только эту операцию (можно повторять)"
+    OUTPUT_HELP = "записать отчёт в файл вместо вывода в терминал"
+    BASELINE_HELP = "базовый отчёт, с которым сравниваются задержки"
+    TOLERANCE_HELP = "допустимое относительное замедление, по умолчанию 0.2"
+    REGRESSION = "Замедление {}: {} было {:.3f}, стало {:.3f}"
+    NO_REGRESSIONS = "Замедлений относительно базового отчёта не найдено."
+    PARAMS_MISMATCH = (
+        "Внимание: базовый отчёт снят с другими параметрами, "
+        "сравнение может быть неточным."
+    )
+    WORDS = (
+        "продукты", "зарплата", "аренда", "такси", "кафе", "подарок",
+        "ремонт", "отпуск", "связь", "аптека", "книги", "бензин",
+        "премия", "кешбэк", "одежда", "спорт", "кино", "налог",
+    )
@@ -1,6 +1,8 @@
 from functools import wraps
+from typing import Optional
 
 from constants import ErrorLiterals as Err
+from metrics import metrics
 
 
 def restricted(func):
@@ -18,3 +20,43 @@ def restricted(func):
         return func(*args, **kwargs)
 
     return wrapper
+
+
+def locked(method):
+    """
+    Декоратор для методов хранилища, изменяющих данные: метод
+    выполняется под межпроцессной блокировкой хранилища, поэтому
+    параллельные записи из разных процессов не теряются.
+    :param method: Метод хранилища.
+    :returns: Метод, захватывающий блокировку `self.lock` на время
+     выполнения.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def instrumented(name: Optional[str] = None):
+    """
+    Декоратор для замера вызовов: количество, время выполнения и
+    ввод-вывод хранилища попадают в реестр `metrics.metrics`, если он
+    включён. Выключенный реестр стоит одной проверки флага.
+    :param name: Название метода в метриках, по умолчанию имя функции.
+    :returns: Декоратор функции или метода.
+    """
+    def decorator(func):
+        metric = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            with metrics.measure(metric):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,396 @@
+import math
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from functools import lru_cache
+from itertools import accumulate
+from typing import Any, Iterable, Optional
+
+from constants import UtilityConstants as Uc
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# окончания отсортированы по убыванию длины, чтобы отрезалось самое
+# длинное подходящее.
+STEM_ENDINGS = tuple(
+    sorted(
+        (
+            "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими",
+            "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие",
+            "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ую", "юю",
+            "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+            "ing", "es", "ed", "s",
+        ),
+        key=len,
+        reverse=True,
+    )
+)
+
+
+def normalize(text: str) -> str:
+    """
+    Привести текст к нижнему регистру с учётом кириллицы: `ё` считается
+    равной `е`.
+
+    :param text: Исходный текст.
+    :returns: Str — нормализованный текст.
+    """
+    return text.casefold().replace("ё", "е")
+
+
+@lru_cache(maxsize=Uc.STEM_CACHE_SIZE)
+def stem(token: str) -> str:
+    """
+    Отрезать от слова типичное окончание, если после этого остаётся
+    не меньше `MIN_STEM_LENGTH` символов.
+
+    :param token: Нормализованное слово.
+    :returns: Str — основа слова.
+    """
+    for ending in STEM_ENDINGS:
+        if (
+                token.endswith(ending)
+                and len(token) - len(ending) >= Uc.MIN_STEM_LENGTH
+        ):
+            return token[:-len(ending)]
+    return token
+
+
+@lru_cache(maxsize=Uc.STEM_CACHE_SIZE)
+def tokenize(text: str) -> frozenset[str]:
+    """
+    Разбить текст на основы слов. Описания транзакций часто повторяются,
+    поэтому результат кэшируется.
+
+    :param text: Исходный текст.
+    :returns: FrozenSet[str] — основы слов текста.
+    """
+    return frozenset(
+        stem(token) for token in TOKEN_PATTERN.findall(normalize(text))
+    )
+
+
+def text_matches(query: str, text: Optional[str]) -> bool:
+    """
+    Проверить, что в тексте есть все слова запроса (с точностью до
+    окончания либо как начало слова) — то же правило, что и в
+    TextIndex.search(), но без построения индекса.
+
+    :param query: Поисковый запрос.
+    :param text: Текст, например описание транзакции.
+    :returns: Bool — True, если текст подходит под запрос.
+    """
+    tokens = tokenize(query)
+    stems = tokenize(text or "")
+    return bool(tokens) and all(
+        any(word.startswith(token) for word in stems) for token in tokens
+    )
+
+
+def in_range(
+        value: Any,
+        low: Any = None,
+        high: Any = None,
+        include_low: bool = True,
+        include_high: bool = True,
+) -> bool:
+    """
+    Проверить, что значение лежит в диапазоне.
+
+    :param value: Проверяемое значение.
+    :param low: Нижняя граница, None — без ограничения.
+    :param high: Верхняя граница, None — без ограничения.
+    :param include_low: Включать ли нижнюю границу.
+    :param include_high: Включать ли верхнюю границу.
+    :returns: Bool — True, если значение попадает в диапазон.
+    """
+    if low is not None and (value < low if include_low else value <= low):
+        return False
+    if high is not None and (
+            value > high if include_high else value >= high
+    ):
+        return False
+    return True
+
+
+class TextIndex:
+    """
+    Инвертированный индекс по описаниям транзакций: основа слова ->
+    ID транзакций. Основы хранятся ещё и в отсортированном списке,
+    поэтому слово из запроса находит все основы, начинающиеся с него.
+    """
+
+    def __init__(self, transactions: Iterable[dict] = ()):
+        self._postings: defaultdict[str, set[str]] = defaultdict(set)
+        self._documents: dict[str, dict] = {}
+        self._order: dict[str, int] = {}
+        for transaction in transactions:
+            self._index(transaction)
+        self._vocabulary = sorted(self._postings)
+
+    def _index(self, transaction: dict) -> list[str]:
+        self._documents[transaction["id"]] = transaction
+        self._order.setdefault(transaction["id"], len(self._order))
+        new_stems = []
+        for token in tokenize(transaction.get("description") or ""):
+            if token not in self._postings:
+                new_stems.append(token)
+            self._postings[token].add(transaction["id"])
+        return new_stems
+
+    def add(self, transaction: dict) -> None:
+        """
+        Добавить транзакцию в индекс.
+
+        :param transaction: Транзакция.
+        """
+        for token in self._index(transaction):
+            insort(self._vocabulary, token)
+
+    def remove(self, transaction: dict) -> None:
+        """
+        Убрать транзакцию из индекса.
+
+        :param transaction: Транзакция в том виде, в котором она была
+         добавлена.
+        """
+        self._documents.pop(transaction["id"], None)
+        for token in tokenize(transaction.get("description") or ""):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(transaction["id"])
+            if not postings:
+                del self._postings[token]
+                position = bisect_left(self._vocabulary, token)
+                del self._vocabulary[position]
+
+    def _match(self, token: str) -> set[str]:
+        matches = set()
+        position = bisect_left(self._vocabulary, token)
+        while (
+                position < len(self._vocabulary)
+                and self._vocabulary[position].startswith(token)
+        ):
+            matches |= self._postings[self._vocabulary[position]]
+            position += 1
+        return matches
+
+    def search(self, query: str) -> list[dict]:
+        """
+        Найти транзакции, в описании которых есть все слова запроса
+        (с точностью до окончания либо как начало слова).
+
+        :param query: Поисковый запрос.
+        :returns: List[dict] — найденные транзакции в порядке добавления.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        found = None
+        for token in sorted(tokens, key=len, reverse=True):
+            matches = self._match(token)
+            found = matches if found is None else found & matches
+            if not found:
+                return []
+        return [
+            self._documents[transaction_id]
+            for transaction_id in sorted(found, key=self._order.__getitem__)
+        ]
+
+
+class SortedIndex:
+    """
+    Индекс транзакций, отсортированных по значению одного поля (дате или
+    сумме). Диапазонный запрос находит границы двоичным поиском и стоит
+    O(log n + k), где k — количество найденных транзакций.
+    """
+
+    def __init__(self, field: str, transactions: Iterable[dict] = ()):
+        self.field = field
+        self._documents: dict[str, dict] = {}
+        self._order: dict[str, int] = {}
+        for transaction in transactions:
+            self._remember(transaction)
+        self._entries: list[tuple[Any, int, str]] = sorted(
+            self._entry(transaction)
+            for transaction in self._documents.values()
+        )
+
+    def _remember(self, transaction: dict) -> None:
+        self._documents[transaction["id"]] = transaction
+        self._order.setdefault(transaction["id"], len(self._order))
+
+    def _entry(self, transaction: dict) -> tuple[Any, int, str]:
+        return (
+            transaction[self.field],
+            self._order[transaction["id"]],
+            transaction["id"],
+        )
+
+    def add(self, transaction: dict) -> None:
+        """
+        Добавить транзакцию в индекс.
+
+        :param transaction: Транзакция.
+        """
+        self._remember(transaction)
+        insort(self._entries, self._entry(transaction))
+
+    def remove(self, transaction: dict) -> None:
+        """
+        Убрать транзакцию из индекса.
+
+        :param transaction: Транзакция в том виде, в котором она была
+         добавлена.
+        """
+        if transaction["id"] not in self._documents:
+            return
+        entry = self._entry(transaction)
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+        del self._documents[transaction["id"]]
+
+    def range(
+            self,
+            low: Any = None,
+            high: Any = None,
+            include_low: bool = True,
+            include_high: bool = True,
+    ) -> list[dict]:
+        """
+        Найти транзакции, значение поля которых лежит в диапазоне.
+
+        :param low: Нижняя граница, None — без ограничения.
+        :param high: Верхняя граница, None — без ограничения.
+        :param include_low: Включать ли нижнюю границу.
+        :param include_high: Включать ли верхнюю границу.
+        :returns: List[dict] — транзакции по возрастанию значения поля.
+        """
+        if low is None:
+            start = 0
+        elif include_low:
+            start = bisect_left(self._entries, (low,))
+        else:
+            start = bisect_right(self._entries, (low, math.inf))
+        if high is None:
+            end = len(self._entries)
+        elif include_high:
+            end = bisect_right(self._entries, (high, math.inf))
+        else:
+            end = bisect_left(self._entries, (high,))
+        return [
+            self._documents[transaction_id]
+            for _, _, transaction_id in self._entries[start:end]
+        ]
+
+
+class BalanceIndex:
+    """
+    Баланс пользователя на любую дату: даты транзакций по возрастанию
+    и баланс на конец каждой из них (префиксные суммы изменений).
+    Баланс на дату находится двоичным поиском за O(log n). Транзакция
+    с самой поздней датой обновляет индекс за O(1), транзакция
+    с более ранней датой — за O(k), где k — количество более поздних
+    дат. Транзакции с датой не в формате ISO не учитываются.
+    """
+
+    def __init__(self, transactions: Iterable[dict] = ()):
+        changes: defaultdict[str, int] = defaultdict(int)
+        self._counts: defaultdict[str, int] = defaultdict(int)
+        for transaction in transactions:
+            change = self._change(transaction)
+            if change is not None:
+                changes[change[0]] += change[1]
+                self._counts[change[0]] += 1
+        self._dates = sorted(changes)
+        self._balances = list(accumulate(map(changes.get, self._dates)))
+
+    @staticmethod
+    def _change(transaction: dict) -> Optional[tuple[str, int]]:
+        day = transaction.get("date")
+        if not isinstance(day, str) or not re.fullmatch(
+                Uc.DATE_PATTERN, day
+        ):
+            return None
+        amount = transaction["amount"]
+        if transaction["category"] == "deposit":
+            return day, amount
+        if transaction["category"] == "withdraw":
+            return day, -amount
+        return day, 0
+
+    def _apply(self, day: str, amount: int, count: int) -> None:
+        position = bisect_left(self._dates, day)
+        if position == len(self._dates) or self._dates[position] != day:
+            self._dates.insert(position, day)
+            self._balances.insert(
+                position, self._balances[position - 1] if position else 0
+            )
+        for later in range(position, len(self._balances)):
+            self._balances[later] += amount
+        self._counts[day] += count
+        if not self._counts[day]:
+            # после даты без транзакций баланс не меняется.
+            del self._counts[day]
+            del self._dates[position]
+            del self._balances[position]
+
+    def add(self, transaction: dict) -> None:
+        """
+        Добавить транзакцию в индекс.
+
+        :param transaction: Транзакция.
+        """
+        change = self._change(transaction)
+        if change is not None:
+            self._apply(*change, 1)
+
+    def remove(self, transaction: dict) -> None:
+        """
+        Убрать транзакцию из индекса.
+
+        :param transaction: Транзакция в том виде, в котором она была
+         добавлена.
+        """
+        change = self._change(transaction)
+        if change is not None and self._counts.get(change[0]):
+            self._apply(change[0], -change[1], -1)
+
+    def balance_at(self, day: str) -> int:
+        """
+        Получить баланс на конец дня.
+
+        :param day: Дата `ГГГГ-ММ-ДД`.
+        :returns: Int — баланс с учётом всех транзакций по эту дату
+         включительно.
+        """
+        position = bisect_right(self._dates, day)
+        return self._balances[position - 1] if position else 0
+
+    def series(
+            self,
+            start: Optional[str] = None,
+            end: Optional[str] = None,
+    ) -> list[tuple[str, int]]:
+        """
+        Получить изменения баланса за промежуток одним срезом.
+
+        :param start: Первая дата, None — с первой транзакции.
+        :param end: Последняя дата, None — до последней транзакции.
+        :returns: List[tuple] — даты и баланс на их конец: сначала
+         начальная дата, если она указана, затем каждая дата
+         промежутка, в которую баланс менялся. Между точками баланс
+         не меняется.
+        """
+        points = []
+        low = 0
+        if start is not None:
+            points.append((start, self.balance_at(start)))
+            low = bisect_right(self._dates, start)
+        high = (
+            len(self._dates) if end is None
+            else bisect_right(self._dates, end)
+        )
+        points.extend(zip(self._dates[low:high], self._balances[low:high]))
+        return points
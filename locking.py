@@ -0,0 +1,95 @@
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, Union
+from weakref import WeakValueDictionary
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_file(file: BinaryIO) -> None:
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return
+    file.seek(0)
+    while True:
+        try:
+            # LK_LOCK сам повторяет попытки около 10 секунд, после чего
+            # выбрасывает OSError — тогда просто ждём дальше.
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(file: BinaryIO) -> None:
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        return
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на основе блокировки файла средствами ОС.
+    Внутри процесса блокировка повторно входима: поток, который уже
+    держит её, может захватить её ещё раз, например, когда хранилище
+    вызывает собственные методы записи.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a+b")
+                _lock_file(self._file)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_file(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._lock.release()
+
+
+_locks: WeakValueDictionary[str, FileLock] = WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+def file_lock(path: Union[str, Path]) -> FileLock:
+    """
+    Получить блокировку для файла. Все объекты процесса, работающие
+    с одним и тем же файлом, получают одну и ту же блокировку.
+
+    :param path: Путь к файлу блокировки.
+    :returns: FileLock — блокировка.
+    """
+    key = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = FileLock(key)
+        return lock
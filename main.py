@@ -1,20 +1,38 @@
+import csv
+import heapq
+import io
 import json
 import re
+import sys
 from datetime import datetime
+from functools import partial
 from hashlib import sha256
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Union
+from typing import Any, Callable, Iterable, Iterator, TextIO, Union
 from uuid import uuid4
 
+from cache import HistoryCache, Signature
 from constants import (
     UtilityConstants as Uc,
     Literals as Lit,
     ErrorLiterals as Err,
     TRANSACTION_FIELDS_MAPPING,
     DEPOSIT_TYPE_MAPPING,
+    CATEGORY_LABELS,
 )
-from decorators import restricted
-from mask_input import mask_input
+from decorators import instrumented, restricted
+from indexes import (
+    BalanceIndex,
+    SortedIndex,
+    TextIndex,
+    in_range,
+    text_matches,
+)
+from models import TransactionColumns, date_to_ordinal, from_cents, to_cents
+from storage import StorageEngine, get_storage
+from writer import get_writer
 
 
 class Wallet:
@@ -23,8 +41,10 @@ class Wallet:
         self.authenticated = False
         self.first_time_logged = True
         self.required_to_show_commands = True
+        self._history_cache = HistoryCache()
 
     @restricted
+    @instrumented()
     def run_transaction(
             self,
             amount: str,
@@ -40,11 +60,11 @@ class Wallet:
         :param _type: Тип транзакции, по умолчанию deposit.
         :param path: Путь к файлу с историей транзакций, по умолчанию
          указывает на файл wallets.json в корневой папке.
-        :param amount: Сумма транзакции в виде строки.
+        :param amount: Сумма транзакции в рублях в виде строки.
         :returns: True если транзакция была выполнена, False в ином случае.
         """
         try:
-            amount = float(amount)
+            amount = to_cents(amount)
         except ValueError:
             print(Err.INVALID_NUMBER)
             return False
@@ -66,30 +86,105 @@ class Wallet:
             )
         print(
             f"{Lit.TRANSACTION_ACCEPTED}"
-            f"{self.get_balance(self._get_history(self.user))}"
+            f"{self.get_balance(path=path)}"
         )
         return True
 
-    @staticmethod
+    @instrumented()
     def _get_history(
+            self,
             user: str,
             path: Union[str, Path] = Uc.WALLETS_LOCATION
     ) -> list[dict]:
         """
         Получить историю транзакций пользователя. Метод не должен
         использоваться внешними модулями, вместо этого используйте
-        print_history().
+        print_history(). Повторные вызовы отдают историю из кэша, пока
+        файл пользователя не изменился.
 
         :param user: Пользователь, для которого нужно получить историю.
         :param path: Путь к файлу с историей транзакций, по умолчанию
          указывает на файл wallets.json в корневой папке.
         :returns: List[dict] - история транзакций.
         """
-        with open(path, "r") as file:
-            data = json.loads(file.read())
-            return [item for item in data if item["user"] == user]
+        return list(self._iter_history(user, path))
+
+    def _iter_history(
+            self,
+            user: str,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION
+    ) -> Iterable[dict]:
+        """
+        Последовательно прочитать историю транзакций пользователя, не
+        загружая её в память целиком. Если история есть в кэше, она
+        отдаётся из него в виде столбцов (TransactionColumns); иначе
+        читается из хранилища и попадает в кэш, только если в ней
+        не больше `HISTORY_CACHE_MAX_ITEMS` транзакций.
+
+        :param user: Пользователь, для которого нужно получить историю.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: Iterable[dict] - транзакции пользователя по порядку.
+        """
+        storage = get_storage(path)
+        signature = storage.signature(user)
+        history = self._history_cache.get(path, user, signature)
+        if history is not None:
+            return history
+        return self._read_history(storage, user, path, signature)
+
+    def _read_history(
+            self,
+            storage: StorageEngine,
+            user: str,
+            path: Union[str, Path],
+            signature: Signature,
+    ) -> Iterator[dict]:
+        collected = []
+        for item in storage.iter_transactions(user):
+            if collected is not None:
+                collected.append(item)
+                if len(collected) > Uc.HISTORY_CACHE_MAX_ITEMS:
+                    collected = None
+            yield item
+        if collected is not None:
+            self._history_cache.put(path, user, signature, collected)
+
+    def _get_index(
+            self,
+            user: str,
+            path: Union[str, Path],
+            name: str,
+            factory: Callable[[list[dict]], Any],
+    ) -> Any:
+        """
+        Получить индекс по истории пользователя. Индекс строится один раз
+        по истории, прочитанной из хранилища потоком, и дальше обновляется
+        при записи и редактировании транзакций через кошелёк. Как и
+        в _read_history(), история с индексом попадает в кэш, только если
+        в ней не больше `HISTORY_CACHE_MAX_ITEMS` транзакций; иначе индекс
+        строится при каждом обращении.
+
+        :param user: Пользователь, которому принадлежит история.
+        :param path: Путь к файлу с историей транзакций.
+        :param name: Название индекса.
+        :param factory: Функция, строящая индекс по истории.
+        :returns: Индекс по истории пользователя.
+        """
+        storage = get_storage(path)
+        signature = storage.signature(user)
+        index = self._history_cache.get_index(
+            path, user, signature, name, factory
+        )
+        if index is None:
+            index = factory(
+                self._read_history(storage, user, path, signature)
+            )
+            self._history_cache.put_index(path, user, signature, name, index)
+        return index
 
     @staticmethod
+    @instrumented()
     def _get_transaction_by_id(
             user: str,
             transaction_id: str,
@@ -104,104 +199,445 @@ class Wallet:
          указывает на файл wallets.json в корневой папке.
         :returns: Dict - транзакция или False, если она не существует.
         """
-        with open(path, "r") as file:
-            data = json.loads(file.read())
-            try:
-                return next(
-                    item
-                    for item in data
-                    if item["id"] == transaction_id and item["user"] == user
-                )
-            except StopIteration:
-                return False
+        return get_storage(path).get_transaction(user, transaction_id) or False
 
     @restricted
+    @instrumented()
     def print_history(
             self,
-            history: list,
+            history: Iterable[dict],
             message: str = Lit.TRANSACTION_HISTORY,
             mode: str = "all",
+            page: int = None,
+            page_size: int = Uc.HISTORY_PAGE_SIZE,
+            stream: TextIO = None,
     ) -> str:
         """
         Вывести историю транзакций пользователя в терминал.
 
-        :param history: История транзакций пользователя.
+        :param history: История транзакций пользователя, в том числе
+         ленивая — она читается один раз по мере вывода.
         :param message: Сообщение, которое будет выведено перед историей,
          по умолчанию равно "История ваших транзакций".
         :param mode: Режим вывода истории, по умолчанию равен "all".
          Всего доступно 3 режима: все транзакции (режим `all`), только
          пополнения (режим `deposit`), и только снятия (режим `withdraw`).
+        :param page: Номер страницы, начиная с 1. Если не указан, выводится
+         вся история.
+        :param page_size: Количество транзакций на странице.
+        :param stream: Поток, в который транзакции пишутся по мере чтения.
+         Если указан, метод возвращает пустую строку.
         :returns: Str — сообщение с историей транзакций, либо фраза
          "Ничего не найдено", если подходящие транзакции не были найдены.
         """
+        if page_size < 1 or page is not None and page < 1:
+            return Err.INVALID_PAGE
+        filtered = self._filter_history(history, mode, message)
+        if filtered is None:
+            return Err.UNKNOWN_MODE
+        message, history = filtered
+        if page is not None:
+            history = islice(
+                history, (page - 1) * page_size, page * page_size
+            )
+        output = io.StringIO() if stream is None else stream
+        if not self._write_history(history, output, message):
+            return Err.NOTHING_FOUND
+        return output.getvalue() if stream is None else ""
+
+    @staticmethod
+    def _filter_history(
+            history: Iterable[dict],
+            mode: str,
+            message: str = Lit.TRANSACTION_HISTORY,
+    ) -> Union[tuple[str, Iterator[dict]], None]:
+        """
+        Отфильтровать историю по режиму вывода.
+
+        :param history: История транзакций пользователя.
+        :param mode: Режим вывода: `all`, `deposit` или `withdraw`.
+        :param message: Заголовок для режима `all`.
+        :returns: Tuple — заголовок и отфильтрованная история, либо None,
+         если режим неизвестен.
+        """
         match mode:
             case "all":
-                pass
+                return message, iter(history)
             case "deposit":
-                message = Lit.DEPOSIT_HISTORY
-                history = (
-                    item for item in history if item["category"] == "deposit"
+                return Lit.DEPOSIT_HISTORY, Wallet._select_category(
+                    history, "deposit"
                 )
             case "withdraw":
-                message = Lit.WITHDRAWAL_HISTORY
-                history = (
-                    item for item in history if item["category"] == "withdraw"
+                return Lit.WITHDRAWAL_HISTORY, Wallet._select_category(
+                    history, "withdraw"
                 )
-            case _:
-                return Err.UNKNOWN_MODE
-        if not history:
-            return Err.NOTHING_FOUND
-        output_string = f"{message}" + "\n\n".join(
-            [
-                "\n".join(
-                    [
-                        f"{TRANSACTION_FIELDS_MAPPING.get(key, key)}: {value}"
-                        for key, value in item.items()
-                        if key not in "user"
-                    ]
-                )
-                + "\n"
-                for item in history
-            ]
-        ).replace("deposit", "Доход").replace("withdraw", "Расход")
-        return output_string
+        return None
+
+    @staticmethod
+    def _select_category(
+            history: Iterable[dict],
+            category: str,
+    ) -> Iterator[dict]:
+        """
+        Отобрать транзакции категории. История по столбцам отбирается
+        по кодам категорий, и транзакции создаются только подходящие.
+
+        :param history: История транзакций пользователя.
+        :param category: Категория транзакций.
+        :returns: Iterator[dict] — транзакции категории по порядку.
+        """
+        if isinstance(history, TransactionColumns):
+            return history.filter(category)
+        return (item for item in history if item["category"] == category)
+
+    @staticmethod
+    def _format_transaction(
+            transaction: dict,
+            hidden: tuple[str, ...] = ("user",),
+    ) -> str:
+        """
+        Представить транзакцию в виде текста, по полю на строку.
+
+        :param transaction: Транзакция.
+        :param hidden: Поля, которые не нужно выводить.
+        :returns: Str — текст транзакции.
+        """
+        lines = []
+        for key, value in transaction.items():
+            if key in hidden:
+                continue
+            if key == "category":
+                value = CATEGORY_LABELS.get(value, value)
+            elif key == "amount":
+                value = from_cents(value)
+            lines.append(
+                f"{TRANSACTION_FIELDS_MAPPING.get(key, key)}: {value}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _write_history(
+            history: Iterable[dict],
+            stream: TextIO,
+            message: str = "",
+    ) -> int:
+        """
+        Записать транзакции в поток по одной, не собирая вывод целиком.
+
+        :param history: Транзакции для вывода.
+        :param stream: Поток для записи.
+        :param message: Заголовок, который пишется перед первой транзакцией.
+        :returns: Int — количество записанных транзакций.
+        """
+        written = 0
+        for item in history:
+            stream.write("\n" if written else message)
+            stream.write(Wallet._format_transaction(item) + "\n")
+            written += 1
+        return written
+
+    def _page_history(
+            self,
+            mode: str,
+            page_size: int = Uc.HISTORY_PAGE_SIZE,
+            stream: TextIO = None,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> int:
+        """
+        Постранично вывести историю текущего пользователя. История
+        читается лениво, в памяти держится не больше одной страницы.
+
+        :param mode: Режим вывода: `all`, `deposit` или `withdraw`.
+        :param page_size: Количество транзакций на странице.
+        :param stream: Поток для вывода, по умолчанию stdout.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: Int — количество выведенных транзакций.
+        """
+        stream = stream or sys.stdout
+        if page_size < 1:
+            print(Err.INVALID_PAGE, file=stream)
+            return 0
+        filtered = self._filter_history(
+            self._iter_history(self.user, path), mode
+        )
+        if filtered is None:
+            print(Err.UNKNOWN_MODE, file=stream)
+            return 0
+        message, history = filtered
+        shown = 0
+        pending = []
+        while True:
+            page = pending + list(
+                islice(history, page_size + 1 - len(pending))
+            )
+            if not page:
+                print(Err.NOTHING_FOUND, file=stream)
+                return shown
+            shown += self._write_history(
+                page[:page_size], stream, "" if shown else message
+            )
+            pending = page[page_size:]
+            if not pending or input(Lit.HISTORY_NEXT_PAGE).strip():
+                return shown
 
     @restricted
-    def get_balance(self, history: list[dict]) -> str:
+    @instrumented()
+    def get_balance(
+            self,
+            history: Iterable[dict] = None,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> str:
         """
         Вывести в терминал текущий баланс пользователя.
 
-        :param history: История транзакций пользователя.
+        :param history: История транзакций пользователя. Если не указана,
+         баланс берётся из итогов, сохранённых рядом с транзакциями, без
+         чтения истории.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
         :returns: Str — текущий баланс пользователя.
         """
+        if history is None:
+            totals = get_storage(path).get_totals(self.user)
+            return Lit.CURRENT_BALANCE.format(
+                from_cents(totals["net"]),
+                from_cents(totals["deposits"]),
+                from_cents(totals["withdrawals"]),
+            )
         deposits = 0
         withdraws = 0
         try:
-            for item in history:
-                if item["category"] == "deposit":
-                    deposits += item["amount"]
-                elif item["category"] == "withdraw":
-                    withdraws += item["amount"]
+            if isinstance(history, TransactionColumns):
+                # по столбцам суммы считаются без создания транзакций.
+                deposits = history.total("deposit")
+                withdraws = history.total("withdraw")
+            else:
+                for item in history:
+                    if item["category"] == "deposit":
+                        deposits += item["amount"]
+                    elif item["category"] == "withdraw":
+                        withdraws += item["amount"]
             return Lit.CURRENT_BALANCE.format(
-                float(deposits - withdraws), float(deposits), float(withdraws)
+                from_cents(deposits - withdraws),
+                from_cents(deposits),
+                from_cents(withdraws),
             )
         except FileNotFoundError:  # для подстраховки на случай первого запуска
             return Lit.CURRENT_BALANCE.format(0.0)
 
-    @staticmethod
+    @restricted
+    @instrumented()
+    def balance_at(
+            self,
+            day: str,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[int, str]:
+        """
+        Получить баланс пользователя на конец указанного дня. Баланс
+        берётся из индекса префиксных сумм по датам, который строится
+        один раз и дальше обновляется при записи и редактировании
+        транзакций.
+
+        :param day: Дата `ГГГГ-ММ-ДД`.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: Int — баланс в копейках, либо сообщение об ошибке.
+        """
+        day = day.strip()
+        if not re.fullmatch(Uc.DATE_PATTERN, day):
+            return Err.INVALID_DATE
+        return self._get_index(
+            self.user, path, "balance", BalanceIndex
+        ).balance_at(day)
+
+    @restricted
+    @instrumented()
+    def balance_series(
+            self,
+            start: str = "",
+            end: str = "",
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[list[tuple[str, int]], str]:
+        """
+        Получить изменения баланса пользователя за промежуток дат.
+
+        :param start: Первая дата `ГГГГ-ММ-ДД`, пустая строка — с первой
+         транзакции.
+        :param end: Последняя дата, пустая строка — до последней
+         транзакции.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: List[tuple] — даты и баланс на их конец в копейках
+         (сначала начальная дата, затем каждая дата, в которую баланс
+         менялся), либо сообщение об ошибке.
+        """
+        start, end = start.strip(), end.strip()
+        for bound in (start, end):
+            if bound and not re.fullmatch(Uc.DATE_PATTERN, bound):
+                return Err.INVALID_DATE
+        return self._get_index(
+            self.user, path, "balance", BalanceIndex
+        ).series(start or None, end or None)
+
+    @restricted
+    @instrumented()
+    def get_report(
+            self,
+            period: str = "month",
+            start: str = "",
+            end: str = "",
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[list[dict], str]:
+        """
+        Получить доходы, расходы и баланс пользователя по периодам.
+        Итоги берутся из сводок, сохранённых рядом с транзакциями, без
+        чтения истории.
+
+        :param period: Период: `day`, `month` или `year`.
+        :param start: Начало отчёта: `ГГГГ`, `ГГГГ-ММ` или `ГГГГ-ММ-ДД`,
+         пустая строка — без ограничения. В отчёт попадают периоды,
+         которые пересекаются с промежутком от начала до конца.
+        :param end: Конец отчёта в том же виде.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: List[dict] — период (`period`), доходы (`deposits`),
+         расходы (`withdrawals`) и баланс (`net`) в копейках в порядке
+         возрастания периода, либо сообщение об ошибке.
+        """
+        if period not in Uc.REPORT_PERIODS:
+            return Err.UNKNOWN_MODE
+        start, end = start.strip(), end.strip()
+        for bound in (start, end):
+            if bound and not re.fullmatch(Uc.REPORT_BOUND_PATTERN, bound):
+                return Err.INVALID_DATE
+        # ключ периода и граница — начала даты, поэтому сравниваются
+        # по общей длине: месяц попадает в отчёт, если в нём лежит любой
+        # день промежутка, а день — если лежит в месяце или году границы.
+        return [
+            dict(period=key, **totals)
+            for key, totals in get_storage(path).get_rollups(
+                self.user, period
+            ).items()
+            if key[:len(start)] >= start[:len(key)]
+            and (not end or key[:len(end)] <= end[:len(key)])
+        ]
+
+    @restricted
+    def report(
+            self,
+            period: str = "month",
+            start: str = "",
+            end: str = "",
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> str:
+        """
+        Вывести в терминал отчёт о доходах, расходах и балансе по
+        периодам. Параметры описаны в get_report().
+
+        :returns: Str — отчёт, либо сообщение об ошибке.
+        """
+        rows = self.get_report(period, start, end, path)
+        if isinstance(rows, str):
+            return rows
+        if not rows:
+            return Err.NOTHING_FOUND
+        return Lit.REPORT_HEADER + "\n".join(
+            Lit.REPORT_LINE.format(
+                row["period"],
+                from_cents(row["deposits"]),
+                from_cents(row["withdrawals"]),
+                from_cents(row["net"]),
+            )
+            for row in rows
+        )
+
+    @restricted
+    @instrumented()
+    def get_top(
+            self,
+            category: str = "withdraw",
+            count: int = Uc.TOP_COUNT,
+            start: str = "",
+            end: str = "",
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[list[dict], str]:
+        """
+        Найти самые крупные доходы или расходы пользователя. История не
+        сортируется целиком: транзакции отбираются кучей из `count`
+        позиций по мере чтения, а закэшированная история — прямо по
+        столбцам.
+
+        :param category: Категория: `deposit` или `withdraw`.
+        :param count: Количество транзакций.
+        :param start: Первая дата `ГГГГ-ММ-ДД`, пустая строка — без
+         ограничения.
+        :param end: Последняя дата, пустая строка — без ограничения.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: List[dict] — транзакции по убыванию суммы, либо
+         сообщение об ошибке.
+        """
+        if category not in DEPOSIT_TYPE_MAPPING:
+            return Err.INVALID_CATEGORY
+        start, end = start.strip() or None, end.strip() or None
+        for bound in (start, end):
+            if bound is not None and not re.fullmatch(
+                    Uc.DATE_PATTERN, bound
+            ):
+                return Err.INVALID_DATE
+        history = self._iter_history(self.user, path)
+        if isinstance(history, TransactionColumns):
+            found = history.top(category, count, start, end)
+            if found is not None:
+                return found
+        return heapq.nlargest(
+            count,
+            (
+                transaction for transaction in history
+                if transaction["category"] == category
+                and in_range(transaction["date"], start, end)
+            ),
+            key=itemgetter("amount"),
+        )
+
+    @restricted
+    def top(
+            self,
+            category: str = "withdraw",
+            count: int = Uc.TOP_COUNT,
+            start: str = "",
+            end: str = "",
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> str:
+        """
+        Вывести в терминал самые крупные доходы или расходы
+        пользователя. Параметры описаны в get_top().
+
+        :returns: Str — найденные транзакции, либо сообщение об ошибке.
+        """
+        found = self.get_top(category, count, start, end, path)
+        if isinstance(found, str):
+            return found
+        return self.print_history(history=found, message=Lit.TOP_HEADER)
+
+    @instrumented()
     def _write_to_file(
+            self,
             user: str,
-            amount: float,
+            amount: int,
             category: str,
             description: str,
             encoding: str = "utf-8",
             path: Union[str, Path] = Uc.WALLETS_LOCATION,
-    ) -> tuple[dict[str, str | float]]:
+    ) -> tuple[dict[str, str | int]]:
         """
-        Записать совершенную транзакцию в файл.
+        Записать совершенную транзакцию в хранилище. Если файл является
+        журналом (`.jsonl`), транзакция дописывается в его конец без
+        перезаписи остальных данных.
 
         :param user: Пользователь, совершивший транзакцию.
-        :param amount: Сумма транзакции.
+        :param amount: Сумма транзакции в копейках.
         :param category: Категория транзакции (доход либо расход).
         :param description: Описание транзакции, указанное пользователем.
         :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
@@ -209,7 +645,6 @@ class Wallet:
          указывает на файл wallets.json в корневой папке.
         :returns: Словарь с информацией о совершенной транзакции.
         """
-        data = []
         json_data = (
             dict(
                 id=str(uuid4()),
@@ -220,39 +655,274 @@ class Wallet:
                 description=description,
             ),
         )
-        try:
-            with open(path, "r", encoding=encoding) as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            pass  # для подстраховки на случай первого запуска
-        except json.JSONDecodeError:
-            pass  # для подстраховки на случай первого запуска
-        data.extend(json_data)
-        with open(path, "w", encoding=encoding) as file:
-            json.dump(data, file, indent=4)
+        self._save_transactions(user, json_data, encoding, path)
         return json_data
 
+    def _save_transactions(
+            self,
+            user: str,
+            transactions: Iterable[dict],
+            encoding: str = "utf-8",
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> None:
+        """
+        Сохранить транзакции пользователя в хранилище одной записью и
+        учесть их в кэше историй. Транзакции, которые одновременно
+        сохраняют другие потоки, записываются вместе с ними.
+
+        :param user: Пользователь, совершивший транзакции.
+        :param transactions: Транзакции для сохранения.
+        :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        """
+        get_writer(path, encoding).submit(
+            user, transactions, partial(self._history_cache.extend, path, user)
+        )
+
     @restricted
-    def search(self, mode: str, user_input: str, history: list[dict]) -> str:
+    def import_transactions(
+            self,
+            source: Union[str, Path, Iterable[dict]],
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+            encoding: str = "utf-8",
+    ) -> dict[str, int | list[tuple[int, str]]]:
+        """
+        Импортировать транзакции текущего пользователя пачкой. Каждая
+        строка проверяется по тем же правилам, что и при редактировании,
+        а все корректные строки сохраняются в хранилище одной записью.
+
+        :param source: Путь к файлу `.csv` (с заголовком) или `.jsonl`,
+         либо последовательность словарей с полями `date`, `category`,
+         `amount` и `description`. Если дата не указана, используется
+         текущая.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :param encoding: Кодировка файлов, по умолчанию равна `utf-8`.
+        :returns: Dict — количество принятых строк (`accepted`) и список
+         отклонённых строк с номером и причиной (`rejected`).
+        :raises OSError: Если файл не удалось открыть или прочитать.
+        """
+        today = datetime.now().date().isoformat()
+        accepted = []
+        rejected = []
+        for number, row in enumerate(
+                self._read_import_source(source, encoding), start=1
+        ):
+            if not isinstance(row, dict):
+                rejected.append((number, Err.INVALID_IMPORT_ROW))
+                continue
+            values = {
+                field: row.get(field) or ""
+                for field in TRANSACTION_FIELDS_MAPPING
+            }
+            try:
+                error = (
+                    Err.MISSING_REQUIRED_FIELDS
+                    if not values["amount"] or not values["category"]
+                    else self._validate_transaction_fields(values)
+                )
+            except TypeError:  # например, дата или категория — не строка
+                error = Err.INVALID_IMPORT_ROW
+            if error:
+                rejected.append((number, error))
+                continue
+            accepted.append(
+                dict(
+                    id=str(uuid4()),
+                    user=self.user,
+                    date=values["date"] or today,
+                    category=values["category"],
+                    amount=values["amount"],
+                    description=values["description"],
+                )
+            )
+        if accepted:
+            self._save_transactions(self.user, accepted, encoding, path)
+        return dict(accepted=len(accepted), rejected=rejected)
+
+    @staticmethod
+    def _print_import_result(
+            result: dict[str, int | list[tuple[int, str]]],
+    ) -> bool:
+        """
+        Вывести итоги импорта: отклонённые строки и количество принятых.
+
+        :param result: Результат import_transactions().
+        :returns: Bool — True, если была принята хотя бы одна строка.
+        """
+        for number, error in result["rejected"]:
+            print(Lit.IMPORT_ROW_REJECTED.format(number, error))
+        print(
+            Lit.IMPORT_RESULT.format(
+                result["accepted"], len(result["rejected"])
+            )
+        )
+        return bool(result["accepted"])
+
+    @staticmethod
+    def _read_import_source(
+            source: Union[str, Path, Iterable[dict]],
+            encoding: str = "utf-8",
+    ) -> Iterable[dict]:
+        """
+        Прочитать строки для импорта из файла либо последовательности.
+
+        :param source: Путь к файлу `.csv` или `.jsonl`, либо
+         последовательность словарей.
+        :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+        :returns: Iterable[dict] — строки для импорта; вместо строки
+         `.jsonl`, которая не разбирается как JSON, возвращается None.
+        """
+        if not isinstance(source, (str, Path)):
+            yield from source
+            return
+        with open(source, "r", encoding=encoding, newline="") as file:
+            if Path(source).suffix == ".csv":
+                yield from csv.DictReader(file)
+            else:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield None
+
+    @restricted
+    @instrumented()
+    def search(
+            self,
+            mode: str,
+            user_input: str,
+            history: Iterable[dict] = None,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> str:
         """
         Поиск по истории транзакций пользователя.
 
         :param mode: Режим поиска. Доступны следующие варианты:
          `Дата`, `Категория`, `Сумма`, `Описание`.
         :param user_input: Значение для поиска, введённое пользователем.
-        :param history: История, в которой следует производить поиск.
+        :param history: История, в которой следует производить поиск. Если
+         не указана, поиск выполняется хранилищем по истории текущего
+         пользователя.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
         :returns: Str — результат поиска. При отсутствии результатов
-         возвращается строка "Ничего не найдено".
+         возвращается строка "Ничего не найдено". Поиск по описанию
+         находит транзакции, в описании которых встречаются все слова
+         запроса, без учёта регистра и окончаний. Дату и сумму можно
+         искать по диапазону: `от..до`, `>=значение`, `<=значение`,
+         `>значение`, `<значение`; результаты сортируются по возрастанию.
         """
-        if user_input.isdigit():
-            user_input = float(user_input)  # для того чтобы преобразовать
-            # значение пользователя в число, подобно тому, как оно хранится
-            # в истории.
-        results = [res for res in history if res.get(mode) == user_input]
+        results = self._find_transactions(mode, user_input, history, path)
+        if isinstance(results, str):
+            return results
         if results:
             return self.print_history(history=results)
+        return Err.NOTHING_FOUND
+
+    def _find_transactions(
+            self,
+            mode: str,
+            user_input: str,
+            history: Iterable[dict] = None,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[list[dict], str]:
+        """
+        Найти транзакции текущего пользователя. Правила поиска описаны
+        в search().
+
+        :param mode: Поле для поиска.
+        :param user_input: Значение для поиска, введённое пользователем.
+        :param history: История, в которой следует производить поиск. Если
+         не указана, поиск выполняется по индексам либо хранилищем.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: List[dict] — найденные транзакции, либо сообщение об
+         ошибке, если значение для поиска некорректно.
+        """
+        if mode == "description":
+            if history is None:
+                return self._get_index(
+                    self.user, path, "text", TextIndex
+                ).search(user_input)
+            # переданную историю индексировать незачем: она
+            # просматривается один раз.
+            return [
+                transaction for transaction in history
+                if text_matches(user_input, transaction.get("description"))
+            ]
+        if mode in Uc.RANGE_SEARCH_FIELDS:
+            bounds = self._parse_range(mode, user_input)
+            if isinstance(bounds, str):
+                return bounds
+            if history is None:
+                return self._get_index(
+                    self.user, path, mode, partial(SortedIndex, mode)
+                ).range(*bounds)
+            if isinstance(history, TransactionColumns):
+                found = history.range(mode, *bounds)
+                if found is not None:
+                    return found
+            return sorted(
+                (
+                    transaction for transaction in history
+                    if in_range(transaction[mode], *bounds)
+                ),
+                key=itemgetter(mode),
+            )
+        if history is None:
+            return get_storage(path).find_transactions(
+                self.user, mode, user_input
+            )
+        return [res for res in history if res.get(mode) == user_input]
+
+    @staticmethod
+    def _parse_range(
+            mode: str,
+            user_input: str,
+    ) -> Union[tuple[str | int | None, str | int | None, bool, bool], str]:
+        """
+        Разобрать диапазон для поиска по дате или сумме.
+
+        :param mode: Поле для поиска: `date` или `amount`.
+        :param user_input: Значение, введённое пользователем: точное
+         значение, `от..до` (любую из границ можно опустить), `>=`, `<=`,
+         `>` или `<` со значением.
+        :returns: Tuple — нижняя и верхняя границы (None — без
+         ограничения, суммы — в копейках) и признаки включения границ,
+         либо сообщение об ошибке.
+        """
+        value = user_input.strip()
+        include_low = include_high = True
+        if ".." in value:
+            low, high = value.split("..", 1)
+        elif value.startswith(">="):
+            low, high = value[2:], ""
+        elif value.startswith("<="):
+            low, high = "", value[2:]
+        elif value.startswith(">"):
+            low, high, include_low = value[1:], "", False
+        elif value.startswith("<"):
+            low, high, include_high = "", value[1:], False
         else:
-            return Err.NOTHING_FOUND
+            low = high = value
+        bounds = []
+        for bound in (low.strip(), high.strip()):
+            if not bound:
+                bounds.append(None)
+            elif mode == "amount":
+                try:
+                    bounds.append(to_cents(bound))
+                except ValueError:
+                    return Err.INVALID_NUMBER
+            elif re.fullmatch(Uc.DATE_PATTERN, bound):
+                bounds.append(bound)
+            else:
+                return Err.INVALID_DATE
+        return bounds[0], bounds[1], include_low, include_high
 
     @staticmethod
     def _match_search_mode(mode: str) -> str:
@@ -265,8 +935,10 @@ class Wallet:
         match mode:
             case "date":
                 print(Lit.DATE_EXAMPLE)
+                print(Lit.DATE_RANGE_EXAMPLE)
             case "amount":
                 print(Lit.AMOUNT_EXAMPLE)
+                print(Lit.AMOUNT_RANGE_EXAMPLE)
             case "category":
                 print(Lit.CATEGORY_EXAMPLE)
             case "description":
@@ -274,6 +946,7 @@ class Wallet:
         return mode
 
     @restricted
+    @instrumented()
     def edit_transaction(
             self,
             transaction_id: str,
@@ -291,51 +964,108 @@ class Wallet:
         :returns: Dict — отредактированная транзакция в случае успеха, либо
          `False`, если произошла ошибка при редактировании.
         """
-        with open(path, "r") as file:
-            data: list[dict] = json.load(file)
         transaction_to_edit = self._get_transaction_by_id(
             user=user, transaction_id=transaction_id, path=path
         )
         if not transaction_to_edit:
             print(Err.TRANSACTION_NOT_FOUND)
             return False
-        newline = "\n"
         print(Lit.TRANSACTION_CURRENT_DATA)
         print(
-            f"{newline}".join(
-                [
-                    f"{TRANSACTION_FIELDS_MAPPING.get(key, key)}: {value}"
-                    for key, value in transaction_to_edit.items()
-                    if key != "user" and key != "id"
-                ]
+            self._format_transaction(
+                transaction_to_edit, hidden=("user", "id")
             )
-            .replace("deposit", "Доход")
-            .replace("withdraw", "Расход")
         )
         values_to_edit = self._get_values_to_edit(
             fields=list(TRANSACTION_FIELDS_MAPPING.keys()),
         )
         if self._run_edit_checkups(values_to_edit):
-            for entry in data:
-                for key, value in values_to_edit.items():
-                    if (
-                            entry["id"] == transaction_id
-                            and value
-                            and key in transaction_to_edit.keys()
-                    ):
-                        entry[key] = value
-                        print(
-                            Lit.TRANSACTION_FIELD_CHANGED.format(
-                                TRANSACTION_FIELDS_MAPPING[key], f'"{value}"'
-                            )
-                        )
-            with open(path, "w") as file:
-                file.write(json.dumps(data, indent=4))
+            changes = {
+                key: value
+                for key, value in values_to_edit.items()
+                if value and key in transaction_to_edit.keys()
+            }
+            for key, value in changes.items():
+                # сумма уже переведена в копейки, выводится в рублях.
+                if key == "amount":
+                    value = from_cents(value)
+                print(
+                    Lit.TRANSACTION_FIELD_CHANGED.format(
+                        TRANSACTION_FIELDS_MAPPING[key], f'"{value}"'
+                    )
+                )
+            self._apply_changes(user, transaction_id, changes, path)
             print(Lit.TRANSACTION_SUCCESSFULLY_EDITED)
             return True
         else:
             return False
 
+    @restricted
+    @instrumented()
+    def update_transaction(
+            self,
+            transaction_id: str,
+            values: dict,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[dict, str]:
+        """
+        Изменить транзакцию текущего пользователя без диалога
+        с пользователем.
+
+        :param transaction_id: ID транзакции.
+        :param values: Новые значения полей `date`, `category`, `amount`
+         и `description`; пустые и отсутствующие поля не меняются.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: Dict — изменённая транзакция, либо сообщение об ошибке.
+        """
+        if "id" in values:
+            return Err.ID_CANNOT_BE_CHANGED
+        values = {
+            field: values.get(field) or ""
+            for field in TRANSACTION_FIELDS_MAPPING
+        }
+        error = self._validate_transaction_fields(values)
+        if error:
+            return error
+        edited = self._apply_changes(
+            self.user,
+            transaction_id,
+            {key: value for key, value in values.items() if value},
+            path,
+        )
+        return Err.TRANSACTION_NOT_FOUND if edited is None else edited
+
+    def _apply_changes(
+            self,
+            user: str,
+            transaction_id: str,
+            changes: dict,
+            path: Union[str, Path] = Uc.WALLETS_LOCATION,
+    ) -> Union[dict, None]:
+        """
+        Сохранить проверенные изменения транзакции и учесть их в кэше
+        историй.
+
+        :param user: Пользователь, совершивший транзакцию.
+        :param transaction_id: ID транзакции.
+        :param changes: Новые значения полей.
+        :param path: Путь к файлу с историей транзакций, по умолчанию
+         указывает на файл wallets.json в корневой папке.
+        :returns: Dict — изменённая транзакция, либо None, если она
+         не найдена.
+        """
+        storage = get_storage(path)
+        with storage.lock:
+            signature = storage.signature(user)
+            edited = storage.update_transaction(user, transaction_id, changes)
+            new_signature = storage.signature(user)
+        if edited is not None:
+            self._history_cache.update(
+                path, user, signature, new_signature, edited
+            )
+        return edited
+
     @staticmethod
     def _run_edit_checkups(transaction_to_edit: dict) -> Union[dict, bool]:
         """
@@ -344,43 +1074,52 @@ class Wallet:
         :param transaction_to_edit: Данные транзакции для редактирования.
         :returns: Транзакция, если данные корректны, иначе — False.
         """
-        if "id" in transaction_to_edit:
-            print(Err.ID_CANNOT_BE_CHANGED)
+        error = Wallet._validate_transaction_fields(transaction_to_edit)
+        if error:
+            print(error)
             return False
-        if transaction_to_edit["amount"]:
+        return transaction_to_edit
+
+    @staticmethod
+    def _validate_transaction_fields(values: dict) -> Union[str, None]:
+        """
+        Проверить значения полей транзакции. Пустые значения считаются
+        неизменёнными и не проверяются. Сумма в рублях переводится
+        в копейки на месте.
+
+        :param values: Значения полей транзакции.
+        :returns: Str — сообщение об ошибке, либо None, если значения
+         корректны.
+        """
+        if "id" in values:
+            return Err.ID_CANNOT_BE_CHANGED
+        if values["amount"]:
             try:
-                transaction_to_edit["amount"] = float(
-                    transaction_to_edit["amount"]
-                )
+                values["amount"] = to_cents(values["amount"])
             except ValueError:
-                print(Err.INVALID_NUMBER)
-                return False
+                return Err.INVALID_NUMBER
         if (
-                transaction_to_edit["category"]
-                and transaction_to_edit["category"]
-                not in DEPOSIT_TYPE_MAPPING.keys()
+                values["category"]
+                and values["category"] not in DEPOSIT_TYPE_MAPPING.keys()
         ):
-            print(Err.INVALID_CATEGORY)
-            return False
-        if transaction_to_edit["date"] and not re.match(
-                r"([12]\d{3}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01]))",
-                transaction_to_edit["date"],
+            return Err.INVALID_CATEGORY
+        # шаблон пропускает несуществующие даты вроде 2024-02-31.
+        if values["date"] and not (
+                re.fullmatch(Uc.DATE_PATTERN, values["date"])
+                and date_to_ordinal(values["date"])
         ):
-            print(Err.INVALID_DATE)
-            return False
+            return Err.INVALID_DATE
         if (
-                transaction_to_edit["description"]
-                and len(transaction_to_edit["description"])
-                > Uc.DESCRIPTION_MAX_LENGTH
+                values["description"]
+                and len(values["description"]) > Uc.DESCRIPTION_MAX_LENGTH
         ):
-            print(Err.DESCRIPTION_TOO_LONG)
-            return False
-        return transaction_to_edit
+            return Err.DESCRIPTION_TOO_LONG
+        return None
 
     @staticmethod
     def _get_values_to_edit(
             fields: list[str],
-    ) -> dict[str, str | float | None]:
+    ) -> dict[str, str | None]:
         values_to_edit = {}
         print(Lit.FIELDS_TO_CHANGE_PROMPT)
         for field in fields:
@@ -410,6 +1149,7 @@ class Wallet:
         return values_to_edit
 
     @staticmethod
+    @instrumented()
     def register(
             user: str,
             password: str,
@@ -428,35 +1168,13 @@ class Wallet:
          если пользователь с таким логином уже существует, то возвращается
           сообщение об ошибке.
         """
-        try:
-            with open(path, "r") as file:
-                users = json.load(file)
-                for user_data in users:
-                    if user_data["user"] == user:
-                        print(Err.USER_ALREADY_EXISTS)
-                        return Err.USER_ALREADY_EXISTS
-        except FileNotFoundError:
-            pass  # подстраховка для первого запуска.
-        except json.decoder.JSONDecodeError:
-            pass  # аналогично
-        data = []
-        user_data = dict(
-            user=user,
-            password=sha256(password.encode()).hexdigest(),
-        )
-        try:
-            with open(path, "r", encoding=encoding) as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            pass  # подстраховка для первого запуска.
-        except json.decoder.JSONDecodeError:
-            pass  # аналогично
-        data.append(user_data)
-        with open(path, "w") as file:
-            json.dump(data, file, indent=4)
-            print(Lit.REGISTRATION_SUCCESSFUL.format(user))
+        if not Wallet._create_user(user, password, path, encoding):
+            print(Err.USER_ALREADY_EXISTS)
+            return Err.USER_ALREADY_EXISTS
+        print(Lit.REGISTRATION_SUCCESSFUL.format(user))
         return user
 
+    @instrumented()
     def auth(
             self,
             user: str,
@@ -473,23 +1191,54 @@ class Wallet:
 
         :returns: Str — никнейм пользователя, если авторизация прошла успешно.
         """
-        user_found = False
-        with open(path, "r") as file:
-            data = json.loads(file.read())
-            for user_data in data:
-                if (
-                        user_data["user"] == user
-                        and user_data["password"]
-                        == sha256(password.encode()).hexdigest()
-                ):
-                    self.user = user
-                    self.authenticated = True
-                    return user
-                else:
-                    continue
-            if not user_found:
-                print(Err.INVALID_CREDENTIALS)
-                return Err.INVALID_CREDENTIALS
+        if self._check_password(user, password, path):
+            self.user = user
+            self.authenticated = True
+            return user
+        print(Err.INVALID_CREDENTIALS)
+        return Err.INVALID_CREDENTIALS
+
+    @staticmethod
+    def _create_user(
+            user: str,
+            password: str,
+            path: Union[str, Path] = Uc.USERS_LOCATION,
+            encoding: str = "utf-8",
+    ) -> bool:
+        """
+        Сохранить нового пользователя с хэшем пароля.
+
+        :param user: Логин пользователя.
+        :param password: Пароль пользователя.
+        :param path: Путь к файлу с данными о пользователях.
+        :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+        :returns: Bool — False, если пользователь с таким логином уже
+         существует.
+        """
+        storage = get_storage(path, encoding)
+        return not storage.get_user(user) and storage.add_user(
+            dict(user=user, password=sha256(password.encode()).hexdigest())
+        )
+
+    @staticmethod
+    def _check_password(
+            user: str,
+            password: str,
+            path: Union[str, Path] = Uc.USERS_LOCATION,
+    ) -> bool:
+        """
+        Проверить пару логин-пароль.
+
+        :param user: Логин пользователя.
+        :param password: Пароль пользователя.
+        :param path: Путь к файлу с данными о пользователях.
+        :returns: Bool — True, если пользователь существует и пароль
+         совпадает.
+        """
+        user_data = get_storage(path).get_user(user)
+        return bool(user_data) and (
+            user_data["password"] == sha256(password.encode()).hexdigest()
+        )
 
     @staticmethod
     def get_commands() -> str:
@@ -524,7 +1273,7 @@ class Wallet:
         """
         match command:
             case "balance":
-                return print(self.get_balance(self._get_history(self.user)))
+                return print(self.get_balance())
             case "deposit":
                 return self.run_transaction(
                     _type="deposit",
@@ -546,23 +1295,45 @@ class Wallet:
                     description=input(Lit.TRANSACTION_DESCRIPTION),
                 )
             case "history":
-                print(
-                    self.print_history(
-                        history=self._get_history(self.user),
-                        mode=input(Lit.HISTORY_MODE_CHOICES),
-                    )
-                )
+                self._page_history(mode=input(Lit.HISTORY_MODE_CHOICES))
             case "search":
                 mode = input(Lit.SEARCH_MODE_CHOICES)
                 self._match_search_mode(mode)
                 value = input(Lit.SEARCH_VALUE_INPUT)
-                print(self.search(mode, value, self._get_history(self.user)))
+                print(self.search(mode, value))
             case "edit":
                 transaction = input(Lit.ENTER_TRANSACTION_NUMBER)
                 return self.edit_transaction(
                     transaction_id=transaction,
                     user=self.user,
                 )
+            case "import":
+                source = input(Lit.IMPORT_SOURCE_INPUT)
+                try:
+                    result = self.import_transactions(source)
+                except OSError as error:
+                    return print(
+                        Err.IMPORT_SOURCE_UNREADABLE.format(
+                            source, error.strerror or error
+                        )
+                    )
+                return self._print_import_result(result)
+            case "top":
+                return print(
+                    self.top(
+                        category=input(Lit.TOP_CATEGORY_INPUT),
+                        start=input(Lit.TOP_START_INPUT),
+                        end=input(Lit.TOP_END_INPUT),
+                    )
+                )
+            case "report":
+                return print(
+                    self.report(
+                        period=input(Lit.REPORT_PERIOD_CHOICES),
+                        start=input(Lit.REPORT_START_INPUT),
+                        end=input(Lit.REPORT_END_INPUT),
+                    )
+                )
             case "help":
                 return print(self.get_commands())
             case "exit":
@@ -578,6 +1349,10 @@ class Wallet:
         :param command: Str — команда, введённая пользователем.
         :returns: Union[bool, None] — результат выполнения команды.
         """
+        # mask_input нужен только в интерактивном режиме, поэтому
+        # импортируется здесь и не замедляет запуск остальных сценариев.
+        from mask_input import mask_input
+
         match command:
             case "register":
                 return self.register(
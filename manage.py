@@ -0,0 +1,189 @@
+import json
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Optional
+
+from constants import UtilityConstants as Uc, ManageLiterals as Ml
+from models import from_cents
+from reports import batch_report
+from storage import get_storage, split_into_shards
+
+
+def split_wallets(args: Namespace) -> int:
+    """
+    Разложить общий файл транзакций по файлам пользователей.
+
+    :param args: Аргументы командной строки.
+    :returns: Int — код завершения.
+    """
+    migrated = split_into_shards(args.source, args.target)
+    print(
+        Ml.WALLETS_SPLIT.format(
+            sum(migrated.values()), len(migrated), args.target
+        )
+    )
+    return 0
+
+
+def split_users(args: Namespace) -> int:
+    """
+    Разложить общий файл пользователей по отдельным файлам, путь к
+    которым вычисляется по хэшу логина.
+
+    :param args: Аргументы командной строки.
+    :returns: Int — код завершения.
+    """
+    target = get_storage(args.target)
+    migrated = 0
+    for user_data in get_storage(args.source).iter_users():
+        if target.get_user(user_data["user"]) is None:
+            target.add_user(user_data)
+            migrated += 1
+    print(Ml.USERS_SPLIT.format(migrated, args.target))
+    return 0
+
+
+def verify_balances(args: Namespace) -> int:
+    """
+    Пересчитать итоги пользователей по транзакциям и сообщить
+    о расхождениях с сохранёнными итогами.
+
+    :param args: Аргументы командной строки.
+    :returns: Int — 0, если расхождений нет или они исправлены, 1 в ином
+     случае.
+    """
+    drift = get_storage(args.path).verify_totals(fix=args.fix)
+    for user, (stored, actual) in sorted(drift.items()):
+        print(
+            Ml.BALANCE_DRIFT.format(
+                user=user,
+                stored=from_cents(stored["net"]),
+                actual=from_cents(actual["net"]),
+            )
+        )
+    if not drift:
+        print(Ml.BALANCES_OK)
+        return 0
+    if args.fix:
+        print(Ml.BALANCES_FIXED.format(len(drift)))
+        return 0
+    return 1
+
+
+def compact(args: Namespace) -> int:
+    """
+    Свернуть накопленные правки хранилища в новый снимок и пересчитать
+    итоги пользователей.
+
+    :param args: Аргументы командной строки.
+    :returns: Int — код завершения.
+    """
+    get_storage(args.path).compact()
+    print(Ml.COMPACTED.format(args.path))
+    return 0
+
+
+def convert_amounts(args: Namespace) -> int:
+    """
+    Перевести суммы транзакций, сохранённые в рублях, в целое число
+    копеек. Команду достаточно выполнить один раз для каждого хранилища.
+
+    :param args: Аргументы командной строки.
+    :returns: Int — код завершения.
+    """
+    converted = get_storage(args.path).convert_amounts()
+    print(Ml.AMOUNTS_CONVERTED.format(converted, args.path))
+    return 0
+
+
+def report_all(args: Namespace) -> int:
+    """
+    Посчитать итоги и сводки по периодам для всех пользователей
+    и вывести их в JSON с суммами в рублях.
+
+    :param args: Аргументы командной строки.
+    :returns: Int — код завершения.
+    """
+    report = batch_report(args.path, args.period, args.workers)
+    for user_report in report.values():
+        for totals in (user_report, *user_report["periods"].values()):
+            for key in ("deposits", "withdrawals", "net"):
+                totals[key] = from_cents(totals[key])
+    text = json.dumps(report, ensure_ascii=False, indent=4)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + "\n", encoding="utf-8")
+        print(Ml.BATCH_REPORT_WRITTEN.format(len(report), args.output))
+    return 0
+
+
+def create_parser() -> ArgumentParser:
+    """
+    Создать парсер административных команд.
+
+    :returns: ArgumentParser — парсер команд.
+    """
+    parser = ArgumentParser(description=Ml.DESCRIPTION)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    split = commands.add_parser("split-wallets", help=Ml.SPLIT_WALLETS_HELP)
+    split.add_argument("--source", type=Path, default=Uc.WALLETS_LOCATION)
+    split.add_argument(
+        "--target", type=Path, default=Uc.WALLETS_SHARDS_LOCATION
+    )
+    split.set_defaults(handler=split_wallets)
+
+    users = commands.add_parser("split-users", help=Ml.SPLIT_USERS_HELP)
+    users.add_argument("--source", type=Path, default=Uc.USERS_LOCATION)
+    users.add_argument(
+        "--target", type=Path, default=Uc.USERS_SHARDS_LOCATION
+    )
+    users.set_defaults(handler=split_users)
+
+    verify = commands.add_parser(
+        "verify-balances", help=Ml.VERIFY_BALANCES_HELP
+    )
+    verify.add_argument("--path", type=Path, default=Uc.WALLETS_LOCATION)
+    verify.add_argument("--fix", action="store_true", help=Ml.FIX_HELP)
+    verify.set_defaults(handler=verify_balances)
+
+    compaction = commands.add_parser("compact", help=Ml.COMPACT_HELP)
+    compaction.add_argument(
+        "--path", type=Path, default=Uc.WALLETS_LOCATION
+    )
+    compaction.set_defaults(handler=compact)
+
+    convert = commands.add_parser(
+        "convert-amounts", help=Ml.CONVERT_AMOUNTS_HELP
+    )
+    convert.add_argument("--path", type=Path, default=Uc.WALLETS_LOCATION)
+    convert.set_defaults(handler=convert_amounts)
+
+    batch = commands.add_parser("report-all", help=Ml.BATCH_REPORT_HELP)
+    batch.add_argument("--path", type=Path, default=Uc.WALLETS_LOCATION)
+    batch.add_argument(
+        "--period",
+        choices=tuple(Uc.REPORT_PERIODS),
+        default="month",
+        help=Ml.PERIOD_HELP,
+    )
+    batch.add_argument("--workers", type=int, help=Ml.WORKERS_HELP)
+    batch.add_argument("--output", type=Path, help=Ml.OUTPUT_HELP)
+    batch.set_defaults(handler=report_all)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Точка входа для административных команд.
+
+    :param argv: Аргументы командной строки.
+    :returns: Int — код завершения.
+    """
+    args = create_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,17 @@
-from msvcrt import getwch
-
-
 def mask_input(prompt='', mask='*'):
     """
-    Прячет ввод пароля, заменяя символы на звездочки.
+    Прячет ввод пароля, заменяя символы на звездочки. На системах без
+    `msvcrt` (не Windows) ввод просто не отображается.
 
     :param prompt: Подсказка для ввода.
     :param mask: Символ для замены.
     :return: Введённая пользователем строка.
     """
+    try:
+        from msvcrt import getwch
+    except ImportError:
+        from getpass import getpass
+        return getpass(prompt)
     print(prompt, end='', flush=True)
     response = ''
     while (char := getwch()) != '\r':
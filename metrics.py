@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+
+from constants import UtilityConstants as Uc
+
+COUNTERS = ("bytes_read", "bytes_written", "records_scanned")
+
+
+class MethodStats:
+    """
+    Статистика вызовов одного метода: гистограмма задержек с границами
+    `METRICS_BUCKETS` (в секундах) и суммы счётчиков ввода-вывода по
+    всем вызовам.
+    """
+
+    __slots__ = ("calls", "seconds", "buckets", "counters")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        # последняя ячейка — вызовы дольше самой большой границы.
+        self.buckets = [0] * (len(Uc.METRICS_BUCKETS) + 1)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def observe(self, seconds: float, counters: dict[str, int]) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.buckets[bisect_left(Uc.METRICS_BUCKETS, seconds)] += 1
+        for name, value in counters.items():
+            self.counters[name] += value
+
+
+class Metrics:
+    """
+    Реестр метрик вызовов. Пока реестр выключен, обёрнутые методы
+    вызываются напрямую, а счётчики ввода-вывода не считаются: каждая
+    точка замера стоит одной проверки флага.
+
+    Байты и записи, прочитанные или записанные хранилищем, учитываются
+    во всех замеряемых вызовах, открытых в том же потоке, поэтому
+    метрики вложенных вызовов (например, print_history внутри search)
+    входят и в метрики внешнего.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._stats: dict[str, MethodStats] = {}
+        self._guard = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._guard:
+            self._stats = {}
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[dict[str, int]]:
+        """
+        Замерить вызов: время выполнения и счётчики ввода-вывода.
+
+        :param name: Название метода.
+        :returns: Iterator — счётчики вызова, которые можно дополнить.
+        """
+        frames = self._local.__dict__.setdefault("frames", [])
+        counters = dict.fromkeys(COUNTERS, 0)
+        frames.append(counters)
+        started = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            seconds = time.perf_counter() - started
+            frames.pop()
+            with self._guard:
+                stats = self._stats.get(name)
+                if stats is None:
+                    stats = self._stats[name] = MethodStats()
+                stats.observe(seconds, counters)
+
+    def add(self, counter: str, value: int) -> None:
+        """
+        Учесть прочитанные или записанные байты либо просмотренные
+        записи в открытых замерах текущего потока.
+
+        :param counter: Название счётчика из `COUNTERS`.
+        :param value: Прибавляемое значение.
+        """
+        if not self.enabled:
+            return
+        for counters in getattr(self._local, "frames", ()):
+            counters[counter] += value
+
+    def to_dict(self) -> dict[str, dict]:
+        """
+        Получить метрики в виде словаря для JSON.
+
+        :returns: Dict — по каждому методу количество вызовов, общее
+         время, суммы счётчиков и гистограмма задержек (количество
+         вызовов в каждой ячейке, по верхней границе в секундах).
+        """
+        with self._guard:
+            return {
+                name: dict(
+                    calls=stats.calls,
+                    seconds=stats.seconds,
+                    **stats.counters,
+                    latency=dict(
+                        zip(
+                            [*map(str, Uc.METRICS_BUCKETS), "+Inf"],
+                            stats.buckets,
+                        )
+                    ),
+                )
+                for name, stats in sorted(self._stats.items())
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """
+        Получить метрики в текстовом формате Prometheus: гистограмму
+        `wallet_call_duration_seconds` и счётчики `wallet_<счётчик>_total`
+        с меткой `method`.
+
+        :returns: Str — метрики.
+        """
+        metrics = self.to_dict()
+        prefix = Uc.METRICS_PREFIX
+        lines = [
+            f"# HELP {prefix}_call_duration_seconds Время вызова метода.",
+            f"# TYPE {prefix}_call_duration_seconds histogram",
+        ]
+        for name, stats in metrics.items():
+            cumulative = 0
+            for bound, count in stats["latency"].items():
+                cumulative += count
+                lines.append(
+                    f'{prefix}_call_duration_seconds_bucket'
+                    f'{{method="{name}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'{prefix}_call_duration_seconds_sum{{method="{name}"}} '
+                f'{stats["seconds"]}'
+            )
+            lines.append(
+                f'{prefix}_call_duration_seconds_count{{method="{name}"}} '
+                f'{stats["calls"]}'
+            )
+        for counter in COUNTERS:
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.extend(
+                f'{prefix}_{counter}_total{{method="{name}"}} '
+                f'{stats[counter]}'
+                for name, stats in metrics.items()
+            )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,414 @@
+import heapq
+import sys
+from array import array
+from collections.abc import Mapping
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import compress, repeat
+from operator import eq
+from typing import Any, Iterable, Iterator, Optional, Union
+from uuid import UUID
+
+from constants import UtilityConstants as Uc, DEPOSIT_TYPE_MAPPING
+from indexes import in_range
+
+
+class Transaction(Mapping):
+    """
+    Транзакция с полями в слотах. Занимает в несколько раз меньше
+    памяти, чем словарь, и читается так же, как словарь
+    (`transaction["amount"]`, `get()`, `items()`), поэтому код, который
+    работает со словарями транзакций, работает и с ней.
+    """
+
+    __slots__ = ("id", "user", "date", "category", "amount", "description")
+
+    def __init__(
+            self,
+            id: str,
+            user: str,
+            date: str,
+            category: str,
+            amount: int,
+            description: Optional[str] = None,
+    ):
+        self.id = id
+        self.user = user
+        self.date = date
+        self.category = category
+        self.amount = amount
+        self.description = description
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Transaction({dict(self)!r})"
+
+    def to_dict(self) -> dict:
+        """
+        Получить транзакцию в виде словаря, например, для записи в JSON.
+
+        :returns: Dict — поля транзакции.
+        """
+        return dict(self)
+
+
+def to_cents(amount: Union[str, int, float, Decimal]) -> int:
+    """
+    Перевести сумму в рублях в целое число копеек. Пробелы между
+    разрядами и запятая вместо точки допускаются, доли копейки
+    округляются до ближайшей копейки.
+
+    :param amount: Сумма в рублях: строка, число или Decimal.
+    :returns: Int — сумма в копейках.
+    :raises ValueError: Если сумма не является конечным числом.
+    """
+    if isinstance(amount, str):
+        amount = amount.replace(" ", "").replace(",", ".")
+    elif isinstance(amount, float):
+        amount = repr(amount)  # кратчайшая запись, без хвоста двоичной дроби
+    try:
+        value = Decimal(amount) * Uc.CENTS_PER_UNIT
+        return int(value.quantize(Decimal(1), ROUND_HALF_UP))
+    except (InvalidOperation, TypeError, ValueError, OverflowError):
+        raise ValueError(f"invalid amount: {amount!r}") from None
+
+
+def from_cents(cents: int) -> float:
+    """
+    Перевести сумму в копейках в рубли для вывода.
+
+    :param cents: Сумма в копейках.
+    :returns: Float — сумма в рублях.
+    """
+    return cents / Uc.CENTS_PER_UNIT
+
+
+def uuid_bytes(transaction_id: str) -> Optional[bytes]:
+    """
+    Получить 16 байт UUID, если ID записан в каноническом виде.
+
+    :param transaction_id: ID транзакции.
+    :returns: Bytes — UUID, либо None, если ID не является UUID.
+    """
+    try:
+        value = UUID(transaction_id)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return value.bytes if str(value) == transaction_id else None
+
+
+@lru_cache(maxsize=Uc.DATE_CACHE_SIZE)
+def date_to_ordinal(value: str) -> int:
+    """
+    Перевести дату `ГГГГ-ММ-ДД` в номер дня. Даты в истории часто
+    повторяются, поэтому результат кэшируется.
+
+    :param value: Дата.
+    :returns: Int — номер дня, либо 0, если дата записана в другом виде.
+    """
+    try:
+        ordinal = date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return 0
+    return ordinal if date.fromordinal(ordinal).isoformat() == value else 0
+
+
+@lru_cache(maxsize=Uc.DATE_CACHE_SIZE)
+def ordinal_to_date(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+class TransactionColumns:
+    """
+    История транзакций одного пользователя, разложенная по столбцам:
+    ID — по 16 байт UUID в одном `bytearray`, даты — номерами дней
+    в `array('l')`, категории — кодами в `array('b')`, суммы в копейках —
+    в `array('q')`, описания — в списке общих для истории строк.
+    Значения, которые не укладываются в столбец (ID не в виде UUID,
+    дата не в формате ISO), хранятся отдельно по позиции.
+
+    Итоги, отбор по категории и поиск по диапазону выполняются прямо по
+    столбцам; объекты Transaction создаются только для транзакций,
+    которые нужно вернуть.
+    """
+
+    __slots__ = (
+        "user",
+        "ids",
+        "dates",
+        "categories",
+        "amounts",
+        "descriptions",
+        "category_names",
+        "_odd_ids",
+        "_odd_dates",
+    )
+    ID_SIZE = 16
+
+    def __init__(self, user: str, transactions: Iterable[Mapping] = ()):
+        self.user = user
+        self.ids = bytearray()
+        self.dates = array("l")
+        self.categories = array("b")
+        self.amounts = array("q")
+        self.descriptions: list[Optional[str]] = []
+        self.category_names: list[str] = list(DEPOSIT_TYPE_MAPPING)
+        self._odd_ids: dict[int, str] = {}
+        self._odd_dates: dict[int, str] = {}
+        for transaction in transactions:
+            self.append(transaction)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return map(self.__getitem__, range(len(self)))
+
+    def __getitem__(self, position: int) -> Transaction:
+        if position < 0:
+            position += len(self)
+        start = position * self.ID_SIZE
+        ordinal = self.dates[position]
+        if position in self._odd_ids:
+            transaction_id = self._odd_ids[position]
+        else:
+            transaction_id = str(
+                UUID(bytes=bytes(self.ids[start:start + self.ID_SIZE]))
+            )
+        return Transaction(
+            transaction_id,
+            self.user,
+            ordinal_to_date(ordinal) if ordinal
+            else self._odd_dates.get(position, ""),
+            self.category_names[self.categories[position]],
+            self.amounts[position],
+            self.descriptions[position],
+        )
+
+    def __setitem__(self, position: int, transaction: Mapping) -> None:
+        if position < 0:
+            position += len(self)
+        start = position * self.ID_SIZE
+        self._odd_ids.pop(position, None)
+        self._odd_dates.pop(position, None)
+        self.ids[start:start + self.ID_SIZE] = self._pack_id(
+            position, transaction["id"]
+        )
+        self.dates[position] = self._pack_date(position, transaction["date"])
+        self.categories[position] = self._category_code(
+            transaction["category"]
+        )
+        self.amounts[position] = transaction["amount"]
+        self.descriptions[position] = self._pack_description(
+            transaction.get("description")
+        )
+
+    def append(self, transaction: Mapping) -> None:
+        """
+        Добавить транзакцию в конец истории.
+
+        :param transaction: Транзакция пользователя.
+        """
+        position = len(self)
+        self.ids += self._pack_id(position, transaction["id"])
+        self.dates.append(self._pack_date(position, transaction["date"]))
+        self.categories.append(self._category_code(transaction["category"]))
+        self.amounts.append(transaction["amount"])
+        self.descriptions.append(
+            self._pack_description(transaction.get("description"))
+        )
+
+    def copy(self) -> "TransactionColumns":
+        """
+        Получить независимую копию истории. Столбцы копируются целиком,
+        без создания объектов транзакций.
+
+        :returns: TransactionColumns — копия истории.
+        """
+        # длина берётся по суммам, которые дописываются последними.
+        size = len(self)
+        other = TransactionColumns(self.user)
+        other.ids = self.ids[:size * self.ID_SIZE]
+        other.dates = self.dates[:size]
+        other.categories = self.categories[:size]
+        other.amounts = self.amounts[:size]
+        other.descriptions = self.descriptions[:size]
+        other.category_names = self.category_names[:]
+        other._odd_ids = dict(self._odd_ids)
+        other._odd_dates = dict(self._odd_dates)
+        return other
+
+    def index(self, transaction_id: str) -> Optional[int]:
+        """
+        Найти позицию транзакции по ID.
+
+        :param transaction_id: ID транзакции.
+        :returns: Int — позиция транзакции, либо None, если её нет.
+        """
+        raw_id = uuid_bytes(transaction_id)
+        if raw_id is None:
+            return next(
+                (
+                    position
+                    for position, value in self._odd_ids.items()
+                    if value == transaction_id
+                ),
+                None,
+            )
+        start = self.ids.find(raw_id)
+        while start != -1:
+            if not start % self.ID_SIZE:
+                return start // self.ID_SIZE
+            start = self.ids.find(raw_id, start + 1)
+        return None
+
+    def total(self, category: str) -> int:
+        """
+        Посчитать сумму транзакций категории.
+
+        :param category: Категория транзакций.
+        :returns: Int — сумма транзакций в копейках.
+        """
+        if category not in self.category_names:
+            return 0
+        return sum(compress(self.amounts, self._mask(category)))
+
+    def filter(self, category: str) -> Iterator[Transaction]:
+        """
+        Отобрать транзакции категории.
+
+        :param category: Категория транзакций.
+        :returns: Iterator[Transaction] — транзакции категории по порядку.
+        """
+        if category not in self.category_names:
+            return iter(())
+        return map(
+            self.__getitem__,
+            compress(range(len(self)), self._mask(category)),
+        )
+
+    def range(
+            self,
+            field: str,
+            low: Union[str, int, None] = None,
+            high: Union[str, int, None] = None,
+            include_low: bool = True,
+            include_high: bool = True,
+    ) -> Optional[list[Transaction]]:
+        """
+        Найти транзакции, дата или сумма которых лежит в диапазоне.
+
+        :param field: Поле: `date` или `amount`.
+        :param low: Нижняя граница, None — без ограничения.
+        :param high: Верхняя граница, None — без ограничения.
+        :param include_low: Включать ли нижнюю границу.
+        :param include_high: Включать ли верхнюю границу.
+        :returns: List[Transaction] — транзакции по возрастанию значения
+         поля, либо None, если даты нельзя сравнить по номерам дней.
+        """
+        if field == "amount":
+            column = self.amounts
+        elif self._odd_dates:
+            return None
+        else:
+            column = self.dates
+            low, high = (
+                None if bound is None else date_to_ordinal(bound)
+                for bound in (low, high)
+            )
+            if 0 in (low, high):
+                return None
+        positions = [
+            position
+            for position, value in enumerate(column)
+            if in_range(value, low, high, include_low, include_high)
+        ]
+        positions.sort(key=column.__getitem__)
+        return [self[position] for position in positions]
+
+    def top(
+            self,
+            category: str,
+            count: int,
+            low: Optional[str] = None,
+            high: Optional[str] = None,
+    ) -> Optional[list[Transaction]]:
+        """
+        Найти самые крупные транзакции категории. Отбор идёт по
+        столбцам кучей из `count` позиций, объекты Transaction создаются
+        только для найденных транзакций.
+
+        :param category: Категория транзакций.
+        :param count: Количество транзакций.
+        :param low: Первая дата, None — без ограничения.
+        :param high: Последняя дата, None — без ограничения.
+        :returns: List[Transaction] — транзакции по убыванию суммы (при
+         равных суммах — в порядке добавления), либо None, если даты
+         нельзя сравнить по номерам дней.
+        """
+        if category not in self.category_names:
+            return []
+        positions = compress(range(len(self)), self._mask(category))
+        if low is not None or high is not None:
+            if self._odd_dates:
+                return None
+            low, high = (
+                None if bound is None else date_to_ordinal(bound)
+                for bound in (low, high)
+            )
+            if 0 in (low, high):
+                return None
+            positions = (
+                position for position in positions
+                if in_range(self.dates[position], low, high)
+            )
+        return [
+            self[position]
+            for position in heapq.nlargest(
+                count, positions, key=self.amounts.__getitem__
+            )
+        ]
+
+    def _mask(self, category: str) -> Iterator[bool]:
+        return map(
+            eq, self.categories, repeat(self.category_names.index(category))
+        )
+
+    def _category_code(self, category: str) -> int:
+        try:
+            return self.category_names.index(category)
+        except ValueError:
+            self.category_names.append(category)
+            return len(self.category_names) - 1
+
+    def _pack_id(self, position: int, transaction_id: str) -> bytes:
+        raw_id = uuid_bytes(transaction_id)
+        if raw_id is None:
+            self._odd_ids[position] = transaction_id
+            return bytes(self.ID_SIZE)
+        return raw_id
+
+    def _pack_date(self, position: int, value: str) -> int:
+        ordinal = date_to_ordinal(value)
+        if not ordinal:
+            self._odd_dates[position] = value
+        return ordinal
+
+    @staticmethod
+    def _pack_description(description: Optional[str]) -> Optional[str]:
+        # описания часто повторяются, поэтому хранится одна копия строки.
+        return description if description is None else sys.intern(
+            description
+        )
+
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from constants import UtilityConstants as Uc, DEPOSIT_TYPE_MAPPING
+from models import date_to_ordinal
+from storage import add_amount, empty_totals, get_storage
+
+# транзакция в том виде, в каком она нужна для итогов: пользователь,
+# дата, категория и сумма в копейках.
+Row = tuple[str, str, str, int]
+
+
+def aggregate(rows: Iterable[Row], period: str) -> dict[str, dict]:
+    """
+    Посчитать итоги пользователей по транзакциям.
+
+    :param rows: Транзакции: пользователь, дата, категория и сумма.
+    :param period: Период итогов: `day`, `month` или `year`.
+    :returns: Dict — для каждого пользователя количество транзакций
+     (`count`), доходы, расходы и баланс за всё время и те же итоги по
+     периодам (`periods`) в копейках.
+    """
+    length = Uc.REPORT_PERIODS[period]
+    report = {}
+    for user, day, category, amount in rows:
+        user_report = report.get(user)
+        if user_report is None:
+            user_report = report[user] = dict(
+                count=0, **empty_totals(), periods={}
+            )
+        user_report["count"] += 1
+        add_amount(user_report, category, amount)
+        if category in DEPOSIT_TYPE_MAPPING and date_to_ordinal(day):
+            add_amount(
+                user_report["periods"].setdefault(
+                    day[:length], empty_totals()
+                ),
+                category,
+                amount,
+            )
+    for user_report in report.values():
+        user_report["periods"] = dict(sorted(user_report["periods"].items()))
+    return report
+
+
+def merge(report: dict[str, dict], part: dict[str, dict]) -> None:
+    """
+    Добавить к отчёту итоги, посчитанные по другой части транзакций.
+
+    :param report: Отчёт, см. aggregate(), изменяется на месте.
+    :param part: Отчёт по другой части транзакций.
+    """
+    for user, part_report in part.items():
+        user_report = report.get(user)
+        if user_report is None:
+            report[user] = part_report
+            continue
+        user_report["count"] += part_report["count"]
+        for key in empty_totals():
+            user_report[key] += part_report[key]
+        for key, totals in part_report["periods"].items():
+            period_totals = user_report["periods"].setdefault(
+                key, empty_totals()
+            )
+            for total, value in totals.items():
+                period_totals[total] += value
+
+
+def _rows(items: Iterable[dict]) -> Iterator[Row]:
+    return (
+        (item["user"], item["date"], item["category"], item["amount"])
+        for item in items
+    )
+
+
+def _aggregate_part(
+        path: Union[str, Path],
+        part: int,
+        parts: int,
+        period: str,
+        encoding: str,
+) -> dict[str, dict]:
+    storage = get_storage(path, encoding)
+    return aggregate(_rows(storage.iter_part(part, parts)), period)
+
+
+def batch_report(
+        path: Union[str, Path] = Uc.WALLETS_LOCATION,
+        period: str = "month",
+        workers: Optional[int] = None,
+        encoding: str = "utf-8",
+) -> dict[str, dict]:
+    """
+    Посчитать итоги всех пользователей за один проход по хранилищу.
+    Хранилище делится на части (см. StorageEngine.iter_part()), и каждый
+    процесс пула сам читает, разбирает и суммирует свои части, а в пул
+    передаются только номера частей и готовые итоги. Каждая часть
+    читается ровно один раз.
+
+    :param path: Путь к хранилищу транзакций.
+    :param period: Период итогов: `day`, `month` или `year`.
+    :param workers: Количество процессов, по умолчанию по числу ядер;
+     1 — считать в текущем процессе.
+    :param encoding: Кодировка файлов, по умолчанию равна `utf-8`.
+    :returns: Dict — итоги по пользователям в порядке логинов, см.
+     aggregate().
+    """
+    if period not in Uc.REPORT_PERIODS:
+        raise ValueError(f"unknown period: {period!r}")
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        storage = get_storage(path, encoding)
+        report = aggregate(_rows(storage.iter_transactions()), period)
+        return dict(sorted(report.items()))
+    parts = workers * Uc.BATCH_PARTS_PER_WORKER
+    report = {}
+    with ProcessPoolExecutor(workers) as executor:
+        for part in executor.map(
+                _aggregate_part,
+                [path] * parts,
+                range(parts),
+                [parts] * parts,
+                [period] * parts,
+                [encoding] * parts,
+        ):
+            merge(report, part)
+    for user_report in report.values():
+        user_report["periods"] = dict(sorted(user_report["periods"].items()))
+    return dict(sorted(report.items()))
@@ -0,0 +1,402 @@
+import asyncio
+import json
+import secrets
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Any, Mapping, Optional, Union
+
+from constants import (
+    UtilityConstants as Uc,
+    ErrorLiterals as Err,
+    ServerLiterals as Sl,
+    TRANSACTION_FIELDS_MAPPING,
+)
+from main import Wallet
+from models import from_cents
+from storage import get_storage
+
+
+class RequestError(Exception):
+    """
+    Ошибка обработки запроса, текст которой возвращается клиенту.
+    """
+
+
+class Session:
+    """
+    Сессия авторизованного клиента: собственный экземпляр кошелька
+    и блокировка, чтобы запросы одной сессии выполнялись по очереди.
+    Сессия истекает, если ей не пользовались `SESSION_TTL` секунд.
+    """
+
+    __slots__ = ("token", "wallet", "lock", "expires")
+
+    def __init__(self, token: str, wallet: Wallet):
+        self.token = token
+        self.wallet = wallet
+        self.lock = asyncio.Lock()
+        self.touch()
+
+    def touch(self) -> None:
+        """
+        Продлить сессию.
+        """
+        self.expires = time.monotonic() + Uc.SESSION_TTL
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() > self.expires
+
+
+def public_transaction(transaction: Mapping) -> dict:
+    """
+    Подготовить транзакцию к отправке клиенту: сумма хранится
+    в копейках, а клиенту передаётся в рублях.
+
+    :param transaction: Транзакция из хранилища.
+    :returns: Dict — транзакция для ответа.
+    """
+    return dict(transaction, amount=from_cents(transaction["amount"]))
+
+
+class WalletServer:
+    """
+    Сетевой сервис кошелька: JSON по TCP, по одному запросу на строку.
+
+    Запрос — объект `{"command": ..., "token": ..., "params": {...}}`,
+    ответ — `{"ok": true, "result": ...}` либо
+    `{"ok": false, "error": ...}`. Команда `auth` возвращает токен
+    сессии, который передаётся в остальных командах. Обращения
+    к хранилищу выполняются в пуле потоков, поэтому один процесс
+    обслуживает множество клиентов одновременно.
+    """
+
+    PUBLIC_COMMANDS = ("register", "auth")
+
+    def __init__(
+            self,
+            wallets_path: Union[str, Path] = Uc.WALLETS_LOCATION,
+            users_path: Union[str, Path] = Uc.USERS_LOCATION,
+            max_workers: int = Uc.SERVER_WORKERS,
+    ):
+        self.wallets_path = wallets_path
+        self.users_path = users_path
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._sessions: dict[str, Session] = {}
+        self._server: Optional[asyncio.Server] = None
+        self._commands = {
+            "register": self._register,
+            "auth": self._auth,
+            "logout": self._logout,
+            "deposit": partial(self._run_transaction, "deposit"),
+            "withdraw": partial(self._run_transaction, "withdraw"),
+            "balance": self._balance,
+            "history": self._history,
+            "search": self._search,
+            "edit": self._edit,
+            "report": self._report,
+            "top": self._top,
+        }
+
+    async def start(
+            self,
+            host: str = Uc.SERVER_HOST,
+            port: int = Uc.SERVER_PORT,
+    ) -> tuple[str, int]:
+        """
+        Начать принимать подключения.
+
+        :param host: Адрес, на котором слушает сервер.
+        :param port: Порт, 0 — выбрать свободный.
+        :returns: Tuple — фактические адрес и порт сервера.
+        """
+        self._server = await asyncio.start_server(
+            self._handle_connection,
+            host,
+            port,
+            limit=Uc.SERVER_MAX_REQUEST_SIZE,
+        )
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        """
+        Обслуживать клиентов до остановки сервера.
+        """
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Остановить сервер и пул потоков.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def _handle_connection(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = None
+                response = await self.handle_request(request)
+                writer.write(
+                    json.dumps(response, ensure_ascii=False).encode() + b"\n"
+                )
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # клиент отключился или прислал слишком длинную строку
+        finally:
+            writer.close()
+
+    async def handle_request(self, request: Any) -> dict:
+        """
+        Выполнить один запрос.
+
+        :param request: Разобранный JSON запроса.
+        :returns: Dict — ответ для клиента.
+        """
+        if not isinstance(request, dict) or not isinstance(
+                request.get("params", {}), dict
+        ):
+            return dict(ok=False, error=Err.INVALID_REQUEST)
+        command = self._commands.get(request.get("command"))
+        if command is None:
+            return dict(ok=False, error=Err.INVALID_COMMAND)
+        params = request.get("params", {})
+        try:
+            if request["command"] in self.PUBLIC_COMMANDS:
+                result = await self._call(command, **params)
+            else:
+                session = self._get_session(request.get("token"))
+                async with session.lock:
+                    result = await self._call(command, session, **params)
+        except RequestError as error:
+            return dict(ok=False, error=str(error))
+        except (TypeError, ValueError):
+            return dict(ok=False, error=Err.INVALID_REQUEST)
+        return dict(ok=True, result=result)
+
+    def _get_session(self, token: Any) -> Session:
+        if not isinstance(token, str):
+            raise RequestError(Err.NOT_LOGGED_IN)
+        session = self._sessions.get(token)
+        if session is None or session.expired:
+            self._sessions.pop(token, None)
+            raise RequestError(Err.NOT_LOGGED_IN)
+        session.touch()
+        return session
+
+    async def _call(self, function, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(function, *args, **kwargs)
+        )
+
+    @staticmethod
+    def _check_credentials(user: Any, password: Any) -> None:
+        if not isinstance(user, str) or not isinstance(password, str):
+            raise RequestError(Err.INVALID_REQUEST)
+
+    def _register(self, user: str, password: str) -> dict:
+        self._check_credentials(user, password)
+        if not user or not Wallet._create_user(
+                user, password, self.users_path
+        ):
+            raise RequestError(Err.USER_ALREADY_EXISTS)
+        return dict(user=user)
+
+    def _auth(self, user: str, password: str) -> dict:
+        self._check_credentials(user, password)
+        if not Wallet._check_password(user, password, self.users_path):
+            raise RequestError(Err.INVALID_CREDENTIALS)
+        for token, session in list(self._sessions.items()):
+            if session.expired:
+                self._sessions.pop(token, None)
+        wallet = Wallet()
+        wallet.user = user
+        wallet.authenticated = True
+        token = secrets.token_urlsafe(Uc.SESSION_TOKEN_BYTES)
+        self._sessions[token] = Session(token, wallet)
+        return dict(user=user, token=token)
+
+    def _logout(self, session: Session) -> dict:
+        self._sessions.pop(session.token, None)
+        return {}
+
+    def _run_transaction(
+            self,
+            category: str,
+            session: Session,
+            amount: Union[str, float],
+            description: str = "",
+    ) -> dict:
+        wallet = session.wallet
+        if not isinstance(description, str):
+            raise RequestError(Err.INVALID_REQUEST)
+        values = dict(
+            date="", category=category, amount=amount, description=description
+        )
+        error = (
+            Err.MISSING_REQUIRED_FIELDS
+            if amount in ("", None)
+            else wallet._validate_transaction_fields(values)
+        )
+        if error:
+            raise RequestError(error)
+        transaction, = wallet._write_to_file(
+            wallet.user,
+            values["amount"],
+            category=category,
+            description=description,
+            path=self.wallets_path,
+        )
+        return public_transaction(transaction)
+
+    def _balance(self, session: Session, date: Optional[str] = None) -> dict:
+        if date is not None:
+            if not isinstance(date, str):
+                raise RequestError(Err.INVALID_REQUEST)
+            balance = session.wallet.balance_at(date, self.wallets_path)
+            if isinstance(balance, str):
+                raise RequestError(balance)
+            return dict(date=date, net=from_cents(balance))
+        totals = get_storage(self.wallets_path).get_totals(session.wallet.user)
+        return {key: from_cents(value) for key, value in totals.items()}
+
+    def _report(
+            self,
+            session: Session,
+            period: str = "month",
+            start: str = "",
+            end: str = "",
+    ) -> list[dict]:
+        if not isinstance(start, str) or not isinstance(end, str):
+            raise RequestError(Err.INVALID_REQUEST)
+        rows = session.wallet.get_report(
+            period, start, end, self.wallets_path
+        )
+        if isinstance(rows, str):
+            raise RequestError(rows)
+        return [
+            {
+                key: value if key == "period" else from_cents(value)
+                for key, value in row.items()
+            }
+            for row in rows
+        ]
+
+    def _top(
+            self,
+            session: Session,
+            category: str = "withdraw",
+            count: int = Uc.TOP_COUNT,
+            start: str = "",
+            end: str = "",
+    ) -> list[dict]:
+        if not all(isinstance(value, str) for value in (category, start, end)):
+            raise RequestError(Err.INVALID_REQUEST)
+        count = min(max(int(count), 0), Uc.SERVER_MAX_PAGE_SIZE)
+        found = session.wallet.get_top(
+            category, count, start, end, self.wallets_path
+        )
+        if isinstance(found, str):
+            raise RequestError(found)
+        return list(map(public_transaction, found))
+
+    def _history(
+            self,
+            session: Session,
+            mode: str = "all",
+            page: int = 1,
+            page_size: int = Uc.HISTORY_PAGE_SIZE,
+    ) -> list[dict]:
+        wallet = session.wallet
+        filtered = wallet._filter_history(
+            wallet._iter_history(wallet.user, self.wallets_path), mode
+        )
+        if filtered is None:
+            raise RequestError(Err.UNKNOWN_MODE)
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), Uc.SERVER_MAX_PAGE_SIZE)
+        return list(
+            map(
+                public_transaction,
+                islice(filtered[1], (page - 1) * page_size, page * page_size),
+            )
+        )
+
+    def _search(self, session: Session, mode: str, value: str) -> list[dict]:
+        if mode not in TRANSACTION_FIELDS_MAPPING:
+            raise RequestError(Err.UNKNOWN_MODE)
+        results = session.wallet._find_transactions(
+            mode, str(value), path=self.wallets_path
+        )
+        if isinstance(results, str):
+            raise RequestError(results)
+        return list(map(public_transaction, results))
+
+    def _edit(
+            self,
+            session: Session,
+            transaction_id: str,
+            values: dict,
+    ) -> dict:
+        if not isinstance(values, dict):
+            raise RequestError(Err.INVALID_REQUEST)
+        edited = session.wallet.update_transaction(
+            transaction_id, values, self.wallets_path
+        )
+        if isinstance(edited, str):
+            raise RequestError(edited)
+        return public_transaction(edited)
+
+
+def create_parser() -> ArgumentParser:
+    """
+    Создать парсер аргументов сервера.
+
+    :returns: ArgumentParser — парсер аргументов.
+    """
+    parser = ArgumentParser(description=Sl.DESCRIPTION)
+    parser.add_argument("--host", default=Uc.SERVER_HOST, help=Sl.HOST_HELP)
+    parser.add_argument(
+        "--port", type=int, default=Uc.SERVER_PORT, help=Sl.PORT_HELP
+    )
+    parser.add_argument("--wallets", type=Path, default=Uc.WALLETS_LOCATION)
+    parser.add_argument("--users", type=Path, default=Uc.USERS_LOCATION)
+    return parser
+
+
+async def serve(argv: Optional[list[str]] = None) -> None:
+    """
+    Запустить сервер кошелька.
+
+    :param argv: Аргументы командной строки.
+    """
+    args = create_parser().parse_args(argv)
+    server = WalletServer(args.wallets, args.users)
+    host, port = await server.start(args.host, args.port)
+    print(Sl.SERVER_STARTED.format(host, port))
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
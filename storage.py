@@ -0,0 +1,2377 @@
+import json
+import mmap
+import os
+import re
+import struct
+import textwrap
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from contextlib import closing
+from datetime import date
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
+from uuid import UUID
+
+from constants import (
+    UtilityConstants as Uc,
+    ErrorLiterals as Err,
+    DEPOSIT_TYPE_MAPPING,
+    TRANSACTION_FIELDS_MAPPING,
+)
+from decorators import locked
+from locking import file_lock
+from metrics import metrics
+from models import date_to_ordinal, to_cents, uuid_bytes
+
+
+def file_signature(
+        path: Union[str, Path],
+) -> Optional[tuple[str, int, int, int]]:
+    """
+    Получить сигнатуру файла: путь, mtime_ns, размер и inode.
+
+    :param path: Путь к файлу.
+    :returns: Tuple — сигнатура файла, либо None, если файла нет.
+    """
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return str(path), stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def write_atomic(
+        path: Path,
+        text: Union[str, bytes],
+        encoding: str = "utf-8",
+) -> None:
+    """
+    Перезаписать файл целиком через временный файл, чтобы читатели
+    никогда не видели его записанным наполовину.
+
+    :param path: Путь к файлу.
+    :param text: Новое содержимое файла, строка либо байты.
+    :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+    """
+    temporary = path.with_name(
+        f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    data = text if isinstance(text, bytes) else text.encode(encoding)
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+    metrics.add("bytes_written", len(data))
+
+
+_WHITESPACE = re.compile(r"\s*")
+_ITEM_SEPARATOR = re.compile(r"[\s,]*")
+# начало элемента массива в том виде, в каком его пишут _dump()
+# и _append_in_place(): внутри строк JSON переводов строки не бывает.
+_ITEM_START = b"\n    {"
+
+
+def iter_json_array(
+        path: Union[str, Path],
+        encoding: str = "utf-8",
+        chunk_size: int = Uc.READ_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    Последовательно прочитать элементы JSON-массива из файла, не
+    загружая файл в память целиком: файл читается кусками, а элементы
+    разбираются по одному по мере поступления данных.
+
+    :param path: Путь к файлу с JSON-массивом.
+    :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+    :param chunk_size: Размер куска для чтения в символах.
+    :returns: Iterator[dict] — элементы массива по порядку.
+    """
+    decoder = json.JSONDecoder()
+    try:
+        file = open(path, "r", encoding=encoding)
+    except FileNotFoundError:
+        return  # для подстраховки на случай первого запуска
+    with file:
+        buffer = file.read(chunk_size)
+        metrics.add("bytes_read", len(buffer))
+        eof = not buffer
+        position = 0
+        started = False
+        scanned = 0
+        try:
+            while True:
+                position = (
+                    _ITEM_SEPARATOR if started else _WHITESPACE
+                ).match(buffer, position).end()
+                if position < len(buffer):
+                    char = buffer[position]
+                    if not started:
+                        if char != "[":
+                            return  # файл не является JSON-массивом
+                        started = True
+                        position += 1
+                        continue
+                    if char == "]":
+                        return
+                    try:
+                        item, position = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            return  # файл повреждён или обрезан
+                    else:
+                        scanned += 1
+                        yield item
+                        continue
+                elif eof:
+                    return
+                chunk = file.read(chunk_size)
+                metrics.add("bytes_read", len(chunk))
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+        finally:
+            metrics.add("records_scanned", scanned)
+
+
+def check_amounts(items: Iterable[dict], path: Path) -> Iterator[dict]:
+    """
+    Пропустить транзакции, убедившись, что суммы записаны в копейках.
+
+    :param items: Транзакции.
+    :param path: Путь к хранилищу — для сообщения об ошибке.
+    :returns: Iterator[dict] — те же транзакции.
+    :raises ValueError: Если встретилась сумма в старом формате (дробное
+     число рублей): такое хранилище нужно сначала перевести в копейки.
+    """
+    for item in items:
+        if isinstance(item.get("amount"), float):
+            raise ValueError(Err.LEGACY_AMOUNTS.format(path))
+        yield item
+
+
+def part_bounds(size: int, part: int, parts: int) -> tuple[int, int]:
+    """
+    Получить границы одной из равных частей диапазона.
+
+    :param size: Длина диапазона.
+    :param part: Номер части, начиная с нуля.
+    :param parts: Количество частей.
+    :returns: Tuple — начало и конец части (не включая конец).
+    """
+    return size * part // parts, size * (part + 1) // parts
+
+
+def empty_totals() -> dict[str, int]:
+    """
+    Получить нулевые итоги пользователя.
+
+    :returns: Dict — сумма доходов, расходов и баланс в копейках.
+    """
+    return dict(deposits=0, withdrawals=0, net=0)
+
+
+def add_amount(totals: dict[str, int], category: str, amount: int) -> None:
+    """
+    Прибавить сумму к итогам по её категории.
+
+    :param totals: Сумма доходов, расходов и баланс, изменяются на месте.
+    :param category: Категория транзакции.
+    :param amount: Сумма в копейках, отрицательная — чтобы вычесть.
+    """
+    if category == "deposit":
+        totals["deposits"] += amount
+        totals["net"] += amount
+    elif category == "withdraw":
+        totals["withdrawals"] += amount
+        totals["net"] -= amount
+
+
+def add_to_totals(
+        totals: dict[str, dict[str, int]],
+        transaction: dict,
+        sign: int = 1,
+) -> dict[str, dict[str, int]]:
+    """
+    Учесть транзакцию в итогах её пользователя.
+
+    :param totals: Итоги по пользователям, изменяются на месте.
+    :param transaction: Транзакция.
+    :param sign: 1, чтобы прибавить транзакцию, -1 — чтобы вычесть.
+    :returns: Dict — обновлённые итоги.
+    """
+    add_amount(
+        totals.setdefault(transaction["user"], empty_totals()),
+        transaction["category"],
+        sign * transaction["amount"],
+    )
+    return totals
+
+
+def compute_totals(
+        transactions: Iterable[dict],
+) -> dict[str, dict[str, int]]:
+    """
+    Посчитать итоги по пользователям с нуля.
+
+    :param transactions: Транзакции.
+    :returns: Dict — итоги по пользователям.
+    """
+    totals = {}
+    for transaction in transactions:
+        add_to_totals(totals, transaction)
+    return totals
+
+
+def period_keys(day: str) -> tuple[str, ...]:
+    """
+    Получить периоды, в которые попадает дата.
+
+    :param day: Дата транзакции.
+    :returns: Tuple — ключи года `ГГГГ`, месяца `ГГГГ-ММ` и дня
+     `ГГГГ-ММ-ДД`, либо пустой кортеж, если дата записана не в формате
+     ISO.
+    """
+    if not date_to_ordinal(day):
+        return ()
+    return tuple(day[:length] for length in Uc.REPORT_PERIODS.values())
+
+
+def add_to_rollups(
+        rollups: dict[str, dict[str, dict[str, int]]],
+        transaction: dict,
+        sign: int = 1,
+) -> dict[str, dict[str, dict[str, int]]]:
+    """
+    Учесть транзакцию в сводках её пользователя за год, месяц и день.
+    Периоды, итоги которых обнулились, удаляются из сводок.
+
+    :param rollups: Сводки по пользователям, изменяются на месте.
+    :param transaction: Транзакция.
+    :param sign: 1, чтобы прибавить транзакцию, -1 — чтобы вычесть.
+    :returns: Dict — обновлённые сводки.
+    """
+    user_rollups = rollups.setdefault(transaction["user"], {})
+    for key in period_keys(transaction["date"]):
+        period_totals = user_rollups.setdefault(key, empty_totals())
+        add_amount(
+            period_totals,
+            transaction["category"],
+            sign * transaction["amount"],
+        )
+        if not any(period_totals.values()):
+            del user_rollups[key]
+    return rollups
+
+
+def compute_rollups(
+        transactions: Iterable[dict],
+) -> dict[str, dict[str, dict[str, int]]]:
+    """
+    Посчитать сводки по пользователям с нуля.
+
+    :param transactions: Транзакции.
+    :returns: Dict — итоги по периодам для каждого пользователя.
+    """
+    rollups = {}
+    for transaction in transactions:
+        add_to_rollups(rollups, transaction)
+    return rollups
+
+
+class StorageEngine(ABC):
+    """
+    Базовый интерфейс хранилища транзакций и пользователей. Кошелёк
+    работает с данными только через методы этого класса и не знает,
+    в каком формате они хранятся на диске.
+
+    Изменения выполняются под блокировкой `lock` — файлом рядом
+    с хранилищем, который блокируется средствами ОС. Блокировку можно
+    захватить и снаружи, чтобы несколько операций выполнились без
+    вмешательства других процессов.
+    """
+
+    def __init__(self, path: Union[str, Path], encoding: str = "utf-8"):
+        self.path = Path(path)
+        self.encoding = encoding
+        self.lock = file_lock(
+            self.path.with_name(self.path.name + Uc.LOCK_SUFFIX)
+        )
+
+    @abstractmethod
+    def iter_transactions(self, user: Optional[str] = None) -> Iterator[dict]:
+        """
+        Последовательно прочитать транзакции хранилища.
+
+        :param user: Пользователь, транзакции которого нужно получить.
+         Если не указан, возвращаются транзакции всех пользователей.
+        :returns: Iterator[dict] — транзакции в порядке их добавления.
+        """
+
+    def iter_part(self, part: int, parts: int) -> Iterator[dict]:
+        """
+        Прочитать одну из `parts` частей хранилища. Части не пересекаются
+        и вместе содержат все транзакции, поэтому их можно читать
+        в разных процессах. По умолчанию хранилище не делится, и все
+        транзакции достаются первой части.
+
+        :param part: Номер части, начиная с нуля.
+        :param parts: Количество частей.
+        :returns: Iterator[dict] — транзакции части.
+        """
+        return self.iter_transactions() if part == 0 else iter(())
+
+    @abstractmethod
+    def add_transactions(self, transactions: Iterable[dict]) -> None:
+        """
+        Сохранить новые транзакции.
+
+        :param transactions: Транзакции для сохранения.
+        """
+
+    @abstractmethod
+    def update_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+            values: dict,
+    ) -> Optional[dict]:
+        """
+        Изменить поля существующей транзакции.
+
+        :param user: Пользователь, совершивший транзакцию.
+        :param transaction_id: ID транзакции.
+        :param values: Новые значения полей.
+        :returns: Dict — изменённая транзакция, либо None, если она
+         не найдена.
+        """
+
+    @abstractmethod
+    def get_all_totals(self) -> dict[str, dict[str, int]]:
+        """
+        Получить сохранённые итоги всех пользователей. Итоги хранятся
+        рядом с транзакциями и обновляются при каждой записи.
+
+        :returns: Dict — итоги по пользователям.
+        """
+
+    @abstractmethod
+    def _replace_totals(self, totals: dict[str, dict[str, int]]) -> None:
+        """
+        Перезаписать сохранённые итоги указанных пользователей.
+
+        :param totals: Новые итоги по пользователям.
+        """
+
+    @abstractmethod
+    def get_rollups(self, user: str, period: str) -> dict[str, dict]:
+        """
+        Получить сохранённые сводки пользователя: итоги по дням,
+        месяцам или годам. Сводки хранятся рядом с транзакциями
+        и обновляются при каждой записи и правке, поэтому отчёт не
+        читает историю.
+
+        :param user: Пользователь.
+        :param period: Период сводок: `day`, `month` или `year`.
+        :returns: Dict — сумма доходов, расходов и баланс по периодам
+         (`ГГГГ-ММ-ДД`, `ГГГГ-ММ` или `ГГГГ`) в порядке возрастания.
+        """
+
+    @abstractmethod
+    def get_user(self, user: str) -> Optional[dict]:
+        """
+        Получить данные пользователя по логину.
+
+        :param user: Логин пользователя.
+        :returns: Dict — данные пользователя, либо None, если он не найден.
+        """
+
+    @abstractmethod
+    def add_user(self, user_data: dict) -> bool:
+        """
+        Сохранить данные нового пользователя. Проверка логина и запись
+        выполняются атомарно.
+
+        :param user_data: Логин и хэш пароля пользователя.
+        :returns: Bool — False, если пользователь с таким логином уже
+         существует.
+        """
+
+    @abstractmethod
+    def iter_users(self) -> Iterator[dict]:
+        """
+        Последовательно прочитать данные всех пользователей.
+
+        :returns: Iterator[dict] — логины и хэши паролей пользователей.
+        """
+
+    @abstractmethod
+    def compact(self) -> None:
+        """
+        Пересобрать хранилище: свернуть накопленные изменения в новый
+        снимок данных и заново сохранить итоги пользователей, чтобы
+        чтение не тратило время на устаревшие записи.
+        """
+
+    @abstractmethod
+    def convert_amounts(self) -> int:
+        """
+        Перевести суммы транзакций, записанные в старом формате (дробное
+        число рублей), в целое число копеек и пересчитать итоги.
+        Повторный запуск ничего не меняет.
+
+        :returns: Int — количество переведённых транзакций.
+        """
+
+    def signature(self, user: str) -> Optional[tuple[str, int, int, int]]:
+        """
+        Получить сигнатуру файла, в котором хранятся транзакции
+        пользователя. По ней кэш определяет, изменился ли файл.
+
+        :param user: Пользователь, для которого нужна сигнатура.
+        :returns: Tuple — путь, mtime_ns, размер и inode файла, либо None,
+         если файл ещё не создан.
+        """
+        return file_signature(self.path)
+
+    def _compute_totals(self) -> dict[str, dict[str, int]]:
+        """
+        Посчитать итоги по всем транзакциям хранилища с нуля.
+
+        :returns: Dict — итоги по пользователям.
+        """
+        return compute_totals(self.iter_transactions())
+
+    def _compute_rollups(self) -> dict[str, dict[str, dict[str, int]]]:
+        """
+        Посчитать сводки по всем транзакциям хранилища с нуля.
+
+        :returns: Dict — сводки по пользователям.
+        """
+        return compute_rollups(self.iter_transactions())
+
+    def get_totals(self, user: str) -> dict[str, int]:
+        """
+        Получить сохранённые итоги пользователя без чтения истории.
+
+        :param user: Пользователь.
+        :returns: Dict — сумма доходов, расходов и баланс.
+        """
+        return self.get_all_totals().get(user, empty_totals())
+
+    def verify_totals(
+            self,
+            fix: bool = False,
+    ) -> dict[str, tuple[dict[str, int], dict[str, int]]]:
+        """
+        Пересчитать итоги по всем транзакциям и сравнить с сохранёнными.
+
+        :param fix: Перезаписать разошедшиеся итоги пересчитанными.
+        :returns: Dict — пары (сохранённые, пересчитанные) итоги
+         пользователей, для которых найдены расхождения.
+        """
+        actual = self._compute_totals()
+        stored = self.get_all_totals()
+        drift = {}
+        for user in actual.keys() | stored.keys():
+            user_stored = stored.get(user, empty_totals())
+            user_actual = actual.get(user, empty_totals())
+            # суммы в копейках целые, поэтому сравниваются точно.
+            if any(
+                    user_stored[key] != user_actual[key] for key in user_actual
+            ):
+                drift[user] = (user_stored, user_actual)
+        if fix and drift:
+            self._replace_totals(
+                {user: pair[1] for user, pair in drift.items()}
+            )
+        return drift
+
+    def get_history(self, user: str) -> list[dict]:
+        """
+        Получить историю транзакций пользователя.
+
+        :param user: Пользователь, для которого нужно получить историю.
+        :returns: List[dict] — история транзакций.
+        """
+        return list(self.iter_transactions(user))
+
+    def get_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[dict]:
+        """
+        Получить транзакцию пользователя по её ID.
+
+        :param user: Пользователь, совершивший транзакцию.
+        :param transaction_id: ID транзакции.
+        :returns: Dict — транзакция, либо None, если она не найдена.
+        """
+        return next(
+            (
+                item
+                for item in self.iter_transactions(user)
+                if item["id"] == transaction_id
+            ),
+            None,
+        )
+
+    def find_transactions(
+            self,
+            user: str,
+            field: str,
+            value: Union[str, int],
+    ) -> list[dict]:
+        """
+        Найти транзакции пользователя с указанным значением поля.
+
+        :param user: Пользователь, в истории которого производится поиск.
+        :param field: Поле транзакции.
+        :param value: Искомое значение поля.
+        :returns: List[dict] — найденные транзакции.
+        """
+        return [
+            item
+            for item in self.iter_transactions(user)
+            if item.get(field) == value
+        ]
+
+
+class JsonStorage(StorageEngine):
+    """
+    Хранилище в виде JSON-массива. Новые записи вставляются перед
+    закрывающей скобкой массива. Массив служит снимком данных:
+    изменения транзакций не переписывают его, а дописываются короткими
+    записями в журнал правок `<имя>.edits.jsonl` и накладываются на
+    снимок при чтении. Когда журнал правок вырастает до
+    `EDITS_COMPACT_RATIO` от размера снимка, compact() сворачивает
+    правки в новый снимок.
+
+    Рядом с массивом хранится индекс `ID -> (пользователь, смещение,
+    длина элемента)` — файл `<имя>.idx`, который только дописывается,
+    в том числе при дописывании записей в массив. По нему поиск и
+    редактирование транзакции читают один элемент массива, а не весь
+    файл. Полная перезапись массива удаляет индекс, и он строится заново
+    при следующем поиске.
+
+    Для поиска пользователей по логину в памяти держится индекс
+    `логин -> данные`, который строится одним проходом по файлу и
+    перестраивается, только если файл изменили в обход хранилища.
+    """
+
+    def __init__(self, path: Union[str, Path], encoding: str = "utf-8"):
+        super().__init__(path, encoding)
+        self._users: dict[str, dict] = {}
+        self._users_signature: Optional[tuple[str, int, int, int]] = None
+        self._edits: dict[tuple[str, str], dict] = {}
+        self._edits_inode: Optional[int] = None
+        self._edits_position = 0
+        self._edits_lock = threading.Lock()
+        self._offsets: dict[str, tuple[str, int, int]] = {}
+        self._index_inode: Optional[int] = None
+        self._index_position = 0
+        self._indexed_size = 0
+        self._indexable = True
+
+    @property
+    def _edits_path(self) -> Path:
+        return self.path.with_suffix(Uc.EDITS_SUFFIX)
+
+    def signature(self, user: str) -> Optional[tuple[str, int, int, int]]:
+        signature = file_signature(self.path)
+        edits = file_signature(self._edits_path)
+        if signature is None or edits is None:
+            return signature
+        # правки меняют содержимое хранилища, не трогая снимок.
+        path, mtime, size, inode = signature
+        return path, max(mtime, edits[1]), size + edits[2], inode
+
+    def _read_edits(self) -> dict[tuple[str, str], dict]:
+        """
+        Дочитать журнал правок. Правки одной транзакции сливаются
+        в один словарь, поэтому наложение на снимок стоит одного
+        поиска по словарю на транзакцию.
+
+        :returns: Dict — новые значения полей по паре (пользователь, ID).
+        """
+        with self._edits_lock:
+            try:
+                stat = self._edits_path.stat()
+            except FileNotFoundError:
+                self._edits, self._edits_inode = {}, None
+                self._edits_position = 0
+                return self._edits
+            if (
+                    stat.st_ino != self._edits_inode
+                    or stat.st_size < self._edits_position
+            ):
+                self._edits, self._edits_inode = {}, stat.st_ino
+                self._edits_position = 0
+            if stat.st_size > self._edits_position:
+                with open(self._edits_path, "rb") as file:
+                    file.seek(self._edits_position)
+                    chunk = file.read(stat.st_size - self._edits_position)
+                metrics.add("bytes_read", len(chunk))
+                chunk = chunk[:chunk.rfind(b"\n") + 1]  # только целые строки
+                for line in chunk.splitlines():
+                    edit = json.loads(line)
+                    self._edits.setdefault(
+                        (edit["user"], edit["id"]), {}
+                    ).update(edit["values"])
+                self._edits_position += len(chunk)
+            return self._edits
+
+    @staticmethod
+    def _apply_edits(
+            item: dict,
+            edits: dict[tuple[str, str], dict],
+    ) -> dict:
+        changes = edits.get((item.get("user"), item.get("id")))
+        return {**item, **changes} if changes else item
+
+    def _load(self) -> list[dict]:
+        edits = self._read_edits()
+        try:
+            with open(self.path, "r", encoding=self.encoding) as file:
+                data = json.load(file)
+                if metrics.enabled:
+                    metrics.add("bytes_read", file.tell())
+        except FileNotFoundError:
+            return []  # для подстраховки на случай первого запуска
+        except json.JSONDecodeError:
+            return []  # аналогично
+        metrics.add("records_scanned", len(data))
+        return [self._apply_edits(item, edits) for item in data]
+
+    def _dump(self, data: list[dict]) -> None:
+        write_atomic(self.path, json.dumps(data, indent=4), self.encoding)
+        self._index_path.unlink(missing_ok=True)
+
+    def _append(self, items: list[dict]) -> None:
+        if not items:
+            return
+        if not self._append_in_place(items):
+            data = self._load()
+            data.extend(items)
+            self._dump(data)
+        elif self._index_path.exists():
+            self._sync_index()  # в индекс попадут только новые записи
+
+    def _append_in_place(self, items: list[dict]) -> bool:
+        """
+        Дописать записи в массив, не перечитывая файл: записи вставляются
+        на место закрывающей скобки в том же виде, что и при полной
+        перезаписи.
+
+        :param items: Новые записи.
+        :returns: Bool — False, если файл не похож на JSON-массив и его
+         нужно перезаписать целиком.
+        """
+        if "]".encode(self.encoding) != b"]":
+            return False  # кодировка несовместима с ASCII
+        data = ",\n".join(
+            textwrap.indent(json.dumps(item, indent=4), " " * 4)
+            for item in items
+        ).encode(self.encoding)
+        try:
+            file = open(self.path, "r+b")
+        except FileNotFoundError:
+            return False
+        with file:
+            start = max(0, file.seek(0, os.SEEK_END) - Uc.READ_CHUNK_SIZE)
+            file.seek(start)
+            tail = file.read().rstrip()
+            body = tail[:-1].rstrip()
+            if not tail.endswith(b"]") or not body:
+                return False
+            file.seek(start + len(body))
+            file.write(
+                (b"\n" if body.endswith(b"[") else b",\n") + data + b"\n]"
+            )
+            file.truncate()
+        metrics.add("bytes_written", len(data))
+        return True
+
+    @property
+    def _index_path(self) -> Path:
+        return self.path.with_name(self.path.name + Uc.ID_INDEX_SUFFIX)
+
+    def _reset_index(self, inode: Optional[int] = None) -> None:
+        self._offsets = {}
+        self._index_inode = inode
+        self._index_position = 0
+        self._indexed_size = 0
+
+    def _read_index_tail(self) -> None:
+        try:
+            stat = self._index_path.stat()
+        except FileNotFoundError:
+            self._reset_index()
+            return
+        if (
+                stat.st_ino != self._index_inode
+                or stat.st_size < self._index_position
+        ):
+            self._reset_index(stat.st_ino)
+        if stat.st_size == self._index_position:
+            return
+        with open(self._index_path, "rb") as file:
+            file.seek(self._index_position)
+            chunk = file.read()
+        metrics.add("bytes_read", len(chunk))
+        chunk = chunk[:chunk.rfind(b"\n") + 1]  # только целые строки
+        # строки индекса разбираются одним вызовом как JSON-массив.
+        entries = json.loads(b"[" + chunk.rstrip().replace(b"\n", b",") + b"]")
+        for transaction_id, user, offset, length in entries:
+            self._offsets[transaction_id] = (user, offset, length)
+            self._indexed_size = max(self._indexed_size, offset + length)
+        self._index_position += len(chunk)
+
+    @locked
+    def _sync_index(self) -> None:
+        """
+        Дочитать новые строки индекса и проиндексировать записи, которые
+        в индекс ещё не попали (например, записанные до его появления).
+        Если файл был перезаписан, индекс строится заново.
+        """
+        self._read_index_tail()
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < self._indexed_size:
+            self._index_path.unlink(missing_ok=True)
+            self._reset_index()
+        if size == self._indexed_size:
+            return
+        scanned = self._scan_index(self._indexed_size)
+        self._indexable = scanned is not None
+        if scanned is None:
+            return
+        entries, end = scanned
+        self._write_index(entries)
+        self._indexed_size = max(self._indexed_size, end)
+
+    def _write_index(self, entries: list[list]) -> None:
+        """
+        Дописать строки в индекс. Если с момента последнего чтения индекс
+        никто не менял, записи сразу попадают в память, иначе индекс
+        дочитывается с диска.
+        """
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode()
+        with open(self._index_path, "ab") as file:
+            position = file.tell()
+            inode = os.fstat(file.fileno()).st_ino
+            file.write(data)
+        metrics.add("bytes_written", len(data))
+        if position == 0 and self._index_position == 0:
+            self._index_inode = inode
+        if position != self._index_position or inode != self._index_inode:
+            self._read_index_tail()
+            return
+        for transaction_id, user, offset, length in entries:
+            self._offsets[transaction_id] = (user, offset, length)
+            self._indexed_size = max(self._indexed_size, offset + length)
+        self._index_position += len(data)
+
+    def _locate(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[tuple[int, int]]:
+        self._sync_index()
+        location = self._offsets.get(transaction_id)
+        if location is None or location[0] != user:
+            return None
+        return location[1], location[2]
+
+
+    def _scan_index(self, start: int) -> Optional[tuple[list[list], int]]:
+        """
+        Проиндексировать элементы массива, которые начинаются после
+        `start`. Элементы ищутся по отступу, с которым их пишут _dump()
+        и _append_in_place(), и разбираются по одному.
+
+        :param start: Смещение конца последнего проиндексированного
+         элемента.
+        :returns: Tuple — строки индекса и смещение конца последнего
+         элемента, либо None, если файл записан не этим хранилищем.
+        """
+        if "]".encode(self.encoding) != b"]":
+            return None  # кодировка несовместима с ASCII
+        with open(self.path, "rb") as file:
+            head = file.read(len(_ITEM_START) + 1)
+            if head != b"[" + _ITEM_START and head.rstrip() != b"[]":
+                return None
+            file.seek(start)
+            chunk = file.read()
+        metrics.add("bytes_read", len(chunk))
+        spans, texts = [], []
+        position = chunk.find(_ITEM_START)
+        while position != -1:
+            following = chunk.find(_ITEM_START, position + 1)
+            text = chunk[
+                position + 1:following if following != -1 else len(chunk)
+            ].rstrip(b" \t\r\n,]")
+            if not text.endswith(b"}"):
+                break  # элемент ещё не дописан до конца
+            spans.append((start + position + 1, len(text)))
+            texts.append(text)
+            position = following
+        items = json.loads(
+            (b"[" + b",".join(texts) + b"]").decode(self.encoding)
+        )
+        entries = [
+            [item["id"], item["user"], offset, length]
+            for item, (offset, length) in zip(items, spans)
+            if "id" in item
+        ]
+        return entries, sum(spans[-1]) if spans else start
+
+    def _read_at(self, offset: int, length: int) -> dict:
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            text = file.read(length)
+        metrics.add("bytes_read", len(text))
+        metrics.add("records_scanned", 1)
+        return next(
+            check_amounts([json.loads(text.decode(self.encoding))], self.path)
+        )
+
+    def get_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[dict]:
+        location = self._locate(user, transaction_id)
+        if location is not None:
+            try:
+                item = self._read_at(*location)
+            except json.JSONDecodeError:
+                item = None
+            if item is not None and item.get("id") == transaction_id:
+                return self._apply_edits(item, self._read_edits())
+            # файл переписали в обход хранилища: индекс строится заново.
+            self._index_path.unlink(missing_ok=True)
+        elif self._indexable:
+            return None
+        return super().get_transaction(user, transaction_id)
+
+    @staticmethod
+    def _sidecar_name(user: str) -> str:
+        return f"{sha256(user.encode()).hexdigest()}.json"
+
+    def _read_sidecar(self, directory: Path, user: str) -> Optional[object]:
+        """
+        Прочитать файл пользователя в папке итогов или сводок.
+
+        :param directory: Папка итогов или сводок.
+        :param user: Пользователь.
+        :returns: Object — содержимое файла, либо None, если его нет.
+        """
+        try:
+            with open(
+                    directory / self._sidecar_name(user),
+                    "r",
+                    encoding=self.encoding,
+            ) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_sidecar(
+            self,
+            directory: Path,
+            files: dict[str, object],
+    ) -> None:
+        directory.mkdir(exist_ok=True)
+        for user, content in files.items():
+            write_atomic(
+                directory / self._sidecar_name(user),
+                json.dumps(content),
+                self.encoding,
+            )
+
+    def _replace_sidecar(
+            self,
+            directory: Path,
+            files: dict[str, object],
+    ) -> None:
+        """
+        Заменить содержимое папки итогов или сводок: файлы указанных
+        пользователей перезаписываются, остальные удаляются. Вызывается
+        под блокировкой хранилища.
+
+        :param directory: Папка итогов или сводок.
+        :param files: Содержимое файлов по пользователям.
+        """
+        if directory.exists():
+            self._write_sidecar(directory, files)
+            names = {self._sidecar_name(user) for user in files}
+            for path in directory.glob("*.json"):
+                if path.name not in names:
+                    path.unlink()
+            return
+        # папка собирается рядом и появляется целиком: читатели без
+        # блокировки не увидят её заполненной наполовину.
+        temporary = directory.with_name(
+            f"{directory.name}.{os.getpid()}.tmp"
+        )
+        self._write_sidecar(temporary, files)
+        os.replace(temporary, directory)
+
+    @property
+    def _totals_path(self) -> Path:
+        return self.path.with_name(self.path.name + Uc.TOTALS_SUFFIX)
+
+    def _load_totals(
+            self,
+            users: Iterable[str],
+    ) -> dict[str, dict[str, int]]:
+        """
+        Прочитать итоги пользователей. Итоги каждого пользователя лежат
+        в отдельном файле, поэтому баланс и запись транзакции не
+        зависят от количества пользователей хранилища.
+
+        :param users: Пользователи.
+        :returns: Dict — итоги по пользователям.
+        """
+        if self.path.exists() and not self._totals_path.exists():
+            self._rebuild_totals(missing_only=True)
+        totals = {}
+        for user in users:
+            stored = self._read_sidecar(self._totals_path, user)
+            totals[user] = (
+                empty_totals() if stored is None
+                else self._parse_totals(stored)
+            )
+        return totals
+
+    @staticmethod
+    def _parse_totals(stored: dict) -> dict[str, int]:
+        return dict(
+            deposits=stored["deposits"],
+            withdrawals=stored["withdrawals"],
+            net=stored["deposits"] - stored["withdrawals"],
+        )
+
+    def _dump_totals(self, totals: dict[str, dict[str, int]]) -> None:
+        self._write_sidecar(self._totals_path, self._totals_files(totals))
+
+    @staticmethod
+    def _totals_files(
+            totals: dict[str, dict[str, int]],
+    ) -> dict[str, object]:
+        return {
+            user: dict(
+                user=user,
+                deposits=user_totals["deposits"],
+                withdrawals=user_totals["withdrawals"],
+            )
+            for user, user_totals in totals.items()
+        }
+
+    @locked
+    def _rebuild_totals(self, missing_only: bool = False) -> None:
+        """
+        Пересчитать итоги всех пользователей по транзакциям.
+
+        :param missing_only: Пересчитать, только если итоги ещё не
+         сохранялись, например, для хранилища, созданного до их
+         появления.
+        """
+        if missing_only and self._totals_path.exists():
+            return
+        self._replace_sidecar(
+            self._totals_path, self._totals_files(self._compute_totals())
+        )
+        # итоги прежних версий лежали в одном файле на всё хранилище.
+        self.path.with_suffix(Uc.LEGACY_TOTALS_SUFFIX).unlink(
+            missing_ok=True
+        )
+
+    def get_totals(self, user: str) -> dict[str, int]:
+        return self._load_totals([user])[user]
+
+    def get_all_totals(self) -> dict[str, dict[str, int]]:
+        # отчёт по всем пользователям читает папку итогов целиком.
+        self._load_totals(())
+        totals = {}
+        for path in self._totals_path.glob("*.json"):
+            with open(path, "r", encoding=self.encoding) as file:
+                stored = json.load(file)
+            totals[stored["user"]] = self._parse_totals(stored)
+        return totals
+
+    @locked
+    def _replace_totals(self, totals: dict[str, dict[str, int]]) -> None:
+        # итоги остальных пользователей сначала строятся по данным,
+        # иначе папка появится только с заменёнными.
+        self._load_totals(())
+        self._dump_totals(totals)
+
+    @property
+    def _rollups_path(self) -> Path:
+        return self.path.with_name(self.path.name + Uc.ROLLUPS_SUFFIX)
+
+    def _load_rollups(
+            self,
+            users: Iterable[str],
+    ) -> dict[str, dict[str, dict[str, int]]]:
+        """
+        Прочитать сводки пользователей. Сводки каждого пользователя
+        лежат в отдельном файле, поэтому запись транзакции
+        перезаписывает только сводки её пользователя.
+
+        :param users: Пользователи.
+        :returns: Dict — сводки по пользователям.
+        """
+        if self.path.exists() and not self._rollups_path.exists():
+            self._rebuild_rollups(missing_only=True)
+        rollups = {}
+        for user in users:
+            stored = self._read_sidecar(self._rollups_path, user) or {}
+            rollups[user] = {
+                key: dict(
+                    deposits=deposits,
+                    withdrawals=withdrawals,
+                    net=deposits - withdrawals,
+                )
+                for key, (deposits, withdrawals) in stored.items()
+            }
+        return rollups
+
+    def _dump_rollups(
+            self,
+            rollups: dict[str, dict[str, dict[str, int]]],
+    ) -> None:
+        self._write_sidecar(self._rollups_path, self._rollups_files(rollups))
+
+    @staticmethod
+    def _rollups_files(
+            rollups: dict[str, dict[str, dict[str, int]]],
+    ) -> dict[str, object]:
+        return {
+            user: {
+                key: [totals["deposits"], totals["withdrawals"]]
+                for key, totals in sorted(user_rollups.items())
+            }
+            for user, user_rollups in rollups.items()
+        }
+
+    @locked
+    def _rebuild_rollups(self, missing_only: bool = False) -> None:
+        """
+        Пересчитать сводки всех пользователей по транзакциям.
+
+        :param missing_only: Пересчитать, только если сводки ещё не
+         сохранялись, например, для хранилища, созданного до их
+         появления.
+        """
+        if missing_only and self._rollups_path.exists():
+            return
+        self._replace_sidecar(
+            self._rollups_path, self._rollups_files(self._compute_rollups())
+        )
+
+    def get_rollups(self, user: str, period: str) -> dict[str, dict]:
+        length = Uc.REPORT_PERIODS[period]
+        return {
+            key: totals
+            for key, totals in sorted(self._load_rollups([user])[user].items())
+            if len(key) == length
+        }
+
+    def iter_transactions(self, user: Optional[str] = None) -> Iterator[dict]:
+        edits = self._read_edits()
+        items = (
+            item
+            for item in check_amounts(
+                iter_json_array(self.path, self.encoding), self.path
+            )
+            if user is None or item["user"] == user
+        )
+        if not edits:
+            return items
+        return (self._apply_edits(item, edits) for item in items)
+
+    def iter_part(self, part: int, parts: int) -> Iterator[dict]:
+        """
+        Прочитать часть массива. Файл делится на равные куски байтов,
+        и части достаются элементы, которые начинаются в её куске.
+        Кусок разбирается целиком, без чтения остального файла. Файл,
+        записанный не этим хранилищем, не делится.
+        """
+        edits = self._read_edits()
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            head = file.read(len(_ITEM_START) + 1)
+            if (
+                    head != b"[" + _ITEM_START
+                    or "]".encode(self.encoding) != b"]"
+            ):
+                if part == 0:
+                    yield from self.iter_transactions()
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start, end = part_bounds(len(data), part, parts)
+                first = data.find(_ITEM_START, start)
+                if first == -1 or first >= end:
+                    return
+                last = data.find(_ITEM_START, end)
+                chunk = data[first + 1:last if last != -1 else len(data)]
+        metrics.add("bytes_read", len(chunk))
+        items = json.loads(
+            (b"[" + chunk.rstrip(b" \t\r\n,]") + b"]").decode(self.encoding)
+        )
+        metrics.add("records_scanned", len(items))
+        for item in check_amounts(items, self.path):
+            yield self._apply_edits(item, edits)
+
+    @locked
+    def add_transactions(self, transactions: Iterable[dict]) -> None:
+        transactions = list(transactions)
+        users = {item["user"] for item in transactions}
+        totals = self._load_totals(users)
+        rollups = self._load_rollups(users)
+        self._append(transactions)
+        for item in transactions:
+            add_to_totals(totals, item)
+            add_to_rollups(rollups, item)
+        self._dump_totals(totals)
+        self._dump_rollups(rollups)
+
+    @locked
+    def update_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+            values: dict,
+    ) -> Optional[dict]:
+        item = self.get_transaction(user, transaction_id)
+        if item is None:
+            return None
+        totals = self._load_totals([user])
+        rollups = self._load_rollups([user])
+        add_to_totals(totals, item, sign=-1)
+        add_to_rollups(rollups, item, sign=-1)
+        item = {**item, **values}
+        add_to_totals(totals, item)
+        add_to_rollups(rollups, item)
+        edit = dict(id=transaction_id, user=user, values=values)
+        line = (json.dumps(edit) + "\n").encode(self.encoding)
+        with open(self._edits_path, "ab") as file:
+            file.write(line)
+            edits_size = file.tell()
+        metrics.add("bytes_written", len(line))
+        self._dump_totals(totals)
+        self._dump_rollups(rollups)
+        if edits_size > Uc.EDITS_COMPACT_RATIO * self.path.stat().st_size:
+            self.compact()
+        return item
+
+    @locked
+    def compact(self) -> None:
+        if not self.path.exists():
+            return
+        # правки применяются повторно без изменений, поэтому читатель,
+        # заставший новый снимок вместе со старым журналом правок,
+        # видит те же данные.
+        self._dump(self._load())
+        self._rebuild_totals()
+        self._rebuild_rollups()
+        self._edits_path.unlink(missing_ok=True)
+
+    @locked
+    def _user_index(self) -> dict[str, dict]:
+        signature = file_signature(self.path)
+        if signature != self._users_signature:
+            users = {}
+            for item in self.iter_transactions():
+                users.setdefault(item["user"], item)
+            self._users = users
+            self._users_signature = signature
+        return self._users
+
+    def get_user(self, user: str) -> Optional[dict]:
+        return self._user_index().get(user)
+
+    @locked
+    def add_user(self, user_data: dict) -> bool:
+        users = self._user_index()
+        if user_data["user"] in users:
+            return False
+        self._append([user_data])
+        users[user_data["user"]] = user_data
+        self._users_signature = file_signature(self.path)
+        return True
+
+    def iter_users(self) -> Iterator[dict]:
+        return self.iter_transactions()
+
+    @locked
+    def convert_amounts(self) -> int:
+        data = self._load()
+        converted = 0
+        for item in data:
+            # раньше суммы всегда сохранялись как float.
+            if isinstance(item.get("amount"), float):
+                item["amount"] = to_cents(item["amount"])
+                converted += 1
+        if converted:
+            self._dump(data)
+            self._rebuild_totals()
+            self._rebuild_rollups()
+        return converted
+
+
+class JournalStorage(JsonStorage):
+    """
+    Хранилище в формате журнала (JSON Lines, по одной записи на строку).
+    Новые записи дописываются в конец файла, поэтому стоимость записи
+    не зависит от размера журнала.
+
+    Рядом с журналом хранится индекс `ID -> (пользователь, смещение,
+    длина строки)`, который тоже только дописывается. По нему поиск и
+    редактирование транзакции читают и переписывают одну строку журнала.
+    Если новая запись не помещается на место старой, старая строка
+    затирается пробелами, а новая дописывается в конец журнала;
+    compact() переписывает журнал без затёртых строк.
+    """
+
+    @property
+    def _index_path(self) -> Path:
+        return self.path.with_suffix(Uc.ID_INDEX_SUFFIX)
+
+    def _scan_index(self, start: int) -> Optional[tuple[list[list], int]]:
+        entries = []
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            offset = start
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break  # запись ещё не дописана до конца
+                if line.strip():
+                    item = json.loads(line)
+                    if "id" in item:
+                        entries.append(
+                            [item["id"], item["user"], offset, len(line)]
+                        )
+                offset += len(line)
+        return entries, offset
+
+    def _read_at(self, offset: int, length: int) -> dict:
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            line = file.read(length)
+        metrics.add("bytes_read", len(line))
+        metrics.add("records_scanned", 1)
+        return next(check_amounts([json.loads(line)], self.path))
+
+    def get_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[dict]:
+        location = self._locate(user, transaction_id)
+        if location is None:
+            return None
+        return self._read_at(*location)
+
+    @locked
+    def update_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+            values: dict,
+    ) -> Optional[dict]:
+        location = self._locate(user, transaction_id)
+        if location is None:
+            return None
+        offset, length = location
+        item = self._read_at(offset, length)
+        totals = self._load_totals([user])
+        rollups = self._load_rollups([user])
+        add_to_totals(totals, item, sign=-1)
+        add_to_rollups(rollups, item, sign=-1)
+        item.update(values)
+        add_to_totals(totals, item)
+        add_to_rollups(rollups, item)
+        line = json.dumps(item).encode(self.encoding)
+        with open(self.path, "r+b") as file:
+            file.seek(offset)
+            if len(line) < length:
+                file.write(line.ljust(length - 1) + b"\n")
+                written = length
+            else:
+                file.write(b" " * (length - 1))
+                file.seek(0, 2)
+                file.write(line + b"\n")
+                written = length + len(line)
+        metrics.add("bytes_written", written)
+        self._sync_index()
+        self._dump_totals(totals)
+        self._dump_rollups(rollups)
+        return item
+
+    def _load(self) -> list[dict]:
+        return list(self._read())
+
+    def _read(self) -> Iterator[dict]:
+        size = scanned = 0
+        try:
+            with open(self.path, "r", encoding=self.encoding) as file:
+                for line in file:
+                    size += len(line)
+                    if line.strip():
+                        scanned += 1
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return  # для подстраховки на случай первого запуска
+        finally:
+            metrics.add("bytes_read", size)
+            metrics.add("records_scanned", scanned)
+
+    def _dump(self, data: list[dict]) -> None:
+        write_atomic(
+            self.path,
+            "".join(json.dumps(item) + "\n" for item in data),
+            self.encoding,
+        )
+        self._index_path.unlink(missing_ok=True)
+
+    def iter_transactions(self, user: Optional[str] = None) -> Iterator[dict]:
+        return (
+            item
+            for item in check_amounts(self._read(), self.path)
+            if user is None or item["user"] == user
+        )
+
+    def iter_part(self, part: int, parts: int) -> Iterator[dict]:
+        """
+        Прочитать часть журнала. Файл делится на равные куски байтов,
+        и части достаются строки, которые начинаются в её куске.
+        """
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return iter(())
+        with file:
+            start, end = part_bounds(
+                os.fstat(file.fileno()).st_size, part, parts
+            )
+            if start:
+                file.seek(start - 1)
+                file.readline()  # строка началась в предыдущей части
+            if file.tell() >= end:
+                return iter(())
+            # последняя строка части дочитывается до конца.
+            chunk = file.read(end - file.tell()) + file.readline()
+        metrics.add("bytes_read", len(chunk))
+        items = [
+            json.loads(line.decode(self.encoding))
+            for line in chunk.splitlines()
+            if line.strip()
+        ]
+        metrics.add("records_scanned", len(items))
+        return check_amounts(items, self.path)
+
+    def _append(self, items: list[dict]) -> None:
+        lines = [
+            (json.dumps(item) + "\n").encode(self.encoding) for item in items
+        ]
+        metrics.add("bytes_written", sum(map(len, lines)))
+        if not any("id" in item for item in items):
+            with open(self.path, "ab") as file:
+                file.write(b"".join(lines))
+            return
+        self._sync_index()
+        with open(self.path, "ab") as file:
+            offset = file.tell()
+            file.write(b"".join(lines))
+        if offset != self._indexed_size:
+            self._sync_index()  # журнал дописывали в обход индекса
+            return
+        entries = []
+        for item, line in zip(items, lines):
+            if "id" in item:
+                entries.append([item["id"], item["user"], offset, len(line)])
+            offset += len(line)
+        self._write_index(entries)
+
+
+class LedgerStorage(JsonStorage):
+    """
+    Двоичный журнал транзакций. Каждая транзакция хранится записью
+    фиксированного размера `RECORD`: дата в днях, код категории, флаги,
+    сумма, ID в виде 16 байт UUID и ссылки (смещение и длина) на логин
+    и описание в файле строк `<путь>.heap`. Логин каждого пользователя
+    попадает в файл строк один раз.
+
+    Оба файла читаются через mmap: итоги, отбор транзакций пользователя
+    и поиск по ID, дате, категории и сумме идут по сырым записям, а
+    словари создаются только для транзакций, которые нужно вернуть.
+    Новые записи дописываются в конец журнала, при редактировании
+    запись переписывается на месте, а новые строки дописываются в файл
+    строк. Пользователи хранятся отдельно, в журнале
+    `<путь>.users.jsonl`.
+
+    Журналы первой версии (`LEGACY_MAGIC`) хранили сумму в рублях как
+    double; они читаются, но дописывать их нельзя, пока суммы не
+    переведены в копейки командой `convert_amounts()`.
+    """
+
+    MAGIC = b"WLEDGER2"
+    LEGACY_MAGIC = b"WLEDGER1"
+    # дата, категория, флаги, сумма в копейках, ID, логин и описание
+    # (смещение и длина в файле строк).
+    RECORD = struct.Struct("<iBBxxq16sIHIH")
+    LEGACY_RECORD = struct.Struct("<iBBxxd16sIHIH")
+    HEAP_REF = struct.Struct("<IH")
+    CATEGORIES = tuple(DEPOSIT_TYPE_MAPPING)
+    COLUMNS = dict(date=0, category=1, amount=3)
+    ID_IN_HEAP = 1  # ID не является UUID и хранится в файле строк
+    NO_DESCRIPTION = 2  # описание равно None
+
+    def __init__(self, path: Union[str, Path], encoding: str = "utf-8"):
+        super().__init__(path, encoding)
+        self._users_storage = JournalStorage(
+            self.path.with_suffix(Uc.LEDGER_USERS_SUFFIX), encoding
+        )
+        self._heap_users: dict[str, tuple[int, int]] = {}
+        self._heap_size = 0
+
+    @property
+    def _heap_path(self) -> Path:
+        return self.path.with_name(self.path.name + Uc.LEDGER_HEAP_SUFFIX)
+
+    @staticmethod
+    def _map(path: Path) -> Union[mmap.mmap, bytes]:
+        """
+        Отобразить файл в память только для чтения. Отображение
+        закрывается, когда на него не остаётся ссылок.
+
+        :param path: Путь к файлу.
+        :returns: mmap — содержимое файла, либо пустые байты, если файла
+         нет или он пуст.
+        """
+        try:
+            with open(path, "rb") as file:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # пустой файл не отобразить
+            return b""
+
+    def _read_records(
+            self,
+            part: int = 0,
+            parts: int = 1,
+    ) -> tuple[Iterator[tuple], Union[mmap.mmap, bytes]]:
+        """
+        Получить записи журнала и файл строк. Файл строк отображается
+        после журнала, поэтому в нём уже есть все строки, на которые
+        ссылаются записи. Недописанная последняя запись пропускается.
+
+        :param part: Номер части записей, начиная с нуля.
+        :param parts: Количество равных частей, на которые делятся
+         записи; по умолчанию читаются все записи.
+        :returns: Tuple — итератор распакованных записей и файл строк.
+        """
+        records = self._map(self.path)
+        heap = self._map(self._heap_path)
+        magic = records[:len(self.MAGIC)]
+        if magic == self.MAGIC:
+            record = self.RECORD
+        elif magic == self.LEGACY_MAGIC:
+            record = self.LEGACY_RECORD
+        else:
+            return iter(()), heap
+        first, last = part_bounds(
+            (len(records) - len(self.MAGIC)) // record.size, part, parts
+        )
+        start = len(self.MAGIC) + first * record.size
+        end = len(self.MAGIC) + last * record.size
+        metrics.add("bytes_read", end - start)
+        metrics.add("records_scanned", last - first)
+        return record.iter_unpack(memoryview(records)[start:end]), heap
+
+    def _check_format(self) -> None:
+        """
+        Убедиться, что журнал можно изменять: записи старого формата
+        нельзя смешивать с новыми.
+
+        :raises ValueError: Если суммы в журнале ещё не переведены
+         в копейки.
+        """
+        try:
+            with open(self.path, "rb") as file:
+                magic = file.read(len(self.MAGIC) + 1)
+        except FileNotFoundError:
+            return
+        # в журнале без записей заголовок просто перезаписывается.
+        if (
+                magic[:len(self.MAGIC)] == self.LEGACY_MAGIC
+                and magic[len(self.MAGIC):]
+        ):
+            raise ValueError(Err.LEGACY_AMOUNTS.format(self.path))
+
+    def _string(
+            self,
+            heap: Union[mmap.mmap, bytes],
+            offset: int,
+            length: int,
+    ) -> str:
+        return heap[offset:offset + length].decode(self.encoding)
+
+    def _user_filter(
+            self,
+            heap: Union[mmap.mmap, bytes],
+            user: str,
+    ) -> Callable[[tuple], bool]:
+        """
+        Получить проверку, принадлежит ли запись пользователю. Логин
+        каждой строки файла строк сравнивается с искомым один раз.
+
+        :param heap: Файл строк.
+        :param user: Пользователь.
+        :returns: Callable — функция, принимающая распакованную запись.
+        """
+        wanted = user.encode(self.encoding)
+        matches: dict[int, bool] = {}
+
+        def belongs_to_user(record: tuple) -> bool:
+            match = matches.get(record[5])
+            if match is None:
+                match = matches[record[5]] = (
+                    heap[record[5]:record[5] + record[6]] == wanted
+                )
+            return match
+
+        return belongs_to_user
+
+    def _unpack(self, record: tuple, heap: Union[mmap.mmap, bytes]) -> dict:
+        (
+            days, category, flags, amount, raw_id,
+            user_offset, user_length, description_offset, description_length,
+        ) = record
+        if flags & self.ID_IN_HEAP:
+            transaction_id = self._string(
+                heap, *self.HEAP_REF.unpack_from(raw_id)
+            )
+        else:
+            transaction_id = str(UUID(bytes=raw_id))
+        return dict(
+            id=transaction_id,
+            user=self._string(heap, user_offset, user_length),
+            date=date.fromordinal(days).isoformat() if days else "",
+            category=self.CATEGORIES[category],
+            amount=amount,
+            description=(
+                None if flags & self.NO_DESCRIPTION
+                else self._string(heap, description_offset, description_length)
+            ),
+        )
+
+    def _sync_heap_users(self) -> None:
+        """
+        Перестроить таблицу `логин -> строка в файле строк`, если файл
+        строк дописывали в обход этого экземпляра хранилища.
+        """
+        try:
+            size = self._heap_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size == self._heap_size:
+            return
+        records, heap = self._read_records()
+        users = {}
+        for record in records:
+            if record[5] not in users:
+                users[record[5]] = record[6]
+        self._heap_users = {
+            self._string(heap, offset, length): (offset, length)
+            for offset, length in users.items()
+        }
+        self._heap_size = size
+
+    def _pack(self, items: list[dict]) -> bytes:
+        """
+        Упаковать транзакции в записи, дописав их строки в файл строк.
+        Вызывается под блокировкой хранилища.
+
+        :param items: Транзакции.
+        :returns: Bytes — записи для журнала.
+        :raises ValueError: Если у транзакции несуществующая дата: в записи
+         дата хранится номером дня. Ничего не записывается.
+        """
+        self._sync_heap_users()
+        heap = bytearray()
+        new_users = {}
+
+        def put(value: str) -> tuple[int, int]:
+            data = value.encode(self.encoding)
+            heap.extend(data)
+            return self._heap_size + len(heap) - len(data), len(data)
+
+        records = []
+        for item in items:
+            day = date_to_ordinal(item["date"]) if item["date"] else 0
+            if item["date"] and not day:
+                raise ValueError(
+                    Err.LEDGER_INVALID_DATE.format(item["date"], self.path)
+                )
+            flags = 0
+            raw_id = uuid_bytes(item["id"])
+            if raw_id is None:
+                flags |= self.ID_IN_HEAP
+                raw_id = self.HEAP_REF.pack(*put(item["id"]))
+            user = self._heap_users.get(item["user"]) or new_users.get(
+                item["user"]
+            )
+            if user is None:
+                user = new_users[item["user"]] = put(item["user"])
+            if item.get("description") is None:
+                flags |= self.NO_DESCRIPTION
+                description = (0, 0)
+            else:
+                description = put(item["description"])
+            records.append(
+                self.RECORD.pack(
+                    day,
+                    self.CATEGORIES.index(item["category"]),
+                    flags,
+                    item["amount"],
+                    raw_id,
+                    *user,
+                    *description,
+                )
+            )
+        if heap:
+            with open(self._heap_path, "ab") as file:
+                file.write(heap)
+            metrics.add("bytes_written", len(heap))
+            self._heap_size += len(heap)
+            self._heap_users.update(new_users)
+        return b"".join(records)
+
+    def _load(self) -> list[dict]:
+        return list(self.iter_transactions())
+
+    def _dump(self, data: list[dict]) -> None:
+        # файл строк только дописывается: читатели, которые уже
+        # отобразили старый журнал, продолжают находить свои строки.
+        write_atomic(self.path, self.MAGIC + self._pack(data))
+
+    def _append(self, items: list[dict]) -> None:
+        if not items:
+            return
+        self._check_format()
+        records = self._pack(items)
+        with open(self.path, "ab") as file:
+            size = file.seek(0, os.SEEK_END)
+            if size <= len(self.MAGIC):
+                file.truncate(0)
+                records = self.MAGIC + records
+            elif (size - len(self.MAGIC)) % self.RECORD.size:
+                file.truncate(  # отбросить недописанную запись
+                    size - (size - len(self.MAGIC)) % self.RECORD.size
+                )
+            file.write(records)
+        metrics.add("bytes_written", len(records))
+
+    def _compute_totals(self) -> dict[str, dict[str, int]]:
+        records, heap = self._read_records()
+        # суммы доходов и расходов по строке логина: коды категорий
+        # совпадают с индексами в списке.
+        sums = defaultdict(lambda: [0, 0])
+        for record in records:
+            sums[record[5], record[6]][record[1]] += record[3]
+        totals = {}
+        for (offset, length), (deposits, withdrawals) in sums.items():
+            user_totals = totals.setdefault(
+                self._string(heap, offset, length), empty_totals()
+            )
+            user_totals["deposits"] += deposits
+            user_totals["withdrawals"] += withdrawals
+            user_totals["net"] += deposits - withdrawals
+        return totals
+
+    def iter_transactions(self, user: Optional[str] = None) -> Iterator[dict]:
+        records, heap = self._read_records()
+        if user is not None:
+            records = filter(self._user_filter(heap, user), records)
+        return (self._unpack(record, heap) for record in records)
+
+    def iter_part(self, part: int, parts: int) -> Iterator[dict]:
+        records, heap = self._read_records(part, parts)
+        return (self._unpack(record, heap) for record in records)
+
+    def _locate(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[tuple[int, dict]]:
+        """
+        Найти транзакцию, сравнивая ID прямо в записях журнала.
+
+        :param user: Пользователь, совершивший транзакцию.
+        :param transaction_id: ID транзакции.
+        :returns: Tuple — смещение записи в журнале и транзакция, либо
+         None, если она не найдена.
+        """
+        raw_id = uuid_bytes(transaction_id)
+        wanted = str(transaction_id).encode(self.encoding)
+        records, heap = self._read_records()
+        belongs_to_user = self._user_filter(heap, user)
+        for number, record in enumerate(records):
+            if raw_id is None:
+                if not record[2] & self.ID_IN_HEAP:
+                    continue
+                offset, length = self.HEAP_REF.unpack_from(record[4])
+                found = heap[offset:offset + length] == wanted
+            else:
+                found = (
+                    record[4] == raw_id and not record[2] & self.ID_IN_HEAP
+                )
+            if found and belongs_to_user(record):
+                return (
+                    len(self.MAGIC) + number * self.RECORD.size,
+                    self._unpack(record, heap),
+                )
+        return None
+
+    def get_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[dict]:
+        found = self._locate(user, transaction_id)
+        return None if found is None else found[1]
+
+    def find_transactions(
+            self,
+            user: str,
+            field: str,
+            value: Union[str, int],
+    ) -> list[dict]:
+        if field == "category" and value in self.CATEGORIES:
+            wanted = self.CATEGORIES.index(value)
+        elif field == "amount" and isinstance(value, int):
+            wanted = value
+        else:
+            return super().find_transactions(user, field, value)
+        column = self.COLUMNS[field]
+        records, heap = self._read_records()
+        belongs_to_user = self._user_filter(heap, user)
+        return [
+            self._unpack(record, heap)
+            for record in records
+            if record[column] == wanted and belongs_to_user(record)
+        ]
+
+    @locked
+    def update_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+            values: dict,
+    ) -> Optional[dict]:
+        found = self._locate(user, transaction_id)
+        if found is None:
+            return None
+        self._check_format()
+        position, item = found
+        totals = self._load_totals([user])
+        rollups = self._load_rollups([user])
+        add_to_totals(totals, item, sign=-1)
+        add_to_rollups(rollups, item, sign=-1)
+        item.update(values)
+        add_to_totals(totals, item)
+        add_to_rollups(rollups, item)
+        record = self._pack([item])
+        with open(self.path, "r+b") as file:
+            file.seek(position)
+            file.write(record)
+        metrics.add("bytes_written", len(record))
+        self._dump_totals(totals)
+        self._dump_rollups(rollups)
+        return item
+
+    @locked
+    def compact(self) -> None:
+        # записи фиксированного размера правятся на месте, сворачивать
+        # в них нечего. Файл строк не пересобирается: читатели без
+        # блокировки могли уже отобразить журнал, ссылающийся на него.
+        self._rebuild_totals()
+        self._rebuild_rollups()
+
+    def get_user(self, user: str) -> Optional[dict]:
+        return self._users_storage.get_user(user)
+
+    def add_user(self, user_data: dict) -> bool:
+        return self._users_storage.add_user(user_data)
+
+    def iter_users(self) -> Iterator[dict]:
+        return self._users_storage.iter_users()
+
+
+class SqliteStorage(StorageEngine):
+    """
+    Хранилище в базе данных SQLite. Поиск по пользователю, ID, дате
+    и категории выполняется по индексам, без полного просмотра данных.
+    """
+
+    COLUMNS = ("id", "user", *TRANSACTION_FIELDS_MAPPING)
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            user TEXT NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            description TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_transactions_user
+            ON transactions (user);
+        CREATE INDEX IF NOT EXISTS ix_transactions_user_date
+            ON transactions (user, date);
+        CREATE INDEX IF NOT EXISTS ix_transactions_user_category
+            ON transactions (user, category);
+        CREATE TABLE IF NOT EXISTS users (
+            user TEXT PRIMARY KEY,
+            password TEXT NOT NULL
+        );
+    """
+    # итоги пользователей обновляются триггерами в той же транзакции,
+    # что и изменение самих записей.
+    TOTALS_SCHEMA = """
+        CREATE TABLE balances (
+            user TEXT PRIMARY KEY,
+            deposits INTEGER NOT NULL DEFAULT 0,
+            withdrawals INTEGER NOT NULL DEFAULT 0,
+            net INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TRIGGER tr_transactions_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT OR IGNORE INTO balances (user) VALUES (NEW.user);
+            UPDATE balances SET
+                deposits = deposits + (NEW.category = 'deposit') * NEW.amount,
+                withdrawals = withdrawals
+                    + (NEW.category = 'withdraw') * NEW.amount,
+                net = net + (NEW.category = 'deposit') * NEW.amount
+                    - (NEW.category = 'withdraw') * NEW.amount
+            WHERE user = NEW.user;
+        END;
+        CREATE TRIGGER tr_transactions_update
+            AFTER UPDATE OF category, amount ON transactions
+        BEGIN
+            UPDATE balances SET
+                deposits = deposits - (OLD.category = 'deposit') * OLD.amount
+                    + (NEW.category = 'deposit') * NEW.amount,
+                withdrawals = withdrawals
+                    - (OLD.category = 'withdraw') * OLD.amount
+                    + (NEW.category = 'withdraw') * NEW.amount,
+                net = net - (OLD.category = 'deposit') * OLD.amount
+                    + (OLD.category = 'withdraw') * OLD.amount
+                    + (NEW.category = 'deposit') * NEW.amount
+                    - (NEW.category = 'withdraw') * NEW.amount
+            WHERE user = NEW.user;
+        END;
+        INSERT INTO balances (user, deposits, withdrawals, net)
+        SELECT
+            user,
+            SUM((category = 'deposit') * amount),
+            SUM((category = 'withdraw') * amount),
+            SUM((category = 'deposit') * amount)
+                - SUM((category = 'withdraw') * amount)
+        FROM transactions
+        GROUP BY user;
+    """
+    # сводки по годам, месяцам и дням (периоды — начала даты длиной 4,
+    # 7 и 10 символов) тоже обновляются триггерами.
+    ISO_DATE = "'[12][0-9][0-9][0-9]-[01][0-9]-[0-3][0-9]'"
+    ROLLUPS_SCHEMA = f"""
+        CREATE TABLE rollups (
+            user TEXT NOT NULL,
+            period TEXT NOT NULL,
+            deposits INTEGER NOT NULL DEFAULT 0,
+            withdrawals INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user, period)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER tr_rollups_insert AFTER INSERT ON transactions
+        WHEN NEW.date GLOB {ISO_DATE}
+            AND NEW.category IN ('deposit', 'withdraw')
+        BEGIN
+            INSERT INTO rollups (user, period, deposits, withdrawals)
+            SELECT
+                NEW.user,
+                substr(NEW.date, 1, length),
+                (NEW.category = 'deposit') * NEW.amount,
+                (NEW.category = 'withdraw') * NEW.amount
+            FROM (SELECT 4 AS length UNION ALL SELECT 7 UNION ALL SELECT 10)
+            WHERE true
+            ON CONFLICT (user, period) DO UPDATE SET
+                deposits = deposits + excluded.deposits,
+                withdrawals = withdrawals + excluded.withdrawals;
+        END;
+        CREATE TRIGGER tr_rollups_update
+            AFTER UPDATE OF date, category, amount ON transactions
+        BEGIN
+            UPDATE rollups SET
+                deposits = deposits - (OLD.category = 'deposit') * OLD.amount,
+                withdrawals = withdrawals
+                    - (OLD.category = 'withdraw') * OLD.amount
+            WHERE user = OLD.user
+                AND OLD.date GLOB {ISO_DATE}
+                AND period IN (
+                    substr(OLD.date, 1, 4), substr(OLD.date, 1, 7), OLD.date
+                );
+            DELETE FROM rollups
+            WHERE user = OLD.user AND deposits = 0 AND withdrawals = 0;
+            INSERT INTO rollups (user, period, deposits, withdrawals)
+            SELECT
+                NEW.user,
+                substr(NEW.date, 1, length),
+                (NEW.category = 'deposit') * NEW.amount,
+                (NEW.category = 'withdraw') * NEW.amount
+            FROM (SELECT 4 AS length UNION ALL SELECT 7 UNION ALL SELECT 10)
+            WHERE NEW.date GLOB {ISO_DATE}
+                AND NEW.category IN ('deposit', 'withdraw')
+            ON CONFLICT (user, period) DO UPDATE SET
+                deposits = deposits + excluded.deposits,
+                withdrawals = withdrawals + excluded.withdrawals;
+        END;
+        INSERT INTO rollups (user, period, deposits, withdrawals)
+        SELECT
+            user,
+            substr(date, 1, length) AS period,
+            SUM((category = 'deposit') * amount),
+            SUM((category = 'withdraw') * amount)
+        FROM transactions,
+            (SELECT 4 AS length UNION ALL SELECT 7 UNION ALL SELECT 10)
+        WHERE date GLOB {ISO_DATE}
+            AND category IN ('deposit', 'withdraw')
+        GROUP BY user, period;
+    """
+    # таблица со старой схемой (сумма в рублях, REAL) пересоздаётся:
+    # тип столбца в SQLite изменить нельзя.
+    CONVERT_AMOUNTS = f"""
+        DROP TRIGGER IF EXISTS tr_transactions_insert;
+        DROP TRIGGER IF EXISTS tr_transactions_update;
+        DROP TRIGGER IF EXISTS tr_rollups_insert;
+        DROP TRIGGER IF EXISTS tr_rollups_update;
+        DROP TABLE IF EXISTS balances;
+        DROP TABLE IF EXISTS rollups;
+        DROP INDEX IF EXISTS ix_transactions_user;
+        DROP INDEX IF EXISTS ix_transactions_user_date;
+        DROP INDEX IF EXISTS ix_transactions_user_category;
+        ALTER TABLE transactions RENAME TO transactions_legacy;
+        {SCHEMA}
+        INSERT INTO transactions
+        SELECT
+            id, user, date, category,
+            CAST(ROUND(amount * {Uc.CENTS_PER_UNIT}) AS INTEGER),
+            description
+        FROM transactions_legacy
+        ORDER BY rowid;
+        DROP TABLE transactions_legacy;
+        {TOTALS_SCHEMA}
+        {ROLLUPS_SCHEMA}
+    """
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3  # нужен только этому хранилищу
+
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(self.SCHEMA)
+        if not connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'balances'"
+        ).fetchone():
+            connection.executescript(
+                f"BEGIN; {self.TOTALS_SCHEMA} COMMIT;"
+            )
+        if not connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'rollups'"
+        ).fetchone():
+            connection.executescript(
+                f"BEGIN; {self.ROLLUPS_SCHEMA} COMMIT;"
+            )
+        return connection
+
+    def _iter_select(
+            self,
+            where: str = "",
+            params: tuple = (),
+    ) -> Iterator[dict]:
+        with closing(self._connect()) as connection:
+            scanned = 0
+            try:
+                for row in connection.execute(
+                        f"SELECT {', '.join(self.COLUMNS)} FROM transactions "
+                        f"{where} ORDER BY rowid",
+                        params,
+                ):
+                    scanned += 1
+                    yield dict(row)
+            finally:
+                metrics.add("records_scanned", scanned)
+
+    def _select(self, where: str = "", params: tuple = ()) -> list[dict]:
+        return list(self._iter_select(where, params))
+
+    def iter_transactions(self, user: Optional[str] = None) -> Iterator[dict]:
+        if user is None:
+            return self._iter_select()
+        return self._iter_select("WHERE user = ?", (user,))
+
+    def iter_part(self, part: int, parts: int) -> Iterator[dict]:
+        """
+        Прочитать часть таблицы: диапазон rowid делится на равные части,
+        и каждая часть читается по первичному ключу таблицы.
+        """
+        with closing(self._connect()) as connection:
+            low, high = connection.execute(
+                "SELECT min(rowid), max(rowid) FROM transactions"
+            ).fetchone()
+        if low is None:
+            return iter(())
+        first, last = part_bounds(high - low + 1, part, parts)
+        return self._iter_select(
+            "WHERE rowid >= ? AND rowid < ?", (low + first, low + last)
+        )
+
+    def get_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+    ) -> Optional[dict]:
+        rows = self._select(
+            "WHERE id = ? AND user = ?", (transaction_id, user)
+        )
+        return rows[0] if rows else None
+
+    def find_transactions(
+            self,
+            user: str,
+            field: str,
+            value: Union[str, int],
+    ) -> list[dict]:
+        if field not in self.COLUMNS:
+            return []
+        return self._select(f"WHERE user = ? AND {field} = ?", (user, value))
+
+    def add_transactions(self, transactions: Iterable[dict]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                f"INSERT INTO transactions ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                (
+                    tuple(item[column] for column in self.COLUMNS)
+                    for item in transactions
+                ),
+            )
+
+    def update_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+            values: dict,
+    ) -> Optional[dict]:
+        values = {
+            key: value
+            for key, value in values.items()
+            if key in TRANSACTION_FIELDS_MAPPING
+        }
+        if values:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    f"UPDATE transactions SET "
+                    f"{', '.join(f'{key} = ?' for key in values)} "
+                    f"WHERE id = ? AND user = ?",
+                    (*values.values(), transaction_id, user),
+                )
+        return self.get_transaction(user, transaction_id)
+
+    def get_totals(self, user: str) -> dict[str, int]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT deposits, withdrawals, net FROM balances "
+                "WHERE user = ?",
+                (user,),
+            ).fetchone()
+        return dict(row) if row else empty_totals()
+
+    def get_all_totals(self) -> dict[str, dict[str, int]]:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT user, deposits, withdrawals, net FROM balances"
+            ).fetchall()
+        return {
+            row["user"]: dict(
+                deposits=row["deposits"],
+                withdrawals=row["withdrawals"],
+                net=row["net"],
+            )
+            for row in rows
+        }
+
+    def _replace_totals(self, totals: dict[str, dict[str, int]]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO balances "
+                "(user, deposits, withdrawals, net) VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        user,
+                        user_totals["deposits"],
+                        user_totals["withdrawals"],
+                        user_totals["net"],
+                    )
+                    for user, user_totals in totals.items()
+                ),
+            )
+
+    def get_rollups(self, user: str, period: str) -> dict[str, dict]:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT period, deposits, withdrawals FROM rollups "
+                "WHERE user = ? AND length(period) = ? ORDER BY period",
+                (user, Uc.REPORT_PERIODS[period]),
+            ).fetchall()
+        return {
+            row["period"]: dict(
+                deposits=row["deposits"],
+                withdrawals=row["withdrawals"],
+                net=row["deposits"] - row["withdrawals"],
+            )
+            for row in rows
+        }
+
+    def get_user(self, user: str) -> Optional[dict]:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT user, password FROM users WHERE user = ?", (user,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def add_user(self, user_data: dict) -> bool:
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO users (user, password) VALUES (?, ?)",
+                (user_data["user"], user_data["password"]),
+            )
+        return cursor.rowcount == 1
+
+    def iter_users(self) -> Iterator[dict]:
+        with closing(self._connect()) as connection:
+            for row in connection.execute("SELECT user, password FROM users"):
+                yield dict(row)
+
+    def compact(self) -> None:
+        # итоги поддерживаются триггерами, пересобрать нужно только файл.
+        with closing(self._connect()) as connection:
+            connection.execute("VACUUM")
+
+    def convert_amounts(self) -> int:
+        with closing(self._connect()) as connection:
+            column_type, = connection.execute(
+                "SELECT type FROM pragma_table_info('transactions') "
+                "WHERE name = 'amount'"
+            ).fetchone()
+            if column_type.upper() != "REAL":
+                return 0
+            converted, = connection.execute(
+                "SELECT COUNT(*) FROM transactions"
+            ).fetchone()
+            connection.executescript(
+                f"BEGIN; {self.CONVERT_AMOUNTS} COMMIT;"
+            )
+        return converted
+
+
+class ShardedStorage(StorageEngine):
+    """
+    Хранилище, в котором у каждого пользователя свой файл-журнал внутри
+    общей папки. Файлы раскладываются по подпапкам по первым символам
+    хэша логина, поэтому чтение и запись для одного пользователя не
+    зависят от количества остальных пользователей.
+    """
+
+    def _shard_path(self, user: str, suffix: str = Uc.JOURNAL_SUFFIX) -> Path:
+        digest = sha256(user.encode()).hexdigest()
+        return (
+            self.path
+            / digest[:Uc.SHARD_BUCKET_LENGTH]
+            / f"{digest}{suffix}"
+        )
+
+    def signature(self, user: str) -> Optional[tuple[str, int, int, int]]:
+        return file_signature(self._shard_path(user))
+
+    def _shard(self, user: str) -> StorageEngine:
+        return get_storage(self._shard_path(user), self.encoding)
+
+    def iter_transactions(self, user: Optional[str] = None) -> Iterator[dict]:
+        if user is not None:
+            return self._shard(user).iter_transactions(user)
+        return (
+            item
+            for shard in self._iter_shards()
+            for item in shard.iter_transactions()
+        )
+
+    def add_transactions(self, transactions: Iterable[dict]) -> None:
+        by_user = defaultdict(list)
+        for item in transactions:
+            by_user[item["user"]].append(item)
+        for user, items in by_user.items():
+            self._shard_path(user).parent.mkdir(parents=True, exist_ok=True)
+            # хранилище шарда берётся из общего реестра: его индекс
+            # уже прочитан и не перечитывается при каждой записи.
+            self._shard(user).add_transactions(items)
+
+    def update_transaction(
+            self,
+            user: str,
+            transaction_id: str,
+            values: dict,
+    ) -> Optional[dict]:
+        return self._shard(user).update_transaction(
+            user, transaction_id, values
+        )
+
+    def iter_part(self, part: int, parts: int) -> Iterator[dict]:
+        """
+        Прочитать часть хранилища: файлы пользователей делятся между
+        частями через один, поэтому части получаются примерно равными.
+        """
+        return (
+            item
+            for shard in list(self._iter_shards())[part::parts]
+            for item in shard.iter_transactions()
+        )
+
+    def _iter_shards(self) -> Iterator[JournalStorage]:
+        for shard_path in sorted(self.path.glob(f"*/*{Uc.JOURNAL_SUFFIX}")):
+            yield JournalStorage(shard_path, self.encoding)
+
+    def get_totals(self, user: str) -> dict[str, int]:
+        return self._shard(user).get_totals(user)
+
+    def get_all_totals(self) -> dict[str, dict[str, int]]:
+        totals = {}
+        for shard in self._iter_shards():
+            totals.update(shard.get_all_totals())
+        return totals
+
+    def _replace_totals(self, totals: dict[str, dict[str, int]]) -> None:
+        for user, user_totals in totals.items():
+            self._shard(user)._replace_totals({user: user_totals})
+
+    def get_rollups(self, user: str, period: str) -> dict[str, dict]:
+        return self._shard(user).get_rollups(user, period)
+
+    def compact(self) -> None:
+        for shard in self._iter_shards():
+            shard.compact()
+
+    def convert_amounts(self) -> int:
+        return sum(shard.convert_amounts() for shard in self._iter_shards())
+
+    def get_user(self, user: str) -> Optional[dict]:
+        try:
+            with open(
+                    self._shard_path(user, Uc.SHARD_USER_SUFFIX),
+                    "r",
+                    encoding=self.encoding,
+            ) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def add_user(self, user_data: dict) -> bool:
+        user_path = self._shard_path(user_data["user"], Uc.SHARD_USER_SUFFIX)
+        user_path.parent.mkdir(parents=True, exist_ok=True)
+        # режим "x" не даст перезаписать пользователя, зарегистрированного
+        # параллельно.
+        try:
+            file = open(user_path, "x", encoding=self.encoding)
+        except FileExistsError:
+            return False
+        with file:
+            json.dump(user_data, file)
+        return True
+
+    def iter_users(self) -> Iterator[dict]:
+        for user_path in sorted(
+                self.path.glob(f"*/*{Uc.SHARD_USER_SUFFIX}")
+        ):
+            with open(user_path, "r", encoding=self.encoding) as file:
+                yield json.load(file)
+
+
+_storages: OrderedDict[tuple[str, str], StorageEngine] = OrderedDict()
+
+
+def get_storage(
+        path: Union[str, Path],
+        encoding: str = "utf-8",
+) -> StorageEngine:
+    """
+    Подобрать хранилище по расширению файла: `.jsonl` — журнал,
+    `.ledger` — двоичный журнал, `.db`/`.sqlite`/`.sqlite3` — SQLite,
+    путь без расширения либо существующая папка — шардированное
+    хранилище, всё остальное — JSON-массив.
+
+    :param path: Путь к файлу хранилища.
+    :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+    :returns: StorageEngine — хранилище для указанного файла. Хранилища
+     переиспользуются между вызовами, чтобы не терять загруженные индексы.
+    """
+    key = (str(path), encoding)
+    storage = _storages.get(key)
+    if storage is not None:
+        _storages.move_to_end(key)
+        return storage
+    suffix = Path(path).suffix
+    if not suffix or Path(path).is_dir():
+        storage = ShardedStorage(path, encoding)
+    elif suffix == Uc.JOURNAL_SUFFIX:
+        storage = JournalStorage(path, encoding)
+    elif suffix == Uc.LEDGER_SUFFIX:
+        storage = LedgerStorage(path, encoding)
+    elif suffix in Uc.SQLITE_SUFFIXES:
+        storage = SqliteStorage(path, encoding)
+    else:
+        storage = JsonStorage(path, encoding)
+    _storages[key] = storage
+    while len(_storages) > Uc.STORAGE_CACHE_SIZE:
+        _storages.popitem(last=False)
+    return storage
+
+
+def split_into_shards(
+        source: Union[str, Path],
+        target: Union[str, Path],
+        encoding: str = "utf-8",
+) -> dict[str, int]:
+    """
+    Разложить транзакции из общего файла по файлам пользователей
+    в шардированном хранилище.
+
+    :param source: Путь к исходному файлу с транзакциями.
+    :param target: Путь к папке шардированного хранилища.
+    :param encoding: Кодировка файлов, по умолчанию равна `utf-8`.
+    :returns: Dict — количество перенесённых транзакций по пользователям.
+    """
+    by_user = defaultdict(list)
+    for item in get_storage(source, encoding).iter_transactions():
+        by_user[item["user"]].append(item)
+    shards = ShardedStorage(target, encoding)
+    for items in by_user.values():
+        shards.add_transactions(items)
+    return {user: len(items) for user, items in by_user.items()}
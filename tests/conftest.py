@@ -3,6 +3,24 @@ import pytest
 from main import Wallet
 
 
+def make_transaction(number, user="Test", category="deposit", **fields):
+    """
+    Собрать транзакцию для тестов. ID, дата, сумма в копейках и описание
+    выводятся из номера; любое поле можно переопределить.
+    """
+    return {
+        **dict(
+            id=f"id-{number}",
+            user=user,
+            date="2024-09-0{}".format(number % 9 + 1),
+            category=category,
+            amount=number,
+            description=f"test {number}",
+        ),
+        **fields,
+    }
+
+
 @pytest.fixture
 def wallet():
     return Wallet()
@@ -23,7 +41,7 @@ def wallet_deposit(wallet, temp_wallet_json):
     entry = dict(
         user="Test",
         category="deposit",
-        amount=12345.0,
+        amount=1234500,
         description="test",
     )
     created_entry = wallet._write_to_file(**entry, path=temp_wallet_json)
@@ -35,7 +53,7 @@ def wallet_withdraw(wallet, temp_wallet_json):
     entry = dict(
         user="Test",
         category="withdraw",
-        amount=12345.0,
+        amount=1234500,
         description="test",
     )
     created_entry = wallet._write_to_file(**entry, path=temp_wallet_json)
@@ -60,3 +78,8 @@ def registered_user(wallet, temp_users_json):
         path=temp_users_json
     )
     return user_data
+
+
+@pytest.fixture
+def temp_wallet_journal(tmp_path):
+    return tmp_path / "wallet.jsonl"
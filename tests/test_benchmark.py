@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+import benchmark
+from storage import get_storage
+
+
+@pytest.fixture
+def report():
+    return benchmark.run_benchmarks(transactions=200, users=5, repeat=3)
+
+
+class TestBenchmark:
+
+    def test_generated_ledger_is_reproducible(self, tmp_path):
+        histories = []
+        for name, seed in (("a", 1), ("b", 1), ("c", 2)):
+            (tmp_path / name).mkdir()
+            ledger = benchmark.generate_ledger(
+                tmp_path / name, 100, 10, ".jsonl", seed
+            )
+            assert len(ledger.users) == 10
+            assert get_storage(ledger.users_path).get_user("user000009")
+            histories.append(
+                list(get_storage(ledger.wallets_path).iter_transactions())
+            )
+        assert len(histories[0]) == 100
+        assert histories[0] == histories[1] != histories[2]
+
+    def test_report_covers_every_operation(self, report):
+        assert report["params"]["transactions"] == 200
+        assert list(report["results"]) == list(benchmark.OPERATIONS)
+        for result in report["results"].values():
+            assert result["calls"] == 3
+            assert 0 < result["p50_ms"] <= result["p99_ms"]
+            assert result["ops_per_second"] > 0
+
+    def test_cache_states_are_measured_separately(self, report):
+        for name in benchmark.CACHED_READS:
+            assert {f"{name}_cold", f"{name}_warm"} <= set(report["results"])
+        assert "search" not in report["results"]
+
+    def test_cold_operation_starts_with_empty_cache(self, tmp_path):
+        ledger = benchmark.generate_ledger(tmp_path, 50, 2)
+        wallet = benchmark.Wallet()
+        wallet.authenticated = True
+        wallet.user = ledger.users[0]
+        read = benchmark.OPERATIONS["get_history_warm"]
+        read(wallet, ledger, None)
+        cache = wallet._history_cache
+        benchmark.OPERATIONS["get_history_cold"](wallet, ledger, None)
+        assert wallet._history_cache is not cache
+
+    def test_compare_with_baseline(self, report):
+        assert benchmark.compare(report, report) == []
+        baseline = json.loads(json.dumps(report))
+        baseline["results"]["auth"]["p99_ms"] /= 2
+        del baseline["results"]["search_date_cold"]
+        assert benchmark.compare(report, baseline) == [
+            (
+                "auth",
+                "p99_ms",
+                baseline["results"]["auth"]["p99_ms"],
+                report["results"]["auth"]["p99_ms"],
+            )
+        ]
+
+    def test_main_fails_on_regression(self, tmp_path, capsys):
+        argv = [
+            "--transactions", "100", "--users", "5", "--repeat", "2",
+            "--operation", "get_balance", "--output", str(tmp_path / "r.json"),
+        ]
+        assert benchmark.main(argv) == 0
+        report = json.loads((tmp_path / "r.json").read_text())
+        assert list(report["results"]) == ["get_balance"]
+        report["results"]["get_balance"]["p50_ms"] = 0.0
+        (tmp_path / "base.json").write_text(json.dumps(report))
+        assert benchmark.main(
+            argv + ["--baseline", str(tmp_path / "base.json")]
+        ) == 1
+        assert "Замедление get_balance" in capsys.readouterr().err
@@ -0,0 +1,75 @@
+import json
+
+from cache import HistoryCache
+from storage import JsonStorage
+from tests.conftest import make_transaction
+
+
+class TestHistoryCache:
+
+    def test_lru_eviction_by_user_count(self):
+        cache = HistoryCache(maxsize=2)
+        signature = ("wallet.json", 1, 1, 1)
+        for user in ("a", "b"):
+            cache.put("wallet.json", user, signature, [])
+        assert list(cache.get("wallet.json", "a", signature)) == []
+        cache.put("wallet.json", "c", signature, [])
+        assert cache.get("wallet.json", "b", signature) is None
+        assert list(cache.get("wallet.json", "a", signature)) == []
+
+    def test_changed_signature_invalidates(self):
+        cache = HistoryCache()
+        signature = ("wallet.json", 1, 1, 1)
+        cache.put("wallet.json", "a", signature, [make_transaction(1)])
+        assert cache.get("wallet.json", "a", ("wallet.json", 2, 1, 1)) is None
+        assert cache.get("wallet.json", "a", ("wallet.json", 1, 1, 1)) is None
+
+    def test_shared_commit_extends_every_user(self):
+        cache = HistoryCache()
+        old, new = ("wallet.json", 1, 1, 1), ("wallet.json", 2, 2, 1)
+        for user in ("a", "b"):
+            cache.put("wallet.json", user, old, [])
+        cache.extend(
+            "wallet.json", "a", old, new, [make_transaction(1, user="a")]
+        )
+        cache.extend(
+            "wallet.json", "b", old, new, [make_transaction(2, user="b")]
+        )
+        assert list(cache.get("wallet.json", "a", new)) == [
+            make_transaction(1, user="a")
+        ]
+        assert list(cache.get("wallet.json", "b", new)) == [
+            make_transaction(2, user="b")
+        ]
+
+    def test_repeated_reads_do_not_parse_file(
+            self,
+            wallet,
+            wallet_deposit,
+            temp_wallet_json,
+            monkeypatch
+    ):
+        first = wallet._get_history("Test", path=temp_wallet_json)
+        monkeypatch.setattr(
+            JsonStorage,
+            "get_history",
+            lambda *args: (_ for _ in ()).throw(AssertionError),
+        )
+        assert wallet._get_history("Test", path=temp_wallet_json) == first
+        created = wallet._write_to_file(
+            "Test", 1, "withdraw", "test", path=temp_wallet_json
+        )
+        assert wallet._get_history(
+            "Test", path=temp_wallet_json
+        ) == first + list(created)
+
+    def test_external_change_invalidates(
+            self,
+            wallet,
+            wallet_deposit,
+            temp_wallet_json
+    ):
+        assert len(wallet._get_history("Test", path=temp_wallet_json)) == 1
+        with open(temp_wallet_json, "w") as file:
+            json.dump(list(wallet_deposit) * 3, file)
+        assert len(wallet._get_history("Test", path=temp_wallet_json)) == 3
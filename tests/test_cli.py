@@ -0,0 +1,150 @@
+import io
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cli
+from storage import get_storage
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    monkeypatch.delenv("WALLET_USER", raising=False)
+    monkeypatch.delenv("WALLET_PASSWORD", raising=False)
+    base = [
+        "--wallets", str(tmp_path / "wallet.jsonl"),
+        "--users", str(tmp_path / "users.json"),
+    ]
+
+    def run(*argv, stdin=""):
+        monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+        return cli.main(base + list(argv))
+
+    return run
+
+
+class TestCli:
+
+    def test_commands(self, run, capsys):
+        assert run("register", "--user", "Test", "--password", "pw") == 0
+        login = ("--user", "Test", "--password", "pw")
+        assert run(*login, "deposit", "--amount", "100", "--desc", "a") == 0
+        assert run(*login, "withdraw", "--amount", "30") == 0
+        capsys.readouterr()
+        assert run(*login, "balance") == 0
+        assert "70.0" in capsys.readouterr().out
+        assert run(*login, "history", "--mode", "withdraw") == 0
+        assert "Сумма: 30.0" in capsys.readouterr().out
+        assert run(*login, "search", "--mode", "amount", "--value", "100") == 0
+        assert "Сумма: 100.0" in capsys.readouterr().out
+        assert run(*login, "balance", "--date", "2000-01-01") == 0
+        assert "Ваш баланс на конец 2000-01-01: 0.0" in (
+            capsys.readouterr().out
+        )
+        assert run(*login, "balance", "--date", "вчера") == 1
+        assert run(*login, "report", "--period", "year") == 0
+        assert "доходы 100.0, расходы 30.0, баланс 70.0" in (
+            capsys.readouterr().out
+        )
+        assert run(*login, "report", "--from", "сегодня") == 1
+        assert run(*login, "top", "--category", "deposit", "--count", "1") == 0
+        assert "Сумма: 100.0" in capsys.readouterr().out
+        assert run(*login, "top", "--to", "завтра") == 1
+        assert run(*login, "import", "missing.csv") == 1
+        assert "Не удалось прочитать файл missing.csv" in (
+            capsys.readouterr().out
+        )
+
+    @pytest.mark.parametrize(
+        "option, value", [("--page", "0"), ("--page-size", "-1"),
+                          ("--page", "x")]
+    )
+    def test_history_page_must_be_positive(self, run, capsys, option, value):
+        run("register", "--user", "Test", "--password", "pw")
+        with pytest.raises(SystemExit):
+            run("--user", "Test", "--password", "pw", "history", option, value)
+        assert "больше нуля" in capsys.readouterr().err
+
+    def test_credentials_from_environment(self, run, monkeypatch, capsys):
+        run("register", "--user", "Test", "--password", "pw")
+        monkeypatch.setenv("WALLET_USER", "Test")
+        monkeypatch.setenv("WALLET_PASSWORD", "pw")
+        assert run("deposit", "--amount", "5") == 0
+        assert run("balance") == 0
+        assert "5.0" in capsys.readouterr().out
+
+    @pytest.mark.parametrize(
+        "login",
+        [(), ("--user", "Test"), ("--user", "Test", "--password", "bad")],
+    )
+    def test_restricted_commands_require_login(self, run, login):
+        run("register", "--user", "Test", "--password", "pw")
+        assert run(*login, "balance") == 1
+
+    def test_script_runs_in_one_process(self, run, capsys):
+        script = "\n".join(
+            [
+                "register --user Test --password pw",
+                "auth --user Test --password pw",
+                "# комментарий",
+                "",
+                "deposit --amount 100 --desc 'Зарплата за май'",
+                "deposit --amount много",
+                "unknown",
+                "withdraw --amount 40",
+                "balance",
+            ]
+        )
+        assert run("script", stdin=script) == 1
+        out = capsys.readouterr().out
+        assert "Строка 6: команда не выполнена" in out
+        assert "Строка 7: команда не выполнена" in out
+        assert "Ваш текущий баланс: 60.0" in out.splitlines()[-3]
+
+    def test_script_from_file(self, run, tmp_path, capsys):
+        script = tmp_path / "commands.txt"
+        script.write_text(
+            "register --user Test --password pw\n"
+            "deposit --amount 1\n"
+            "script other.txt\n",
+            encoding="utf-8",
+        )
+        login = ("--user", "Test", "--password", "pw")
+        assert run(*login, "script", str(script)) == 1
+        assert "Строка 3: вложенные скрипты" in capsys.readouterr().out
+
+    def test_edit(self, run, tmp_path, capsys):
+        login = ("--user", "Test", "--password", "pw")
+        run("register", *login)
+        run(*login, "deposit", "--amount", "10")
+        transaction, = get_storage(tmp_path / "wallet.jsonl").get_history(
+            "Test"
+        )
+        capsys.readouterr()
+        assert run(
+            *login, "edit", "--id", transaction["id"], "--amount", "25"
+        ) == 0
+        assert "Сумма: 25.0" in capsys.readouterr().out
+        assert run(*login, "edit", "--id", "missing", "--amount", "1") == 1
+
+    def test_interactive_modules_are_not_imported(self, tmp_path):
+        code = (
+            "import sys, cli; cli.main(sys.argv[1:]); "
+            "assert 'mask_input' not in sys.modules; "
+            "assert 'sqlite3' not in sys.modules"
+        )
+        process = subprocess.run(
+            [
+                sys.executable, "-c", code,
+                "--wallets", str(tmp_path / "wallet.jsonl"),
+                "--users", str(tmp_path / "users.json"),
+                "register", "--user", "Test", "--password", "pw",
+            ],
+            cwd=ROOT,
+            stdin=subprocess.DEVNULL,
+        )
+        assert process.returncode == 0
@@ -0,0 +1,129 @@
+import random
+
+from indexes import (
+    BalanceIndex,
+    SortedIndex,
+    TextIndex,
+    text_matches,
+    tokenize,
+)
+from tests.conftest import make_transaction
+
+
+class TestTextIndex:
+
+    def test_tokenize_is_case_and_ending_insensitive(self):
+        assert tokenize("Куплен НОВЫЙ ноутбук") == tokenize(
+            "куплен новый Ноутбук"
+        )
+        assert tokenize("ноутбуки") == tokenize("ноутбук")
+        assert tokenize("Ёлка") == tokenize("елка")
+
+    def test_search_by_word_and_prefix(self):
+        index = TextIndex(
+            [
+                make_transaction(1, description="Куплен новый ноутбук"),
+                make_transaction(2, description="Продукты"),
+                make_transaction(3, description="Чехол для ноутбука"),
+            ]
+        )
+        assert [item["id"] for item in index.search("ноутбук")] == [
+            "id-1", "id-3"
+        ]
+        assert [item["id"] for item in index.search("ноут")] == [
+            "id-1", "id-3"
+        ]
+        assert [item["id"] for item in index.search("новый ноутбук")] == [
+            "id-1"
+        ]
+        assert index.search("телефон") == []
+        assert index.search("") == []
+
+    def test_text_matches_follows_index_rules(self):
+        assert text_matches("ноут новый", "Куплен новый ноутбук")
+        assert text_matches("ноутбуки", "Чехол для ноутбука")
+        assert not text_matches("телефон", "Куплен новый ноутбук")
+        assert not text_matches("", "Продукты")
+        assert not text_matches("продукты", None)
+
+    def test_incremental_add_and_remove(self):
+        index = TextIndex()
+        old = make_transaction(1, description="Продукты")
+        index.add(old)
+        assert index.search("продукты") == [old]
+        new = dict(old, description="Такси")
+        index.remove(old)
+        index.add(new)
+        assert index.search("продукты") == []
+        assert index.search("такси") == [new]
+
+
+class TestSortedIndex:
+
+    def test_range_bounds(self):
+        index = SortedIndex(
+            "amount",
+            [make_transaction(number) for number in (5, 1, 3, 3)],
+        )
+        assert [item["amount"] for item in index.range()] == [1, 3, 5]
+        assert [item["amount"] for item in index.range(3, 5)] == [3, 5]
+        assert [
+            item["amount"] for item in index.range(1, 5, False, False)
+        ] == [3]
+        assert index.range(6) == []
+
+    def test_incremental_add_and_remove(self):
+        old = make_transaction(1)
+        index = SortedIndex("amount", [old])
+        new = dict(old, amount=1000)
+        index.remove(old)
+        index.add(new)
+        assert index.range(high=500) == []
+        assert index.range(500) == [new]
+
+
+class TestBalanceIndex:
+
+    def test_balance_at_and_series(self):
+        index = BalanceIndex(
+            [
+                dict(id="1", date="2024-09-03", category="deposit",
+                     amount=500),
+                dict(id="2", date="2024-09-01", category="deposit",
+                     amount=100),
+                dict(id="3", date="2024-09-03", category="withdraw",
+                     amount=50),
+                dict(id="4", date="сегодня", category="deposit", amount=7),
+            ]
+        )
+        assert index.balance_at("2024-08-31") == 0
+        assert index.balance_at("2024-09-02") == 100
+        assert index.balance_at("2030-01-01") == 550
+        assert index.series() == [("2024-09-01", 100), ("2024-09-03", 550)]
+        assert index.series("2024-09-02", "2024-09-30") == [
+            ("2024-09-02", 100), ("2024-09-03", 550)
+        ]
+        assert index.series("2024-09-04") == [("2024-09-04", 550)]
+
+    def test_incremental_updates_match_rebuild(self):
+        rng = random.Random(1)
+        transactions = {}
+        index = BalanceIndex()
+        for number in range(300):
+            if transactions and rng.random() < 0.3:
+                old = transactions.pop(rng.choice(list(transactions)))
+                index.remove(old)
+                continue
+            transaction = dict(
+                id=str(number),
+                date=f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+                category=rng.choice(("deposit", "withdraw")),
+                amount=rng.randint(1, 1000),
+            )
+            transactions[transaction["id"]] = transaction
+            index.add(transaction)
+        rebuilt = BalanceIndex(transactions.values())
+        assert index.series() == rebuilt.series()
+        assert index._dates == sorted(
+            {item["date"] for item in transactions.values()}
+        )
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import cli
+from decorators import instrumented
+from metrics import metrics
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+
+
+class TestMetrics:
+
+    def test_disabled_by_default(self, wallet, temp_wallet_json):
+        metrics.reset()
+        wallet._write_to_file("Test", 100, "deposit", "a",
+                              path=temp_wallet_json)
+        wallet._get_history("Test", temp_wallet_json)
+        assert metrics.to_dict() == {}
+
+    @pytest.mark.parametrize("suffix", [".json", ".jsonl", ".ledger"])
+    def test_calls_and_io_are_counted(
+            self, wallet, tmp_path, enabled_metrics, suffix
+    ):
+        path = tmp_path / f"wallet{suffix}"
+        for amount in (100, 200, 300):
+            wallet._write_to_file("Test", amount, "deposit", "a", path=path)
+        wallet._get_history("Test", path)
+        stats = enabled_metrics.to_dict()
+        assert stats["_write_to_file"]["calls"] == 3
+        assert stats["_write_to_file"]["bytes_written"] > 0
+        assert stats["_get_history"]["calls"] == 1
+        assert stats["_get_history"]["bytes_read"] > 0
+        assert stats["_get_history"]["records_scanned"] == 3
+        assert sum(stats["_get_history"]["latency"].values()) == 1
+
+    def test_nested_calls_are_inclusive(self, enabled_metrics):
+        @instrumented("inner")
+        def inner():
+            metrics.add("records_scanned", 2)
+
+        @instrumented()
+        def outer():
+            inner()
+            inner()
+
+        outer()
+        stats = enabled_metrics.to_dict()
+        assert outer.__name__ == "outer"
+        assert stats["inner"]["calls"] == 2
+        assert stats["inner"]["records_scanned"] == 4
+        assert stats["outer"]["records_scanned"] == 4
+
+    def test_prometheus_format(self, wallet, temp_wallet_json,
+                               enabled_metrics):
+        wallet._write_to_file("Test", 100, "deposit", "a",
+                              path=temp_wallet_json)
+        text = enabled_metrics.to_prometheus()
+        assert "# TYPE wallet_call_duration_seconds histogram" in text
+        assert (
+            'wallet_call_duration_seconds_bucket'
+            '{method="_write_to_file",le="+Inf"} 1'
+        ) in text
+        assert (
+            'wallet_call_duration_seconds_count{method="_write_to_file"} 1'
+        ) in text
+        assert 'wallet_bytes_written_total{method="_write_to_file"}' in text
+
+    @pytest.mark.parametrize("name", ["metrics.json", "metrics.prom"])
+    def test_cli_writes_metrics(self, tmp_path, monkeypatch, name):
+        monkeypatch.delenv("WALLET_USER", raising=False)
+        monkeypatch.delenv("WALLET_PASSWORD", raising=False)
+        metrics.reset()
+        output = tmp_path / name
+        assert cli.main([
+            "--wallets", str(tmp_path / "wallet.jsonl"),
+            "--users", str(tmp_path / "users.json"),
+            "--metrics", str(output),
+            "register", "--user", "Test", "--password", "pw",
+        ]) == 0
+        assert not metrics.enabled
+        text = output.read_text(encoding="utf-8")
+        if output.suffix == ".prom":
+            assert 'method="register"' in text
+        else:
+            assert json.loads(text)["register"]["calls"] == 1
+        metrics.reset()
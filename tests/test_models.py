@@ -0,0 +1,119 @@
+import json
+import uuid
+
+import pytest
+
+from models import Transaction, TransactionColumns, from_cents, to_cents
+from tests.conftest import make_transaction
+
+
+def make_uuid_transaction(number, **fields):
+    # столбцы хранят ID в виде UUID компактно, остальные — отдельно.
+    return make_transaction(
+        number, **{"id": str(uuid.UUID(int=number)), **fields}
+    )
+
+
+@pytest.fixture
+def items():
+    return [
+        make_uuid_transaction(3),
+        make_uuid_transaction(1, category="withdraw"),
+        make_uuid_transaction(2, id="id-2", date="вчера", description=None),
+        make_uuid_transaction(5, category="withdraw"),
+    ]
+
+
+class TestTransaction:
+
+    def test_reads_like_dict(self):
+        transaction = Transaction(**make_uuid_transaction(1))
+        assert transaction == make_uuid_transaction(1)
+        assert make_uuid_transaction(1) == transaction
+        assert transaction["amount"] == transaction.amount == 1
+        assert transaction.get("missing") is None
+        assert list(transaction) == list(make_uuid_transaction(1))
+        assert json.dumps(transaction.to_dict()) == json.dumps(
+            make_uuid_transaction(1)
+        )
+        assert not hasattr(transaction, "__dict__")
+
+
+class TestCents:
+
+    @pytest.mark.parametrize(
+        "amount, cents",
+        [
+            ("100", 10000),
+            ("10 000,5", 1000050),
+            ("0.295", 30),
+            (0.1 + 0.2, 30),
+            (40.5, 4050),
+            (7, 700),
+            ("-1.01", -101),
+        ],
+    )
+    def test_to_cents(self, amount, cents):
+        assert to_cents(amount) == cents
+
+    @pytest.mark.parametrize("amount", ["много", "", "nan", "inf", None])
+    def test_invalid_amount(self, amount):
+        with pytest.raises(ValueError):
+            to_cents(amount)
+
+    def test_sums_are_exact(self):
+        cents = sum(to_cents("0.1") for _ in range(10))
+        assert cents == 100 and from_cents(cents) == 1.0
+
+
+class TestTransactionColumns:
+
+    def test_round_trip(self, items):
+        columns = TransactionColumns("Test", items)
+        assert len(columns) == 4
+        assert list(columns) == items
+        assert columns[-1] == items[-1]
+
+    def test_totals_and_filter(self, items):
+        columns = TransactionColumns("Test", items)
+        assert columns.total("deposit") == 5
+        assert columns.total("withdraw") == 6
+        assert columns.total("unknown") == 0
+        assert list(columns.filter("withdraw")) == [items[1], items[3]]
+
+    def test_range(self, items):
+        columns = TransactionColumns("Test", items)
+        assert columns.range("amount", 2, None) == [
+            items[2], items[0], items[3]
+        ]
+        assert columns.range("amount", 1, 3, False, False) == [items[2]]
+        # дату не в формате ISO нельзя сравнить по номеру дня.
+        assert columns.range("date", "2024-09-01") is None
+        del items[2]
+        columns = TransactionColumns("Test", items)
+        assert columns.range("date", "2024-09-03", "2024-09-06") == [
+            items[0], items[2]
+        ]
+
+    def test_top(self, items):
+        columns = TransactionColumns("Test", items)
+        assert columns.top("deposit", 1) == [items[0]]
+        assert columns.top("deposit", 5) == [items[0], items[2]]
+        assert columns.top("withdraw", 5) == [items[3], items[1]]
+        assert columns.top("unknown", 5) == []
+        assert columns.top("deposit", 5, "2024-09-01") is None
+        del items[2]
+        columns = TransactionColumns("Test", items)
+        assert columns.top("withdraw", 5, high="2024-09-05") == [items[1]]
+
+    def test_index_replace_and_copy(self, items):
+        columns = TransactionColumns("Test", items)
+        assert columns.index(items[3]["id"]) == 3
+        assert columns.index("id-2") == 2
+        assert columns.index("missing") is None
+        copy = columns.copy()
+        columns[2] = dict(items[2], id="id-2", amount=7, date="2024-01-01")
+        columns.append(make_uuid_transaction(9))
+        assert columns[2]["amount"] == 7
+        assert columns[2]["date"] == "2024-01-01"
+        assert list(copy) == items
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import manage
+from benchmark import generate_ledger
+from reports import aggregate, batch_report
+from storage import get_storage
+
+
+class TestBatchReport:
+
+    @pytest.mark.parametrize(
+        "suffix", [".json", ".jsonl", ".ledger", ".db", ""]
+    )
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_matches_stored_totals_and_rollups(
+            self, tmp_path, suffix, workers
+    ):
+        ledger = generate_ledger(tmp_path, 300, 7, suffix)
+        report = batch_report(ledger.wallets_path, "month", workers)
+        storage = get_storage(ledger.wallets_path)
+        assert list(report) == sorted(storage.get_all_totals())
+        assert sum(item["count"] for item in report.values()) == 300
+        for user, user_report in report.items():
+            assert storage.get_totals(user) == {
+                key: user_report[key]
+                for key in ("deposits", "withdrawals", "net")
+            }
+            assert user_report["periods"] == storage.get_rollups(
+                user, "month"
+            )
+
+    @pytest.mark.parametrize(
+        "suffix", [".json", ".jsonl", ".ledger", ".db", ""]
+    )
+    @pytest.mark.parametrize("parts", [1, 3, 16])
+    def test_parts_cover_store_once(self, tmp_path, suffix, parts):
+        ledger = generate_ledger(tmp_path, 120, 5, suffix)
+        storage = get_storage(ledger.wallets_path)
+        item = next(storage.iter_transactions())
+        storage.update_transaction(item["user"], item["id"], {"amount": 1})
+        items = [
+            item
+            for part in range(parts)
+            for item in storage.iter_part(part, parts)
+        ]
+        assert sorted(items, key=lambda item: item["id"]) == sorted(
+            storage.iter_transactions(), key=lambda item: item["id"]
+        )
+
+    def test_unformatted_json_is_read_by_first_part(self, tmp_path):
+        path = tmp_path / "wallet.json"
+        path.write_text(json.dumps([
+            dict(user="a", id=str(number), date="2024-01-01",
+                 category="deposit", amount=100, description="")
+            for number in range(3)
+        ]), encoding="utf-8")
+        storage = get_storage(path)
+        assert len(list(storage.iter_part(0, 2))) == 3
+        assert list(storage.iter_part(1, 2)) == []
+
+    def test_aggregate(self):
+        report = aggregate(
+            [
+                ("a", "2024-01-31", "deposit", 500),
+                ("b", "2024-02-01", "withdraw", 100),
+                ("a", "2024-02-01", "withdraw", 200),
+                ("a", "неизвестно", "deposit", 1),
+            ],
+            "year",
+        )
+        assert report["a"] == dict(
+            count=3,
+            deposits=501,
+            withdrawals=200,
+            net=301,
+            periods={"2024": dict(deposits=500, withdrawals=200, net=300)},
+        )
+        assert report["b"]["net"] == -100
+
+    def test_unknown_period(self, tmp_path):
+        with pytest.raises(ValueError):
+            batch_report(tmp_path / "wallet.json", "week")
+
+    def test_manage_command(self, tmp_path, capsys):
+        ledger = generate_ledger(tmp_path, 50, 3, ".jsonl")
+        output = tmp_path / "report.json"
+        assert manage.main([
+            "report-all",
+            "--path", str(ledger.wallets_path),
+            "--period", "year",
+            "--workers", "2",
+            "--output", str(output),
+        ]) == 0
+        assert "Итоги пользователей: 3" in capsys.readouterr().out
+        report = json.loads(output.read_text(encoding="utf-8"))
+        totals = get_storage(ledger.wallets_path).get_totals("user000000")
+        assert report["user000000"]["net"] == totals["net"] / 100
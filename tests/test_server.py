@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+import pytest
+
+from server import WalletServer
+
+
+class Client:
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.token = None
+
+    async def request(self, command, **params):
+        self.writer.write(
+            json.dumps(
+                dict(command=command, token=self.token, params=params)
+            ).encode() + b"\n"
+        )
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def login(self, user, password="secret"):
+        await self.request("register", user=user, password=password)
+        response = await self.request("auth", user=user, password=password)
+        self.token = response["result"]["token"]
+        return response
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def run_with_server(tmp_path, scenario):
+    async def main():
+        server = WalletServer(
+            tmp_path / "wallet.jsonl", tmp_path / "users.json"
+        )
+        host, port = await server.start("127.0.0.1", 0)
+
+        async def connect():
+            return Client(*await asyncio.open_connection(host, port))
+
+        try:
+            return await scenario(connect)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+class TestWalletServer:
+
+    def test_session_flow(self, tmp_path):
+        async def scenario(connect):
+            client = await connect()
+            assert (await client.request("balance"))["ok"] is False
+            assert (await client.login("Test"))["ok"] is True
+            deposit = await client.request(
+                "deposit", amount="100", description="Зарплата"
+            )
+            assert deposit["ok"] and deposit["result"]["amount"] == 100.0
+            await client.request(
+                "withdraw", amount=30, description="Продукты"
+            )
+            balance = await client.request("balance")
+            assert balance["result"] == dict(
+                deposits=100.0, withdrawals=30.0, net=70.0
+            )
+            history = await client.request("history", mode="withdraw")
+            assert [item["description"] for item in history["result"]] == [
+                "Продукты"
+            ]
+            found = await client.request(
+                "search", mode="amount", value="50..200"
+            )
+            assert [item["amount"] for item in found["result"]] == [100.0]
+            edited = await client.request(
+                "edit",
+                transaction_id=deposit["result"]["id"],
+                values=dict(amount="120"),
+            )
+            assert edited["result"]["amount"] == 120.0
+            assert (await client.request("balance"))["result"]["net"] == 90.0
+            past = await client.request("balance", date="2000-01-01")
+            assert past["result"] == dict(date="2000-01-01", net=0.0)
+            report = await client.request("report", period="year")
+            assert [
+                (row["deposits"], row["withdrawals"], row["net"])
+                for row in report["result"]
+            ] == [(120.0, 30.0, 90.0)]
+            top = await client.request("top", category="deposit", count=5)
+            assert [item["amount"] for item in top["result"]] == [120.0]
+            await client.request("logout")
+            assert (await client.request("balance"))["error"] == (
+                "Вы не вошли в систему"
+            )
+            await client.close()
+
+        run_with_server(tmp_path, scenario)
+
+    @pytest.mark.parametrize(
+        "command, params",
+        [
+            ("deposit", dict(amount="много")),
+            ("edit", dict(transaction_id="missing", values={})),
+            ("history", dict(mode="unknown")),
+            ("search", dict(mode="password", value="1")),
+            ("report", dict(period="week")),
+            ("top", dict(category="unknown")),
+            ("deposit", dict(unexpected=1)),
+            ("unknown", {}),
+        ],
+    )
+    def test_errors_are_reported(self, tmp_path, command, params):
+        async def scenario(connect):
+            client = await connect()
+            await client.login("Test")
+            response = await client.request(command, **params)
+            assert response["ok"] is False and response["error"]
+            await client.close()
+
+        run_with_server(tmp_path, scenario)
+
+    def test_invalid_json_keeps_connection(self, tmp_path):
+        async def scenario(connect):
+            client = await connect()
+            client.writer.write(b"not json\n")
+            response = json.loads(await client.reader.readline())
+            assert response == dict(ok=False, error="Некорректный запрос")
+            assert (await client.login("Test"))["ok"] is True
+            await client.close()
+
+        run_with_server(tmp_path, scenario)
+
+    def test_concurrent_clients(self, tmp_path):
+        async def scenario(connect):
+            clients = [await connect() for _ in range(50)]
+            await asyncio.gather(
+                *(
+                    client.login(f"user-{number}")
+                    for number, client in enumerate(clients)
+                )
+            )
+
+            async def deposit(client):
+                for _ in range(4):
+                    await client.request(
+                        "deposit", amount=1, description="test"
+                    )
+
+            await asyncio.gather(*(deposit(client) for client in clients))
+            balances = await asyncio.gather(
+                *(client.request("balance") for client in clients)
+            )
+            assert {item["result"]["net"] for item in balances} == {4.0}
+            for client in clients:
+                await client.close()
+
+        run_with_server(tmp_path, scenario)
@@ -0,0 +1,533 @@
+import json
+import sqlite3
+import uuid
+from contextlib import closing
+
+import pytest
+
+from constants import UtilityConstants as Uc
+from storage import (
+    JournalStorage,
+    JsonStorage,
+    LedgerStorage,
+    SqliteStorage,
+    get_storage,
+    iter_json_array,
+    split_into_shards,
+)
+from tests.conftest import make_transaction
+
+
+@pytest.fixture(
+    params=[
+        "wallet.json",
+        "wallet.jsonl",
+        "wallet.ledger",
+        "wallet.sqlite3",
+        "wallets",
+    ]
+)
+def storage(request, tmp_path):
+    return get_storage(tmp_path / request.param)
+
+
+class LegacyLedger(LedgerStorage):
+    MAGIC = LedgerStorage.LEGACY_MAGIC
+    RECORD = LedgerStorage.LEGACY_RECORD
+
+
+def write_legacy(path, items):
+    """
+    Записать транзакции так, как их сохраняли до перехода на копейки:
+    сумма в рублях в виде float.
+    """
+    if path.suffix == ".ledger":
+        LegacyLedger(path).add_transactions(items)
+    elif path.suffix == ".sqlite3":
+        with closing(sqlite3.connect(path)) as connection, connection:
+            connection.execute(
+                "CREATE TABLE transactions (id TEXT PRIMARY KEY, "
+                "user TEXT NOT NULL, date TEXT NOT NULL, "
+                "category TEXT NOT NULL, amount REAL NOT NULL, "
+                "description TEXT)"
+            )
+            connection.executemany(
+                "INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)",
+                [tuple(item.values()) for item in items],
+            )
+    elif path.suffix == ".json":
+        path.write_text(json.dumps(items), encoding="utf-8")
+    else:
+        if not path.suffix:
+            path = get_storage(path)._shard_path("Test")
+            path.parent.mkdir(parents=True)
+        path.write_text(
+            "".join(json.dumps(item) + "\n" for item in items),
+            encoding="utf-8",
+        )
+
+
+class TestStorage:
+
+    def test_engine_is_chosen_by_suffix(self, tmp_path):
+        assert type(get_storage(tmp_path / "a.json")) is JsonStorage
+        assert type(get_storage(tmp_path / "a.jsonl")) is JournalStorage
+        assert type(get_storage(tmp_path / "a.db")) is SqliteStorage
+        assert type(get_storage(tmp_path / "a.ledger")) is LedgerStorage
+
+    def test_empty_storage(self, storage):
+        assert storage.get_history("Test") == []
+        assert storage.get_transaction("Test", "id-1") is None
+        assert storage.get_user("Test") is None
+
+    def test_history_keeps_order_and_filters_user(self, storage):
+        storage.add_transactions(
+            [make_transaction(1), make_transaction(2, user="Other")]
+        )
+        storage.add_transactions([make_transaction(3)])
+        assert storage.get_history("Test") == [
+            make_transaction(1), make_transaction(3)
+        ]
+
+    def test_get_and_update_transaction(self, storage):
+        storage.add_transactions([make_transaction(1), make_transaction(2)])
+        assert storage.get_transaction("Other", "id-1") is None
+        updated = storage.update_transaction(
+            "Test", "id-1", {"amount": 10, "description": "new"}
+        )
+        assert updated == storage.get_transaction("Test", "id-1")
+        assert updated["amount"] == 10
+        assert updated["description"] == "new"
+        assert storage.get_transaction("Test", "id-2") == make_transaction(2)
+
+    def test_find_transactions(self, storage):
+        storage.add_transactions(
+            [
+                make_transaction(1),
+                make_transaction(2, category="withdraw"),
+                make_transaction(3, user="Other"),
+            ]
+        )
+        assert storage.find_transactions("Test", "category", "withdraw") == [
+            make_transaction(2, category="withdraw")
+        ]
+        assert storage.find_transactions("Test", "amount", 1) == [
+            make_transaction(1)
+        ]
+
+    def test_users(self, storage):
+        storage.add_user({"user": "Test", "password": "hash"})
+        assert storage.get_user("Test") == {"user": "Test", "password": "hash"}
+        assert storage.get_user("Other") is None
+
+    def test_users_are_listed(self, storage):
+        storage.add_user({"user": "Test", "password": "hash"})
+        storage.add_user({"user": "Other", "password": "hash"})
+        assert sorted(item["user"] for item in storage.iter_users()) == [
+            "Other", "Test"
+        ]
+
+    def test_json_append_matches_full_rewrite(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.json")
+        storage.add_transactions([make_transaction(1)])
+        storage.add_transactions([make_transaction(2), make_transaction(3)])
+        assert storage.path.read_text() == json.dumps(
+            [make_transaction(number) for number in (1, 2, 3)], indent=4
+        )
+
+    def test_json_user_index_follows_external_changes(self, tmp_path):
+        storage = get_storage(tmp_path / "users.json")
+        storage.add_user({"user": "Test", "password": "hash"})
+        assert storage.get_user("Test") == {"user": "Test", "password": "hash"}
+        storage.path.write_text(
+            json.dumps([{"user": "Other", "password": "hash"}])
+        )
+        assert storage.get_user("Test") is None
+        assert storage.get_user("Other") is not None
+
+    def test_sharded_storage_touches_only_user_shard(self, tmp_path):
+        storage = get_storage(tmp_path / "wallets")
+        storage.add_transactions(
+            [make_transaction(1), make_transaction(2, user="Other")]
+        )
+        shards = sorted(tmp_path.glob("wallets/*/*.jsonl"))
+        assert len(shards) == 2
+        assert storage.get_history("Test") == [make_transaction(1)]
+        assert len(list(storage.iter_transactions())) == 2
+
+    def test_sharded_writes_reuse_shard_index(self, tmp_path, monkeypatch):
+        storage = get_storage(tmp_path / "wallets")
+        storage.add_transactions([make_transaction(1)])
+        shard = storage._shard("Test")
+        monkeypatch.setattr(
+            shard, "_reset_index", lambda *args: pytest.fail("index reread")
+        )
+        storage.add_transactions([make_transaction(2)])
+        assert storage._shard("Test") is shard
+        assert set(shard._offsets) == {"id-1", "id-2"}
+
+    def test_split_into_shards(self, tmp_path):
+        source = get_storage(tmp_path / "wallets.json")
+        source.add_transactions(
+            [
+                make_transaction(1),
+                make_transaction(2, user="Other"),
+                make_transaction(3),
+            ]
+        )
+        assert split_into_shards(
+            source.path, tmp_path / "wallets"
+        ) == {"Test": 2, "Other": 1}
+        shards = get_storage(tmp_path / "wallets")
+        assert shards.get_history("Test") == source.get_history("Test")
+        assert shards.get_history("Other") == source.get_history("Other")
+
+    def test_totals_follow_appends_and_edits(self, storage):
+        storage.add_transactions(
+            [
+                make_transaction(10),
+                make_transaction(3, category="withdraw"),
+                make_transaction(7, user="Other"),
+            ]
+        )
+        assert storage.get_totals("Test") == dict(
+            deposits=10, withdrawals=3, net=7
+        )
+        storage.update_transaction(
+            "Test", "id-10", {"category": "withdraw", "amount": 4}
+        )
+        assert storage.get_totals("Test") == dict(
+            deposits=0, withdrawals=7, net=-7
+        )
+        assert storage.get_totals("Unknown") == dict(
+            deposits=0, withdrawals=0, net=0
+        )
+        assert storage.verify_totals() == {}
+
+    def test_verify_totals_reports_and_fixes_drift(self, storage):
+        storage.add_transactions([make_transaction(10)])
+        storage._replace_totals(
+            {"Test": dict(deposits=1, withdrawals=0, net=1)}
+        )
+        drift = storage.verify_totals(fix=True)
+        assert drift == {
+            "Test": (
+                dict(deposits=1, withdrawals=0, net=1),
+                dict(deposits=10, withdrawals=0, net=10),
+            )
+        }
+        assert storage.get_totals("Test")["net"] == 10
+        assert storage.verify_totals() == {}
+
+    def test_rollups_follow_appends_and_edits(self, storage):
+        storage.add_transactions(
+            [
+                make_transaction(10),
+                make_transaction(3, category="withdraw"),
+                make_transaction(7, user="Other"),
+            ]
+        )
+        storage.add_transactions(
+            [dict(make_transaction(5), id="id-5b", date="2023-12-31")]
+        )
+        assert storage.get_rollups("Test", "year") == {
+            "2023": dict(deposits=5, withdrawals=0, net=5),
+            "2024": dict(deposits=10, withdrawals=3, net=7),
+        }
+        storage.update_transaction(
+            "Test",
+            "id-10",
+            {"date": "2023-12-01", "category": "withdraw", "amount": 4},
+        )
+        assert storage.get_rollups("Test", "month") == {
+            "2023-12": dict(deposits=5, withdrawals=4, net=1),
+            "2024-09": dict(deposits=0, withdrawals=3, net=-3),
+        }
+        assert list(storage.get_rollups("Test", "day")) == [
+            "2023-12-01", "2023-12-31", "2024-09-04"
+        ]
+        assert storage.get_rollups("Other", "day") == {
+            "2024-09-08": dict(deposits=7, withdrawals=0, net=7)
+        }
+        assert storage.get_rollups("Unknown", "year") == {}
+
+    def test_rollups_are_built_for_existing_files(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.json")
+        storage._dump([make_transaction(5), make_transaction(2)])
+        assert storage.get_rollups("Test", "month") == {
+            "2024-09": dict(deposits=7, withdrawals=0, net=7)
+        }
+        storage.add_transactions([make_transaction(1)])
+        assert storage.get_rollups("Test", "year")["2024"]["net"] == 8
+
+    def test_totals_are_built_for_existing_files(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.json")
+        storage._dump([make_transaction(5), make_transaction(2)])
+        assert storage.get_totals("Test")["net"] == 7
+
+    @pytest.mark.parametrize("name", ["wallet.json", "wallet.jsonl"])
+    def test_totals_are_stored_per_user(self, tmp_path, name):
+        storage = get_storage(tmp_path / name)
+        legacy = storage.path.with_suffix(".totals.json")
+        storage._dump([make_transaction(5), make_transaction(2)])
+        legacy.write_text(json.dumps({"Test": dict(net=1)}))
+        storage.add_transactions(
+            [make_transaction(1), make_transaction(3, user="Other")]
+        )
+        assert not legacy.exists()
+        assert len(list(storage._totals_path.glob("*.json"))) == 2
+        other = storage._totals_path / storage._sidecar_name("Other")
+        before = other.stat().st_mtime_ns
+        storage.add_transactions([make_transaction(4)])
+        assert other.stat().st_mtime_ns == before
+        assert storage.get_all_totals() == {
+            "Test": dict(deposits=12, withdrawals=0, net=12),
+            "Other": dict(deposits=3, withdrawals=0, net=3),
+        }
+
+    def test_journal_edit_rewrites_single_line(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.jsonl")
+        storage.add_transactions([make_transaction(1), make_transaction(2)])
+        storage.update_transaction("Test", "id-1", {"amount": 2})
+        assert len(storage.path.read_text().splitlines()) == 2
+        storage.update_transaction(
+            "Test", "id-1", {"description": "much longer description"}
+        )
+        lines = storage.path.read_text().splitlines()
+        assert len(lines) == 3 and not lines[0].strip()
+        assert storage.get_transaction("Test", "id-1") == dict(
+            make_transaction(1),
+            amount=2,
+            description="much longer description",
+        )
+        assert [item["id"] for item in storage.get_history("Test")] == [
+            "id-2", "id-1"
+        ]
+
+    def test_json_edits_are_logged_until_compaction(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.json")
+        storage.add_transactions(
+            [make_transaction(number) for number in range(1, 30)]
+        )
+        snapshot = storage.path.read_text()
+        signature = storage.signature("Test")
+        storage.update_transaction("Test", "id-1", {"amount": 100})
+        storage.update_transaction("Test", "id-1", {"description": "new"})
+        assert storage.path.read_text() == snapshot
+        assert storage.signature("Test") != signature
+        edited = dict(make_transaction(1), amount=100, description="new")
+        assert storage.get_history("Test")[0] == edited
+        assert JsonStorage(storage.path).get_transaction("Test", "id-1") == (
+            edited
+        )
+        storage.compact()
+        assert not storage.path.with_suffix(Uc.EDITS_SUFFIX).exists()
+        assert json.loads(storage.path.read_text())[0] == edited
+        assert storage.get_history("Test")[0] == edited
+        assert storage.verify_totals() == {}
+
+    def test_edit_log_is_compacted_when_it_grows(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Uc, "EDITS_COMPACT_RATIO", 0)
+        storage = get_storage(tmp_path / "wallet.json")
+        storage.add_transactions([make_transaction(1)])
+        storage.update_transaction("Test", "id-1", {"amount": 5})
+        assert not storage.path.with_suffix(Uc.EDITS_SUFFIX).exists()
+        assert json.loads(storage.path.read_text())[0]["amount"] == 5
+
+    def test_compact_keeps_history_and_totals(self, storage):
+        storage.add_transactions(
+            [make_transaction(1), make_transaction(2, category="withdraw")]
+        )
+        storage.update_transaction(
+            "Test", "id-1", {"description": "much longer description"}
+        )
+        history = storage.get_history("Test")
+        totals = storage.get_totals("Test")
+        storage.compact()
+        assert storage.get_history("Test") == history
+        assert storage.get_totals("Test") == totals
+        storage.add_transactions([make_transaction(3)])
+        assert storage.get_transaction("Test", "id-3") == make_transaction(3)
+
+    def test_journal_compaction_drops_stale_lines(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.jsonl")
+        storage.add_transactions([make_transaction(1), make_transaction(2)])
+        storage.update_transaction(
+            "Test", "id-1", {"description": "much longer description"}
+        )
+        storage.compact()
+        assert len(storage.path.read_text().splitlines()) == 2
+        storage.update_transaction("Test", "id-2", {"amount": 3})
+        assert storage.get_transaction("Test", "id-2")["amount"] == 3
+
+    def test_journal_index_survives_restart_and_external_appends(
+            self,
+            tmp_path
+    ):
+        path = tmp_path / "wallet.jsonl"
+        get_storage(path).add_transactions([make_transaction(1)])
+        with open(path, "a") as file:
+            file.write(json.dumps(make_transaction(2)) + "\n")
+        fresh = JournalStorage(path)
+        assert fresh.get_transaction("Test", "id-2") == make_transaction(2)
+        assert fresh.get_transaction("Test", "id-1") == make_transaction(1)
+        path.with_suffix(".idx").unlink()
+        assert JournalStorage(path).get_transaction(
+            "Test", "id-1"
+        ) == make_transaction(1)
+
+    def test_json_index_finds_transactions_without_scanning(
+            self,
+            tmp_path,
+            monkeypatch,
+    ):
+        path = tmp_path / "wallet.json"
+        storage = get_storage(path)
+        storage.add_transactions(
+            [make_transaction(number) for number in range(1, 4)]
+        )
+        storage.update_transaction("Test", "id-2", {"amount": 7})
+        storage.add_transactions([make_transaction(4)])
+        assert path.with_name("wallet.json.idx").exists()
+        monkeypatch.setattr(
+            JsonStorage,
+            "iter_transactions",
+            lambda *args: pytest.fail("full scan"),
+        )
+        fresh = JsonStorage(path)
+        assert fresh.get_transaction("Test", "id-2")["amount"] == 7
+        assert fresh.get_transaction("Test", "id-4") == make_transaction(4)
+        assert fresh.get_transaction("Other", "id-4") is None
+        assert fresh.get_transaction("Test", "id-5") is None
+
+    def test_json_index_survives_external_rewrite(self, tmp_path):
+        path = tmp_path / "wallet.json"
+        storage = get_storage(path)
+        storage.add_transactions([make_transaction(1), make_transaction(2)])
+        assert storage.get_transaction("Test", "id-2") == make_transaction(2)
+        path.write_text(
+            json.dumps([make_transaction(2), make_transaction(1)], indent=4)
+        )
+        assert storage.get_transaction("Test", "id-2") == make_transaction(2)
+        assert storage.get_transaction("Test", "id-1") == make_transaction(1)
+        path.write_text(json.dumps([make_transaction(1)]))
+        assert storage.get_transaction("Test", "id-1") == make_transaction(1)
+        assert storage.get_transaction("Test", "id-2") is None
+
+    def test_ledger_round_trips_and_is_compact(self, tmp_path):
+        items = [
+            dict(make_transaction(number), id=str(uuid.uuid4()))
+            for number in range(100)
+        ]
+        items.append(dict(make_transaction(100), description=None, date=""))
+        items.append(make_transaction(101, user="Пользователь"))
+        ledger = get_storage(tmp_path / "wallet.ledger")
+        ledger.add_transactions(items)
+        journal = get_storage(tmp_path / "wallet.jsonl")
+        journal.add_transactions(items)
+        assert list(LedgerStorage(ledger.path).iter_transactions()) == items
+        size = ledger.path.stat().st_size + ledger._heap_path.stat().st_size
+        assert size * 2 < journal.path.stat().st_size
+        assert ledger._heap_path.read_bytes().count(b"Test") == 1
+
+    def test_ledger_refuses_impossible_dates(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.ledger")
+        storage.add_transactions([make_transaction(1)])
+        with pytest.raises(ValueError, match="2024-02-31"):
+            storage.add_transactions(
+                [make_transaction(2), make_transaction(3, date="2024-02-31")]
+            )
+        with pytest.raises(ValueError, match="2024-02-31"):
+            storage.update_transaction("Test", "id-1", {"date": "2024-02-31"})
+        assert storage.get_history("Test") == [make_transaction(1)]
+        assert storage.get_totals("Test")["net"] == 1
+
+    def test_ledger_skips_torn_record(self, tmp_path):
+        storage = get_storage(tmp_path / "wallet.ledger")
+        storage.add_transactions([make_transaction(1)])
+        with open(storage.path, "ab") as file:
+            file.write(b"\x00" * 5)
+        assert storage.get_history("Test") == [make_transaction(1)]
+        fresh = LedgerStorage(storage.path)
+        fresh.add_transactions([make_transaction(2)])
+        assert storage.get_history("Test") == [
+            make_transaction(1), make_transaction(2)
+        ]
+        assert storage.get_totals("Test")["net"] == 3
+
+    @pytest.mark.parametrize(
+        "name",
+        [
+            "wallet.json",
+            "wallet.jsonl",
+            "wallet.ledger",
+            "wallet.sqlite3",
+            "wallets",
+        ],
+    )
+    def test_convert_legacy_amounts(self, tmp_path, name):
+        write_legacy(
+            tmp_path / name,
+            [
+                dict(make_transaction(1), amount=0.29),
+                dict(make_transaction(2, category="withdraw"), amount=0.1),
+            ],
+        )
+        storage = get_storage(tmp_path / name)
+        assert storage.convert_amounts() == 2
+        assert storage.convert_amounts() == 0
+        assert [
+            item["amount"] for item in storage.get_history("Test")
+        ] == [29, 10]
+        assert storage.get_totals("Test") == dict(
+            deposits=29, withdrawals=10, net=19
+        )
+        storage.add_transactions([make_transaction(3)])
+        assert storage.get_totals("Test")["net"] == 22
+        assert storage.verify_totals() == {}
+
+    def test_legacy_ledger_is_read_only(self, tmp_path):
+        path = tmp_path / "wallet.ledger"
+        write_legacy(path, [dict(make_transaction(1), amount=1.5)])
+        storage = get_storage(path)
+        assert storage.get_transaction("Test", "id-1")["amount"] == 1.5
+        with pytest.raises(ValueError, match="convert-amounts"):
+            storage.add_transactions([make_transaction(2)])
+        with pytest.raises(ValueError):
+            storage.update_transaction("Test", "id-1", {"amount": 1})
+
+    @pytest.mark.parametrize("name", ["wallet.json", "wallet.jsonl"])
+    def test_legacy_json_amounts_are_refused(self, tmp_path, wallet, name):
+        path = tmp_path / name
+        write_legacy(
+            path,
+            [
+                dict(make_transaction(1), amount=100.0),
+                dict(make_transaction(2), amount=20.5),
+            ],
+        )
+        storage = get_storage(path)
+        with pytest.raises(ValueError, match="convert-amounts"):
+            storage.get_history("Test")
+        with pytest.raises(ValueError, match="convert-amounts"):
+            storage.get_transaction("Test", "id-1")
+        wallet.user, wallet.authenticated = "Test", True
+        with pytest.raises(ValueError, match="convert-amounts"):
+            wallet._get_history("Test", path)
+        with pytest.raises(ValueError, match="convert-amounts"):
+            wallet.get_balance(path=path)
+        assert storage.convert_amounts() == 2
+        assert wallet.get_balance(path=path).startswith(
+            "Ваш текущий баланс: 120.5"
+        )
+
+    def test_iter_json_array_streams_across_chunks(self, tmp_path):
+        path = tmp_path / "wallet.json"
+        items = [make_transaction(number) for number in range(50)]
+        path.write_text(json.dumps(items, indent=4), encoding="utf-8")
+        assert list(iter_json_array(path, chunk_size=7)) == items
+        path.write_text("[]", encoding="utf-8")
+        assert list(iter_json_array(path, chunk_size=1)) == []
+        path.write_text("", encoding="utf-8")
+        assert list(iter_json_array(path)) == []
+        assert list(iter_json_array(tmp_path / "missing.json")) == []
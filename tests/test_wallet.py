@@ -1,3 +1,11 @@
+import io
+import json
+
+import pytest
+
+from indexes import BalanceIndex
+
+
 class TestWallet:
 
     def test_registration(self, wallet, temp_users_json):
@@ -166,8 +174,7 @@ class TestWallet:
                 user=authenticated_user,
                 path=temp_wallet_json
             )
-        ) == (f"Ваш текущий баланс: {wallet_deposit[0]['amount']}\n\n"
-              f"Доходы: {wallet_deposit[0]['amount']}, Расходы: 0.0")
+        ) == "Ваш текущий баланс: 12345.0\n\nДоходы: 12345.0, Расходы: 0.0"
 
     def test_get_balance_unknown_user(
             self,
@@ -221,9 +228,9 @@ class TestWallet:
             mode="amount",
             user_input="100",
             history=[
-                {"date": "2022-01-01", "category": "deposit", "amount": 100.0,
+                {"date": "2022-01-01", "category": "deposit", "amount": 10000,
                  "description": "Groceries"},
-                {"date": "2022-01-02", "category": "withdraw", "amount": 200.0,
+                {"date": "2022-01-02", "category": "withdraw", "amount": 20000,
                  "description": "Gas"},
             ]
         )
@@ -233,10 +240,10 @@ class TestWallet:
             mode="category",
             user_input="deposit",
             history=[
-                {"date": "2022-01-01", "category": "deposit", "amount": 100.0},
+                {"date": "2022-01-01", "category": "deposit", "amount": 10000},
                 {"date": "2022-01-02", "category": "withdraw",
-                 "amount": 200.0},
-                {"date": "2022-01-03", "category": "deposit", "amount": 300.0},
+                 "amount": 20000},
+                {"date": "2022-01-03", "category": "deposit", "amount": 30000},
             ]
         )
         assert second_search_res is not None
@@ -249,9 +256,12 @@ class TestWallet:
             temp_wallet_json,
             authenticated_user,
             wallet_deposit,
-            monkeypatch
+            monkeypatch,
+            capsys,
     ):
-        valid_responses = iter(["2024-09-05", "deposit", "100", "description"])
+        valid_responses = iter(
+            ["2024-09-05", "deposit", "250,5", "description"]
+        )
         monkeypatch.setattr("builtins.input", lambda _: next(valid_responses))
         edited_transaction = wallet.edit_transaction(
             user=authenticated_user,
@@ -259,6 +269,7 @@ class TestWallet:
             transaction_id=wallet_deposit[0]["id"],
         )
         assert edited_transaction is True
+        assert 'Поле Сумма изменено на "250.5"' in capsys.readouterr().out
 
     def test_edit_transaction_incorrect_date(
             self,
@@ -327,3 +338,551 @@ class TestWallet:
             transaction_id=wallet_deposit[0]["id"],
         )
         assert edited_transaction is False
+
+    def test_journal_appends_one_line_per_transaction(
+            self,
+            wallet,
+            temp_wallet_journal
+    ):
+        for category in ("deposit", "withdraw"):
+            wallet._write_to_file(
+                "Test", 10000, category, "test", path=temp_wallet_journal
+            )
+        with open(temp_wallet_journal, "r") as file:
+            lines = file.readlines()
+        assert len(lines) == 2
+        assert [json.loads(line)["category"] for line in lines] == [
+            "deposit", "withdraw"
+        ]
+
+    def test_journal_history_and_lookup(
+            self,
+            wallet,
+            temp_wallet_journal
+    ):
+        created = wallet._write_to_file(
+            "Test", 10000, "deposit", "test", path=temp_wallet_journal
+        )
+        wallet._write_to_file(
+            "Other", 5000, "deposit", "test", path=temp_wallet_journal
+        )
+        history = wallet._get_history("Test", path=temp_wallet_journal)
+        assert history == list(created)
+        assert wallet._get_transaction_by_id(
+            "Test", created[0]["id"], path=temp_wallet_journal
+        ) == created[0]
+        assert wallet._get_transaction_by_id(
+            "Other", created[0]["id"], path=temp_wallet_journal
+        ) is False
+
+    def test_get_balance_from_stored_totals(
+            self,
+            wallet,
+            wallet_deposit,
+            wallet_withdraw,
+            temp_wallet_json,
+            authenticated_user
+    ):
+        assert wallet.get_balance(path=temp_wallet_json) == (
+            "Ваш текущий баланс: 0.0\n\n"
+            "Доходы: 12345.0, Расходы: 12345.0"
+        )
+
+    def test_import_transactions(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user
+    ):
+        result = wallet.import_transactions(
+            [
+                {"date": "2024-09-01", "category": "deposit",
+                 "amount": "100", "description": "salary"},
+                {"category": "withdraw", "amount": "40.5"},
+                {"date": "2024-09-01", "category": "test", "amount": "1"},
+                {"date": "2024-09-01", "category": "deposit"},
+                {"category": "deposit", "amount": "1",
+                 "description": "t" * 101},
+            ],
+            path=temp_wallet_json,
+        )
+        assert result["accepted"] == 2
+        assert [number for number, _ in result["rejected"]] == [3, 4, 5]
+        history = wallet._get_history(authenticated_user, temp_wallet_json)
+        assert [item["amount"] for item in history] == [10000, 4050]
+        assert wallet.get_balance(path=temp_wallet_json).startswith(
+            "Ваш текущий баланс: 59.5"
+        )
+
+    def test_impossible_dates_are_rejected(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user
+    ):
+        result = wallet.import_transactions(
+            [
+                {"date": "2024-02-29", "category": "deposit", "amount": "1"},
+                {"date": "2024-01-05xyz", "category": "deposit",
+                 "amount": "1"},
+                {"date": "2024-02-31", "category": "deposit", "amount": "1"},
+            ],
+            path=temp_wallet_json,
+        )
+        assert result == {
+            "accepted": 1,
+            "rejected": [
+                (2, "Ошибка: Недопустимый формат даты.\n"),
+                (3, "Ошибка: Недопустимый формат даты.\n"),
+            ],
+        }
+        [item] = wallet._get_history(authenticated_user, temp_wallet_json)
+        assert wallet.update_transaction(
+            item["id"], {"date": "2023-02-29"}, path=temp_wallet_json
+        ) == "Ошибка: Недопустимый формат даты.\n"
+
+    def test_ledger_import_rejects_impossible_dates(
+            self,
+            wallet,
+            tmp_path,
+            authenticated_user
+    ):
+        path = tmp_path / "wallet.ledger"
+        result = wallet.import_transactions(
+            [
+                {"date": "2024-02-31", "category": "deposit", "amount": "1"},
+                {"date": "2024-02-29", "category": "deposit", "amount": "2"},
+            ],
+            path=path,
+        )
+        assert result["accepted"] == 1
+        assert [number for number, _ in result["rejected"]] == [1]
+        [item] = wallet._get_history(authenticated_user, path)
+        assert wallet.update_transaction(
+            item["id"], {"date": "2024-02-31"}, path=path
+        ) == "Ошибка: Недопустимый формат даты.\n"
+        assert wallet._get_history(authenticated_user, path) == [item]
+
+    def test_import_transactions_from_csv(
+            self,
+            wallet,
+            tmp_path,
+            temp_wallet_json,
+            authenticated_user
+    ):
+        source = tmp_path / "statement.csv"
+        source.write_text(
+            "date,category,amount,description\n"
+            "2024-09-01,deposit,100,salary\n"
+            "2024-09-02,withdraw,abc,broken\n",
+            encoding="utf-8",
+        )
+        result = wallet.import_transactions(source, path=temp_wallet_json)
+        assert result == {
+            "accepted": 1,
+            "rejected": [(2, "Ошибка: сумма должна быть числом.\n")],
+        }
+
+    def test_import_rejects_malformed_rows(
+            self,
+            wallet,
+            tmp_path,
+            temp_wallet_json,
+            authenticated_user,
+            monkeypatch,
+            capsys,
+    ):
+        source = tmp_path / "statement.jsonl"
+        source.write_text(
+            '{"category": "deposit", "amount": "100"}\n'
+            '{"category": "deposit", "amount": \n'
+            '[1, 2]\n'
+            '{"category": "deposit", "amount": "1", "date": 20240901}\n'
+            '{"category": "withdraw", "amount": "30"}\n',
+            encoding="utf-8",
+        )
+        result = wallet.import_transactions(source, path=temp_wallet_json)
+        assert result["accepted"] == 2
+        assert result["rejected"] == [
+            (number, "Ошибка: строка не является записью транзакции.\n")
+            for number in (2, 3, 4)
+        ]
+        missing = str(tmp_path / "missing.jsonl")
+        monkeypatch.setattr("builtins.input", lambda _: missing)
+        wallet._handle_authenticated_commands("import")
+        assert f"Не удалось прочитать файл {missing}" in (
+            capsys.readouterr().out
+        )
+
+    def test_print_history_consumes_lazy_history(
+            self,
+            wallet,
+            wallet_deposit,
+            temp_wallet_json,
+            authenticated_user
+    ):
+        history = wallet._iter_history(authenticated_user, temp_wallet_json)
+        assert "Доход" in wallet.print_history(history=history)
+        assert wallet.print_history(
+            history=wallet._iter_history(
+                authenticated_user, temp_wallet_json
+            ),
+            mode="withdraw",
+        ) == "Ничего не найдено"
+
+    def test_print_history_maps_category_per_record(
+            self,
+            wallet,
+            authenticated_user
+    ):
+        history = wallet.print_history(
+            history=[
+                {"date": "2022-01-01", "category": "deposit", "amount": 100,
+                 "description": "deposit withdraw"},
+            ]
+        )
+        assert "Категория: Доход" in history
+        assert "Описание: deposit withdraw" in history
+
+    def test_print_history_pages_to_stream(
+            self,
+            wallet,
+            authenticated_user
+    ):
+        history = [
+            {"date": "2022-01-01", "category": "deposit", "amount": i * 100,
+             "description": "test"}
+            for i in range(5)
+        ]
+        stream = io.StringIO()
+        assert wallet.print_history(
+            history=iter(history), page=2, page_size=2, stream=stream
+        ) == ""
+        output = stream.getvalue()
+        assert "Сумма: 2.0" in output and "Сумма: 3.0" in output
+        assert "Сумма: 1.0" not in output and "Сумма: 4.0" not in output
+        assert wallet.print_history(
+            history=history, page=4, page_size=2
+        ) == "Ничего не найдено"
+        for page, page_size in ((0, 2), (1, 0), (-1, -1)):
+            assert wallet.print_history(
+                history=history, page=page, page_size=page_size
+            ) == (
+                "Ошибка: номер и размер страницы должны быть "
+                "положительными.\n"
+            )
+
+    def test_history_command_pages_through_results(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+            monkeypatch
+    ):
+        for amount in range(5):
+            wallet._write_to_file(
+                authenticated_user, amount * 100, "deposit", "test",
+                path=temp_wallet_json,
+            )
+        answers = iter(["", "q"])
+        monkeypatch.setattr("builtins.input", lambda _: next(answers))
+        stream = io.StringIO()
+        assert wallet._page_history(
+            "all", page_size=2, stream=stream, path=temp_wallet_json
+        ) == 4
+        assert "Сумма: 3.0" in stream.getvalue()
+        assert "Сумма: 4.0" not in stream.getvalue()
+
+    def test_description_search_uses_incremental_index(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+            monkeypatch
+    ):
+        wallet._write_to_file(
+            authenticated_user, 10000, "withdraw", "Продукты",
+            path=temp_wallet_json,
+        )
+        assert wallet.search(
+            "description", "ноутбук", path=temp_wallet_json
+        ) == "Ничего не найдено"
+        created = wallet._write_to_file(
+            authenticated_user, 90000, "withdraw", "Куплен новый ноутбук",
+            path=temp_wallet_json,
+        )
+        assert "Куплен новый ноутбук" in wallet.search(
+            "description", "Ноутбук", path=temp_wallet_json
+        )
+        responses = iter(["", "", "", "Куплен телефон"])
+        monkeypatch.setattr("builtins.input", lambda _: next(responses))
+        wallet.edit_transaction(
+            transaction_id=created[0]["id"],
+            user=authenticated_user,
+            path=temp_wallet_json,
+        )
+        assert wallet.search(
+            "description", "ноутбук", path=temp_wallet_json
+        ) == "Ничего не найдено"
+        assert "Куплен телефон" in wallet.search(
+            "description", "телефон", path=temp_wallet_json
+        )
+
+    def test_description_search_in_given_history(self, wallet):
+        history = [
+            {"date": "2022-01-01", "category": "withdraw", "amount": 10000,
+             "description": "Groceries"},
+            {"date": "2022-01-02", "category": "withdraw", "amount": 20000,
+             "description": None},
+        ]
+        assert wallet._find_transactions(
+            "description", "grocer", history=history
+        ) == history[:1]
+        assert wallet._find_transactions(
+            "description", "gas", history=history
+        ) == []
+
+    def test_amount_and_date_range_search(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+    ):
+        for amount in (50000, 5000, 500000):
+            wallet._write_to_file(
+                authenticated_user, amount, "deposit", "test",
+                path=temp_wallet_json,
+            )
+        result = wallet.search("amount", "100..5000", path=temp_wallet_json)
+        assert result.index("Сумма: 500.0") < result.index("Сумма: 5000.0")
+        assert "Сумма: 50.0" not in result
+        result = wallet.search("amount", "<500", path=temp_wallet_json)
+        assert "Сумма: 50.0" in result and "Сумма: 500.0" not in result
+        assert wallet.search(
+            "amount", ">=10 000", path=temp_wallet_json
+        ) == "Ничего не найдено"
+        assert wallet.search(
+            "amount", "много", path=temp_wallet_json
+        ) == "Ошибка: сумма должна быть числом.\n"
+        assert "Сумма: 50.0" in wallet.search(
+            "date", "2000-01-01..", path=temp_wallet_json
+        )
+        assert wallet.search(
+            "date", "..2000-01-01", path=temp_wallet_json
+        ) == "Ничего не найдено"
+
+    def test_report_by_period(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+    ):
+        wallet._save_transactions(
+            authenticated_user,
+            [
+                dict(id=str(number), user=authenticated_user, date=day,
+                     category=category, amount=amount, description="")
+                for number, (day, category, amount) in enumerate([
+                    ("2023-12-31", "deposit", 10000),
+                    ("2024-01-15", "deposit", 5000),
+                    ("2024-01-20", "withdraw", 2000),
+                    ("2024-03-01", "withdraw", 1000),
+                ])
+            ],
+            path=temp_wallet_json,
+        )
+        assert wallet.get_report(
+            "month", "2024-01-16", path=temp_wallet_json
+        ) == [
+            dict(period="2024-01", deposits=5000, withdrawals=2000, net=3000),
+            dict(period="2024-03", deposits=0, withdrawals=1000, net=-1000),
+        ]
+        assert [
+            row["period"] for row in wallet.get_report(
+                "day", "2024", "2024-01", path=temp_wallet_json
+            )
+        ] == ["2024-01-15", "2024-01-20"]
+        assert wallet.report("year", path=temp_wallet_json) == (
+            "\nДоходы и расходы по периодам:\n\n"
+            "2023: доходы 100.0, расходы 0.0, баланс 100.0\n"
+            "2024: доходы 50.0, расходы 30.0, баланс 20.0"
+        )
+        assert wallet.report(
+            "year", "2030", path=temp_wallet_json
+        ) == "Ничего не найдено"
+        assert wallet.report(
+            "week", path=temp_wallet_json
+        ) == "Неизвестный режим"
+        assert wallet.report(
+            "month", "01.2024", path=temp_wallet_json
+        ) == "Ошибка: Недопустимый формат даты.\n"
+
+    def test_balance_at_follows_writes_and_edits(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+    ):
+        wallet._save_transactions(
+            authenticated_user,
+            [
+                dict(id="1", user=authenticated_user, date="2024-01-10",
+                     category="deposit", amount=10000, description=""),
+                dict(id="2", user=authenticated_user, date="2024-02-10",
+                     category="withdraw", amount=3000, description=""),
+            ],
+            path=temp_wallet_json,
+        )
+        assert wallet.balance_at("2024-01-31", temp_wallet_json) == 10000
+        index = wallet._get_index(
+            authenticated_user, temp_wallet_json, "balance", None
+        )
+        wallet._save_transactions(
+            authenticated_user,
+            [dict(id="3", user=authenticated_user, date="2024-01-20",
+                  category="deposit", amount=500, description="")],
+            path=temp_wallet_json,
+        )
+        wallet.update_transaction(
+            "2", dict(date="2024-01-15"), path=temp_wallet_json
+        )
+        assert wallet._get_index(
+            authenticated_user, temp_wallet_json, "balance", None
+        ) is index
+        assert wallet.balance_at("2024-01-31", temp_wallet_json) == 7500
+        assert wallet.balance_series(
+            "2024-01-12", "2024-01-31", temp_wallet_json
+        ) == [
+            ("2024-01-12", 10000), ("2024-01-15", 7000), ("2024-01-20", 7500)
+        ]
+        assert wallet.balance_at(
+            "31.01.2024", temp_wallet_json
+        ) == "Ошибка: Недопустимый формат даты.\n"
+
+    def test_index_is_built_by_streaming_and_respects_cache_limit(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+            monkeypatch,
+    ):
+        wallet._save_transactions(
+            authenticated_user,
+            [
+                dict(id=str(number), user=authenticated_user,
+                     date=f"2024-01-1{number}", category="deposit",
+                     amount=100, description="")
+                for number in range(3)
+            ],
+            path=temp_wallet_json,
+        )
+        wallet._history_cache.clear()
+        monkeypatch.setattr(
+            "storage.StorageEngine.get_history",
+            lambda *args: pytest.fail("history loaded as a list"),
+        )
+        monkeypatch.setattr(
+            "constants.UtilityConstants.HISTORY_CACHE_MAX_ITEMS", 2
+        )
+        assert wallet.balance_at("2024-01-11", temp_wallet_json) == 200
+        assert len(wallet._history_cache._entries) == 0
+        monkeypatch.undo()
+        index = wallet._get_index(
+            authenticated_user, temp_wallet_json, "balance", BalanceIndex
+        )
+        assert wallet._get_index(
+            authenticated_user, temp_wallet_json, "balance", None
+        ) is index
+
+    def test_top_transactions(
+            self,
+            wallet,
+            temp_wallet_json,
+            authenticated_user,
+    ):
+        wallet._save_transactions(
+            authenticated_user,
+            [
+                dict(id=str(number), user=authenticated_user, date=day,
+                     category=category, amount=amount, description="")
+                for number, (day, category, amount) in enumerate([
+                    ("2024-01-10", "withdraw", 3000),
+                    ("2024-01-11", "withdraw", 9000),
+                    ("2024-01-12", "deposit", 50000),
+                    ("2024-02-01", "withdraw", 7000),
+                    ("2024-02-02", "withdraw", 9000),
+                ])
+            ],
+            path=temp_wallet_json,
+        )
+        assert [
+            (item["id"], item["amount"]) for item in wallet.get_top(
+                "withdraw", 3, path=temp_wallet_json
+            )
+        ] == [("1", 9000), ("4", 9000), ("3", 7000)]
+        history = wallet._iter_history(
+            authenticated_user, path=temp_wallet_json
+        )
+        assert type(history).__name__ == "TransactionColumns"
+        assert [
+            item["id"] for item in wallet.get_top(
+                "withdraw", 3, path=temp_wallet_json
+            )
+        ] == ["1", "4", "3"]
+        assert [
+            item["id"] for item in wallet.get_top(
+                "withdraw", 10, "2024-01-11", "2024-02-01",
+                path=temp_wallet_json,
+            )
+        ] == ["1", "3"]
+        assert wallet.get_top(
+            "other", path=temp_wallet_json
+        ) == "Ошибка: Недопустимая категория.\n"
+        assert wallet.top(
+            "deposit", path=temp_wallet_json
+        ).startswith("\nСамые крупные транзакции:\n\n")
+        assert wallet.top(
+            "deposit", start="2030-01-01", path=temp_wallet_json
+        ) == "Ничего не найдено"
+
+    def test_register_and_auth_in_hashed_user_directory(
+            self,
+            wallet,
+            tmp_path,
+    ):
+        path = tmp_path / "users"
+        assert wallet.register("Test", "secret", path=path) == "Test"
+        assert wallet.register("Test", "other", path=path) == (
+            "Такой пользователь уже существует,"
+            " пожалуйста, попробуйте ещё раз."
+        )
+        assert len(list(path.glob("*/*.user.json"))) == 1
+        assert wallet.auth("Test", "secret", path=path) == "Test"
+        assert wallet.auth(
+            "Test", "other", path=path
+        ) == "Неверные имя пользователя или пароль"
+
+    def test_cached_history_is_columnar(
+            self,
+            wallet,
+            authenticated_user,
+            temp_wallet_json,
+    ):
+        for amount, category in ((10000, "deposit"), (3000, "withdraw")):
+            wallet._write_to_file(
+                authenticated_user, amount, category, "test",
+                path=temp_wallet_json,
+            )
+        wallet._get_history(authenticated_user, path=temp_wallet_json)
+        history = wallet._iter_history(
+            authenticated_user, path=temp_wallet_json
+        )
+        assert type(history).__name__ == "TransactionColumns"
+        assert wallet.get_balance(history=history) == wallet.get_balance(
+            history=list(history)
+        )
+        result = wallet.print_history(history, mode="withdraw")
+        assert "Сумма: 30.0" in result and "Сумма: 100.0" not in result
+        assert wallet._find_transactions(
+            "amount", ">50", history=history
+        ) == [list(history)[0]]
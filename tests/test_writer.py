@@ -0,0 +1,101 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from storage import get_storage
+from tests.conftest import make_transaction
+from writer import GroupCommitWriter
+
+ROOT = Path(__file__).resolve().parent.parent
+
+WRITER_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+from writer import get_writer
+writer = get_writer({path!r})
+for number in range({count}):
+    writer.submit("Test", [dict(
+        id="{{}}-{{}}".format(sys.argv[1], number), user="Test",
+        date="2024-09-01", category="deposit", amount=1,
+        description="test",
+    )])
+"""
+
+
+@pytest.fixture(
+    params=["wallet.json", "wallet.jsonl", "wallet.ledger", "wallets"]
+)
+def writer(request, tmp_path):
+    return GroupCommitWriter(get_storage(tmp_path / request.param))
+
+
+class TestGroupCommitWriter:
+
+    def test_concurrent_submits_are_coalesced(self, writer, monkeypatch):
+        commits = []
+        add_transactions = writer.storage.add_transactions
+        release = threading.Event()
+
+        def slow_add_transactions(transactions):
+            transactions = list(transactions)
+            commits.append(len(transactions))
+            release.wait(1)
+            add_transactions(transactions)
+
+        monkeypatch.setattr(
+            writer.storage, "add_transactions", slow_add_transactions
+        )
+        threads = [
+            threading.Thread(
+                target=writer.submit,
+                args=("Test", [make_transaction(number)]),
+            )
+            for number in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert sum(commits) == 20
+        assert len(commits) < 20
+        assert len(writer.storage.get_history("Test")) == 20
+        assert writer.storage.get_totals("Test")["net"] == sum(range(20))
+
+    def test_on_commit_receives_signatures(self, writer):
+        calls = []
+        writer.submit(
+            "Test",
+            [make_transaction(1)],
+            lambda old, new, items: calls.append((old, new, items)),
+        )
+        (old, new, items), = calls
+        assert old is None
+        assert new == writer.storage.signature("Test")
+        assert items == [make_transaction(1)]
+
+    def test_errors_are_raised_to_callers(self, writer, monkeypatch):
+        def broken_add_transactions(transactions):
+            raise OSError("disk is full")
+
+        monkeypatch.setattr(
+            writer.storage, "add_transactions", broken_add_transactions
+        )
+        with pytest.raises(OSError):
+            writer.submit("Test", [make_transaction(1)])
+
+    def test_processes_do_not_lose_writes(self, tmp_path):
+        path = tmp_path / "wallet.json"
+        script = WRITER_SCRIPT.format(root=str(ROOT), path=str(path), count=25)
+        processes = [
+            subprocess.Popen([sys.executable, "-c", script, str(number)])
+            for number in range(4)
+        ]
+        for process in processes:
+            assert process.wait() == 0
+        storage = get_storage(path)
+        assert len(storage.get_history("Test")) == 100
+        assert storage.get_totals("Test")["net"] == 100
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+from constants import UtilityConstants as Uc
+from storage import StorageEngine, get_storage
+
+Signature = Optional[tuple[str, int, int, int]]
+CommitCallback = Callable[[Signature, Signature, list[dict]], None]
+
+
+class _Batch:
+    """
+    Транзакции одного вызова `submit`, ожидающие записи.
+    """
+
+    __slots__ = ("user", "transactions", "on_commit", "done", "error")
+
+    def __init__(
+            self,
+            user: str,
+            transactions: list[dict],
+            on_commit: Optional[CommitCallback],
+    ):
+        self.user = user
+        self.transactions = transactions
+        self.on_commit = on_commit
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitWriter:
+    """
+    Писатель транзакций с групповой фиксацией. Первый из одновременно
+    пишущих потоков становится ведущим: он захватывает блокировку
+    хранилища и записывает одной операцией всё, что успело накопиться
+    в очереди, а остальные потоки ждут, пока их транзакции окажутся
+    на диске. Пока идёт запись, очередь наполняется снова, поэтому чем
+    больше конкурирующих потоков, тем крупнее пачки.
+    """
+
+    def __init__(self, storage: StorageEngine):
+        self.storage = storage
+        self._condition = threading.Condition()
+        self._pending: list[_Batch] = []
+        self._committing = False
+
+    def submit(
+            self,
+            user: str,
+            transactions: Iterable[dict],
+            on_commit: Optional[CommitCallback] = None,
+    ) -> None:
+        """
+        Записать транзакции пользователя и дождаться, пока они окажутся
+        на диске.
+
+        :param user: Пользователь, совершивший транзакции.
+        :param transactions: Транзакции для записи.
+        :param on_commit: Функция, которая вызывается после записи
+         с сигнатурами файла пользователя до и после записи и записанными
+         транзакциями. Нужна, чтобы обновить кэш историй.
+        """
+        batch = _Batch(user, list(transactions), on_commit)
+        with self._condition:
+            self._pending.append(batch)
+            while self._committing and not batch.done:
+                self._condition.wait()
+            if not batch.done:
+                self._committing = True
+                batches, self._pending = self._pending, []
+        if not batch.done:
+            try:
+                self._commit(batches)
+            finally:
+                with self._condition:
+                    self._committing = False
+                    self._condition.notify_all()
+        if batch.error is not None:
+            raise batch.error
+
+    def _commit(self, batches: list[_Batch]) -> None:
+        storage = self.storage
+        users = {batch.user for batch in batches}
+        try:
+            with storage.lock:
+                before = {user: storage.signature(user) for user in users}
+                storage.add_transactions(
+                    transaction
+                    for batch in batches
+                    for transaction in batch.transactions
+                )
+                after = {user: storage.signature(user) for user in users}
+            for batch in batches:
+                if batch.on_commit is not None:
+                    batch.on_commit(
+                        before[batch.user],
+                        after[batch.user],
+                        batch.transactions,
+                    )
+        except BaseException as error:
+            for batch in batches:
+                batch.error = error
+            raise
+        finally:
+            for batch in batches:
+                batch.done = True
+
+
+_writers: OrderedDict[tuple[str, str], GroupCommitWriter] = OrderedDict()
+_writers_guard = threading.Lock()
+
+
+def get_writer(
+        path: Union[str, Path],
+        encoding: str = "utf-8",
+) -> GroupCommitWriter:
+    """
+    Получить писателя для хранилища. Все потоки процесса, пишущие
+    в одно хранилище, используют одного писателя, поэтому их транзакции
+    объединяются в общие пачки.
+
+    :param path: Путь к файлу хранилища.
+    :param encoding: Кодировка файла, по умолчанию равна `utf-8`.
+    :returns: GroupCommitWriter — писатель для указанного хранилища.
+    """
+    key = (str(path), encoding)
+    with _writers_guard:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = GroupCommitWriter(
+                get_storage(path, encoding)
+            )
+        _writers.move_to_end(key)
+        while len(_writers) > Uc.STORAGE_CACHE_SIZE:
+            _writers.popitem(last=False)
+        return writer